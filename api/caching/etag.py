@@ -0,0 +1,37 @@
+import hashlib
+
+from fastapi import Request, Response
+
+
+def make_etag(*version_parts) -> str:
+    """
+    Функция построения сильного ETag по версии данных ответа
+    :param version_parts: все, от чего зависит тело ответа (версии данных по их содержимому, пользователь, скидка).
+    Версии не зависят от процесса, поэтому ETag, выданный одним воркером, подходит для всех;
+    :return: ETag в кавычках.
+    """
+    digest = hashlib.blake2b(repr(version_parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    # If-None-Match сравнивается без учета признака слабого ETag (W/), как требует RFC 9110
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def set_cache_headers(response: Response, etag: str | None, cache_control: str):
+    # ETag не выдается, если версию данных определить не удалось
+    if etag is not None:
+        response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+
+
+def not_modified_response(etag: str, cache_control: str) -> Response:
+    response = Response(status_code=304)
+    set_cache_headers(response, etag, cache_control)
+    return response
@@ -0,0 +1,95 @@
+from typing import Iterable
+
+from jinja2 import nodes, pass_context
+from jinja2.ext import Extension
+from jinja2.runtime import Context
+from markupsafe import Markup
+
+from api.caching.page_cache import PageCache, row_key
+from config import settings
+
+# Переменные контекста шаблона с версиями таблиц и номером последнего изменения в кэше фрагментов,
+# снятыми до загрузки данных страницы из БД (см. fragment_cache_context)
+FRAGMENT_TABLE_VERSIONS = "fragment_table_versions"
+FRAGMENT_CHANGE_NUMBER = "fragment_change_number"
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Тег {% cache "имя", ключ, ... [row "таблица", id] %} ... {% endcache %}: результат рендеринга блока
+    сохраняется в кэше фрагментов по имени шаблона и значениям ключа. Ключ должен включать все данные блока,
+    которые меняются без уведомления об изменении таблиц (например, наличие товара на складе).
+    Блок с row устаревает при изменении указанной строки таблицы (уведомление "таблица:id"), а не всей таблицы.
+    Блок кэшируется, только если в контексте шаблона переданы версии таблиц (FRAGMENT_TABLE_VERSIONS),
+    иначе он рендерится каждый раз
+    """
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=fragment_cache)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key_parts.append(parser.parse_expression())
+        row = nodes.Const(None)
+        if parser.stream.skip_if("name:row"):
+            table_name = parser.parse_expression()
+            parser.stream.expect("comma")
+            row = nodes.Tuple([table_name, parser.parse_expression()], "load")
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render_cached", [nodes.Tuple(key_parts, "load"), row]), [], [], body
+        ).set_lineno(lineno)
+
+    @pass_context
+    def _render_cached(self, context: Context, key_parts: tuple, row: tuple | None, caller):
+        table_versions = context.get(FRAGMENT_TABLE_VERSIONS)
+        if table_versions is None:
+            return caller()
+
+        cache: PageCache = self.environment.fragment_cache
+        key = (context.name, key_parts)
+        fragment = cache.get(key)
+        if fragment is not None:
+            # Сохраненный фрагмент уже экранирован
+            return Markup(fragment)
+        if row is not None:
+            version_key = row_key(*row)
+            row_version = cache.version(version_key)
+            # Строка изменилась после снятия версий: данные страницы могли быть загружены до изменения,
+            # поэтому фрагмент рендерится без сохранения в кэш
+            change_number = context.get(FRAGMENT_CHANGE_NUMBER)
+            if change_number is None or row_version > change_number:
+                return caller()
+            table_versions = {**table_versions, version_key: row_version}
+        # В асинхронном окружении блок рендерится корутиной, результат которой Jinja ожидает сама
+        if self.environment.is_async:
+            return self._render_async(key, table_versions, caller)
+        return self._store(key, caller(), table_versions)
+
+    async def _render_async(self, key: tuple, table_versions: dict, caller) -> Markup:
+        return self._store(key, await caller(), table_versions)
+
+    def _store(self, key: tuple, fragment: str, table_versions: dict) -> Markup:
+        cache: PageCache = self.environment.fragment_cache
+        cache.set(key, fragment, table_versions)
+        return Markup(fragment)
+
+
+# Кэш фрагментов страниц каталога и товаров
+fragment_cache = PageCache(max_size_in_bytes=settings.FRAGMENT_CACHE_MAX_SIZE, ttl=settings.PAGE_CACHE_TTL)
+
+
+def fragment_cache_context(tables: Iterable[str]) -> dict:
+    """
+    Функция получения переменных контекста шаблона для кэша фрагментов. Вызывается до загрузки данных страницы из БД
+    :param tables: таблицы, из которых строятся фрагменты страницы;
+    :return: версии таблиц (FRAGMENT_TABLE_VERSIONS) и номер последнего изменения (FRAGMENT_CHANGE_NUMBER).
+    """
+    return {
+        FRAGMENT_TABLE_VERSIONS: fragment_cache.snapshot_versions(tables),
+        FRAGMENT_CHANGE_NUMBER: fragment_cache.change_number
+    }
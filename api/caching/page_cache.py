@@ -0,0 +1,171 @@
+import time
+from collections import OrderedDict
+from typing import Hashable, Iterable
+
+from pydantic import BaseModel
+
+from config import settings
+from database.models import Product, ProductSubtype, ProductType, ProductFeedback
+
+# Таблицы, из которых строятся страницы каталога и страницы товара
+CATALOG_PAGE_TABLES = (Product.__tablename__, ProductSubtype.__tablename__, ProductType.__tablename__)
+PRODUCT_PAGE_TABLES = CATALOG_PAGE_TABLES + (ProductFeedback.__tablename__,)
+
+# Ключ версии: имя таблицы или пара (имя таблицы, id строки) - см. row_key
+VersionKey = str | tuple[str, str]
+
+
+def row_key(table_name: str, row_id) -> tuple[str, str]:
+    # id строки в уведомлении БД приходит строкой
+    return table_name, str(row_id)
+
+
+def catalog_page_version_keys(product_subtype: str) -> tuple:
+    # Страница каталога устаревает при изменении товаров своего подтипа (уведомление "product_subtypes:<подтип>"
+    # отправляет триггер таблицы products) и при изменении таблиц целиком
+    return CATALOG_PAGE_TABLES + (row_key(ProductSubtype.__tablename__, product_subtype),)
+
+
+def product_page_version_keys(product_id: int) -> tuple:
+    # Страница товара устаревает при изменении самого товара, его отзывов и при изменении таблиц целиком
+    return PRODUCT_PAGE_TABLES + (
+        row_key(Product.__tablename__, product_id), row_key(ProductFeedback.__tablename__, product_id))
+
+
+class PageCacheStats(BaseModel):
+    size: int
+    size_in_bytes: int
+    max_size_in_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+
+class CachedPage:
+    __slots__ = ("body", "expires_at", "table_versions")
+
+    def __init__(self, body: bytes | str, expires_at: float, table_versions: dict[VersionKey, int]):
+        self.body = body
+        self.expires_at = expires_at
+        self.table_versions = table_versions
+
+
+class PageCache:
+    """
+    Кэш готовых HTML-страниц (байтов ответа) в памяти процесса. Размер ограничен суммарным
+    размером страниц: при превышении вытесняются давно не использованные (LRU). Как и в кэше
+    справочных данных, страница помнит версии таблиц, из которых построена, и перестает считаться
+    актуальной при их изменении или по истечении времени жизни (на случай пропущенных уведомлений).
+    Кроме таблиц целиком, страница может зависеть от отдельных строк (row_key): изменение строки сбрасывает
+    только страницы, построенные с ее версией. Версия - номер изменения, общий для всех ключей кэша, поэтому
+    по ней видно, изменилась ли строка после любого снятого ранее номера (change_number).
+    Версии строк таблицы удаляются при изменении таблицы целиком: страницы, построенные с ними,
+    к этому моменту уже устарели, поэтому в версиях страницы вместе со строкой всегда должна быть ее таблица
+    """
+    def __init__(self, max_size_in_bytes: int, ttl: float):
+        self.max_size_in_bytes = max_size_in_bytes
+        self.ttl = ttl
+        self._pages: OrderedDict[Hashable, CachedPage] = OrderedDict()
+        self._table_versions: dict[str, int] = dict()
+        self._row_versions: dict[str, dict[str, int]] = dict()
+        self.change_number = 0
+        self.size_in_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def version(self, key: VersionKey) -> int:
+        if isinstance(key, tuple):
+            table_name, row_id = key
+            return self._row_versions.get(table_name, {}).get(row_id, 0)
+        return self._table_versions.get(key, 0)
+
+    def snapshot_versions(self, keys: Iterable[VersionKey]) -> dict[VersionKey, int]:
+        return {key: self.version(key) for key in keys}
+
+    def get(self, key: Hashable) -> bytes | str | None:
+        page = self._pages.get(key)
+        if page is None or not self._is_fresh(page):
+            if page is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._pages.move_to_end(key)
+        self.hits += 1
+        return page.body
+
+    def set(self, key: Hashable, body: bytes | str, table_versions: dict[VersionKey, int]):
+        """
+        Функция сохранения страницы в кэш
+        :param key: ключ страницы (page_cache_key);
+        :param body: байты ответа или текст фрагмента страницы (размер текста считается в символах);
+        :param table_versions: версии таблиц и строк, снятые функцией snapshot_versions до начала загрузки из БД.
+        """
+        if key in self._pages:
+            self._remove(key)
+        # Страница больше всего кэша не сохраняется, чтобы не вытеснять все остальные
+        if len(body) > self.max_size_in_bytes:
+            return
+        self._pages[key] = CachedPage(body, time.monotonic() + self.ttl, table_versions)
+        self.size_in_bytes += len(body)
+        while self.size_in_bytes > self.max_size_in_bytes:
+            self._remove(next(iter(self._pages)))
+            self.evictions += 1
+
+    def invalidate_tables(self, *table_names: str):
+        for table_name in table_names:
+            self.change_number += 1
+            self._table_versions[table_name] = self.change_number
+            self._row_versions.pop(table_name, None)
+        self.invalidations += 1
+
+    def row_changed(self, table_name: str, row_id: str):
+        # Устаревают только страницы, построенные с версией этой строки
+        self.change_number += 1
+        self._row_versions.setdefault(table_name, dict())[row_id] = self.change_number
+        self.invalidations += 1
+
+    def clear(self):
+        self._pages.clear()
+        self.size_in_bytes = 0
+        self.invalidations += 1
+
+    def stats(self) -> PageCacheStats:
+        return PageCacheStats(
+            size=len(self._pages),
+            size_in_bytes=self.size_in_bytes,
+            max_size_in_bytes=self.max_size_in_bytes,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            invalidations=self.invalidations
+        )
+
+    def _remove(self, key: Hashable):
+        self.size_in_bytes -= len(self._pages.pop(key).body)
+
+    def _is_fresh(self, page: CachedPage) -> bool:
+        if page.expires_at <= time.monotonic():
+            return False
+        return all(self.version(key) == version for key, version in page.table_versions.items())
+
+
+def page_cache_key(page_name: str, params: tuple, role: str, discount_amount_in_percent: int) -> tuple:
+    """
+    Функция построения ключа страницы в кэше. Страница зависит от параметров запроса, роли и скидки,
+    но не от конкретного пользователя
+    :param page_name: название страницы (шаблона);
+    :param params: проверенные значения параметров пути и запроса, от которых зависит страница. Строка запроса
+    в ключ не входит: лишние или переставленные параметры не должны создавать новые записи и вытеснять остальные;
+    :param role: роль пользователя;
+    :param discount_amount_in_percent: скидка пользователя;
+    :return: ключ страницы.
+    """
+    return page_name, params, role, discount_amount_in_percent
+
+
+# Кэш страниц каталога и товаров
+page_cache = PageCache(max_size_in_bytes=settings.PAGE_CACHE_MAX_SIZE, ttl=settings.PAGE_CACHE_TTL)
@@ -0,0 +1,126 @@
+from decimal import Decimal
+
+from fastapi import APIRouter, Depends, Response, Header
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import JSONResponse
+
+from api.pricing.discounts import apply_discount_to_prices, to_decimal_price
+from api.schemas.authentication import UserIdRole
+from api.schemas.cart import (CartItemsToAdd, CartQuantityToSet, CartItemQuantity, CartItemDTO, CartDTO,
+                              CheckoutRequest, OrderDTO)
+from api.security.authentication import check_jwt_access_token, pass_jwt_access_token, mark_user_write
+from api.security.customer_level import get_user_discount, refresh_customer_level_claim
+from database.cart import merge_cart_items, upsert_cart_items, remove_cart_item, get_cart_from_db
+from database.checkout import checkout_cart
+from database.dependencies import get_async_session, get_read_async_session
+
+cart_router = APIRouter(prefix="/cart")
+
+GUEST_CART_ACCESS_MESSAGE = "Недостаточно прав доступа. Чтобы пользоваться корзиной сначала пройдите авторизацию."
+
+
+@cart_router.get("/", response_model=CartDTO)
+async def get_cart(
+        response: Response,
+        user: UserIdRole = Depends(check_jwt_access_token),
+        async_session: AsyncSession = Depends(get_read_async_session)):
+    if user.role != "user":
+        return JSONResponse(status_code=403, content={"message": GUEST_CART_ACCESS_MESSAGE})
+
+    # Товары корзины вместе с карточками товаров загружаются одним запросом
+    cart_from_db = await get_cart_from_db(async_session, user.id)
+    discount_amount_in_percent = await get_user_discount(user, response, async_session)
+    await async_session.close()
+
+    # Цены со скидкой рассчитываются по текущим ценам товаров при каждом запросе корзины
+    discounted_prices = apply_discount_to_prices(
+        ((cart_item.product_id, cart_item.price) for cart_item in cart_from_db), discount_amount_in_percent)
+    total_price = Decimal(0)
+    total_discounted_price = Decimal(0)
+    cart_items_dto = []
+    for cart_item in cart_from_db:
+        discounted_price = discounted_prices[cart_item.product_id]
+        total_price += to_decimal_price(cart_item.price) * cart_item.quantity
+        total_discounted_price += discounted_price * cart_item.quantity
+        cart_items_dto.append(CartItemDTO(
+            product_id=cart_item.product_id,
+            name=cart_item.name,
+            image_link=cart_item.image_link,
+            quantity=cart_item.quantity,
+            quantity_in_stock=cart_item.quantity_in_stock,
+            price=float(cart_item.price),
+            discounted_price=float(discounted_price)
+        ))
+
+    return CartDTO(
+        items=cart_items_dto,
+        total_price=float(total_price),
+        total_discounted_price=float(total_discounted_price)
+    )
+
+
+@cart_router.post("/items", response_model=list[CartItemQuantity])
+async def add_items_to_cart(
+        items_to_add: CartItemsToAdd,
+        response: Response,
+        user: UserIdRole = Depends(check_jwt_access_token),
+        async_session: AsyncSession = Depends(get_async_session)):
+    if user.role != "user":
+        return JSONResponse(status_code=403, content={"message": GUEST_CART_ACCESS_MESSAGE})
+
+    # Все товары запроса добавляются одной командой, количество прибавляется к уже лежащему в корзине
+    cart_items = await upsert_cart_items(async_session, user.id, merge_cart_items(items_to_add.items))
+    mark_user_write(response, user)
+    return cart_items
+
+
+@cart_router.put("/items/{product_id}", response_model=CartItemQuantity)
+async def set_cart_item_quantity(
+        product_id: int,
+        quantity_to_set: CartQuantityToSet,
+        response: Response,
+        user: UserIdRole = Depends(check_jwt_access_token),
+        async_session: AsyncSession = Depends(get_async_session)):
+    if user.role != "user":
+        return JSONResponse(status_code=403, content={"message": GUEST_CART_ACCESS_MESSAGE})
+
+    cart_items = await upsert_cart_items(async_session, user.id, {product_id: quantity_to_set.quantity}, add=False)
+    mark_user_write(response, user)
+    return cart_items[0]
+
+
+@cart_router.delete("/items/{product_id}", status_code=204)
+async def delete_cart_item(
+        product_id: int,
+        response: Response,
+        user: UserIdRole = Depends(check_jwt_access_token),
+        async_session: AsyncSession = Depends(get_async_session)):
+    if user.role != "user":
+        return JSONResponse(status_code=403, content={"message": GUEST_CART_ACCESS_MESSAGE})
+
+    if not await remove_cart_item(async_session, user.id, product_id):
+        return JSONResponse(status_code=404, content={"message": "Этого товара нет в корзине."})
+    mark_user_write(response, user)
+    return pass_jwt_access_token(response, Response(status_code=204))
+
+
+@cart_router.post("/checkout", response_model=OrderDTO, status_code=201)
+async def checkout(
+        checkout_request: CheckoutRequest,
+        response: Response,
+        idempotency_key: str | None = Header(default=None, max_length=64),
+        user: UserIdRole = Depends(check_jwt_access_token),
+        async_session: AsyncSession = Depends(get_async_session)):
+    if user.role != "user":
+        return JSONResponse(status_code=403, content={"message": GUEST_CART_ACCESS_MESSAGE})
+
+    # Скидка читается из бонусной карты в транзакции оформления, уровень из токена доступа не используется.
+    # Повторный запрос с тем же заголовком Idempotency-Key возвращает уже оформленный заказ
+    order, created, customer_level_name = await checkout_cart(async_session, user.id, checkout_request, idempotency_key)
+    if not created:
+        response.status_code = 200
+    elif customer_level_name is not None:
+        # Уровень, прочитанный при оформлении, записывается в токен доступа
+        await refresh_customer_level_claim(response, user, customer_level_name)
+    mark_user_write(response, user)
+    return order
@@ -1,44 +1,119 @@
-from fastapi import APIRouter, Request
+from urllib.parse import urlencode
+
+from fastapi import APIRouter, Request, Response, Query
 from fastapi.params import Depends
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload, selectinload
-from sqlalchemy.sql.expression import and_
+from fastapi.responses import HTMLResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from starlette.responses import JSONResponse
 
+from api.caching.etag import make_etag, etag_matches, set_cache_headers, not_modified_response
+from api.caching.fragment_cache import fragment_cache_context
+from api.caching.page_cache import page_cache, page_cache_key, catalog_page_version_keys, CATALOG_PAGE_TABLES
+from api.errors.catalog.exceptions import ProductSubtypeNotFound
+from api.pricing.discounts import apply_discount, apply_discount_to_prices
 from api.schemas.authentication import UserIdRole
-from api.security.authentication import check_jwt_access_token
-from database.db import async_session_maker
-from database.models import Product, ProductSubtype, ProductType, User, BonusCard
-from api.schemas.main_page import ProductTypeDTO
-import math
+from api.schemas.catalog import ProductSortKey, SortOrder, DEFAULT_SORT_ORDERS, ExportFormat
+from api.schemas.main_page import ProductCardDTO
+from api.security.authentication import check_jwt_access_token, pass_jwt_access_token
+from api.security.customer_level import get_user_discount, get_known_discount
+from api.templating.streaming import streaming_template_response
+from api.templating.templates import templates
+from config import settings
+from database.dependencies import (get_read_async_session, get_public_read_session_maker, get_cache_fill_async_session,
+                                   can_fill_cache)
+from database.actions import (get_catalog_tree_version, get_versioned_catalog_tree_from_db, get_catalog_tree_from_db,
+                              catalog_tree_has_subtype, get_subtype_products_page_from_db, SubtypeProductsPageStream)
+from database.catalog_export import stream_catalog_export
+from database.leaderboard import top_sellers_leaderboard
+
 
+catalog_router = APIRouter(prefix='/catalog')
 
-def ceil(value):
-    return math.ceil(value)
+# Количество товаров на странице каталога
+PRODUCTS_PAGE_SIZE = 16
+MAX_PRODUCTS_PAGE_SIZE = 100
 
+# Дерево каталога одинаково для всех пользователей и меняется редко: браузер и промежуточные кэши
+# используют его минуту без запроса, затем проверяют по ETag
+CATALOG_DATA_CACHE_CONTROL = "public, max-age=60"
 
-catalog_router = APIRouter(prefix='/catalog')
-templates = Jinja2Templates(directory="templates")
-templates.env.filters["ceil"] = ceil
+EXPORT_MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv; charset=utf-8"
+}
 
 
 @catalog_router.get("/catalog_data", response_class=JSONResponse)
-async def get_catalog_data():
-    async with async_session_maker() as async_session:
-        catalog_data_from_db = await async_session.execute(
-            select(ProductType)
-            .options(selectinload(ProductType.product_subtypes))
-        )
-        catalog_data_from_db = catalog_data_from_db.scalars().all()
-
-        catalog_data_dto = [
-            ProductTypeDTO.model_validate(product_type)
-            for product_type in catalog_data_from_db
-        ]
+async def get_catalog_data(
+        request: Request,
+        response: Response,
+        async_session: AsyncSession = Depends(get_cache_fill_async_session),
+        fill_cache: bool = Depends(can_fill_cache)):
+    # Если дерево каталога в кэше не изменилось, ответ 304 отправляется без запроса к БД
+    catalog_tree_version = get_catalog_tree_version()
+    if catalog_tree_version is not None:
+        etag = make_etag("catalog_data", catalog_tree_version)
+        if etag_matches(request, etag):
+            return not_modified_response(etag, CATALOG_DATA_CACHE_CONTROL)
+
+    catalog_data_dto, catalog_tree_version = await get_versioned_catalog_tree_from_db(async_session, fill_cache)
+    etag = make_etag("catalog_data", catalog_tree_version)
+    if etag_matches(request, etag):
+        return not_modified_response(etag, CATALOG_DATA_CACHE_CONTROL)
+    set_cache_headers(response, etag, CATALOG_DATA_CACHE_CONTROL)
+
+    return {"catalog_data": catalog_data_dto}
+
+
+@catalog_router.get("/export", response_class=StreamingResponse)
+async def export_catalog(
+        format: ExportFormat = ExportFormat.ndjson,
+        read_session_maker: async_sessionmaker = Depends(get_public_read_session_maker)):
+    # Каталог выгружается по частям во время отправки ответа, цены - без скидок
+    return StreamingResponse(
+        stream_catalog_export(read_session_maker, format, settings.CATALOG_EXPORT_FETCH_SIZE),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="catalog.{format.value}"'}
+    )
+
+
+class CatalogPagination:
+    """
+    Ссылки постраничной навигации каталога. При потоковой передаче страницы курсор следующей страницы
+    известен только после чтения всех ее товаров, поэтому шаблон получает ссылку из этого объекта
+    в момент рендеринга навигации
+    """
+    def __init__(self, sort: ProductSortKey, order: SortOrder, limit: int, cursor: str | None,
+                 next_cursor: str | None = None):
+        self.sort = sort
+        self.order = order
+        self.limit = limit
+        self.is_first_page = cursor is None
+        self.next_cursor = next_cursor
+
+    @property
+    def first_page_query(self) -> str:
+        return urlencode({"sort": self.sort.value, "order": self.order.value, "limit": self.limit})
+
+    @property
+    def next_page_query(self) -> str | None:
+        if self.next_cursor is None:
+            return None
+        return urlencode({
+            "sort": self.sort.value, "order": self.order.value, "limit": self.limit, "cursor": self.next_cursor})
+
 
-        return {"catalog_data": catalog_data_dto}
+async def with_discounted_prices(
+        products_stream: SubtypeProductsPageStream,
+        product_prices: dict,
+        discount_amount_in_percent: int,
+        pagination: CatalogPagination):
+    # Цена со скидкой рассчитывается перед рендерингом карточки товара, курсор следующей страницы
+    # передается в навигацию после чтения всех товаров
+    async for product in products_stream:
+        product_prices[product.id] = apply_discount(product.price, discount_amount_in_percent)
+        yield product
+    pagination.next_cursor = products_stream.next_cursor
 
 
 @catalog_router.get('/{product_type}/{product_subtype}', response_class=HTMLResponse)
@@ -46,39 +121,118 @@ async def get_items(
         request: Request,
         product_type: str,
         product_subtype: str,
-        user: UserIdRole = Depends(check_jwt_access_token)):
-    async with async_session_maker() as async_session:
-        products_from_db = await async_session.execute(
-            select(Product)
-            .join(ProductSubtype)
-            .join(ProductType)
-            .where(
-                and_(
-                    ProductSubtype.name == product_subtype,
-                    ProductType.name == product_type))
-        )
-        products_from_db = products_from_db.scalars().all()
-
-        # Заменить на HTML страницу
-        # if not products_from_db:
-        #     return JSONResponse(status_code=404, content={"detail": "Запрашиваемый ресурс не найден."})
-
-        if user.role == "user":
-            user_from_db = await async_session.execute(
-                select(User)
-                .where(User.id == user.id)
-                .options(joinedload(User.bonus_card).joinedload(BonusCard.customer_level))
-            )
-            user_from_db = user_from_db.scalar()
-            for product in products_from_db:
-                product.price = product.price - (
-                        product.price / 100 * user_from_db.bonus_card.customer_level.discount_amount_in_percent)
-
-        return templates.TemplateResponse(
-            name="catalog.html",
-            context={
-                "request": request,
-                "product_type": product_type,
-                "product_subtype": product_subtype,
-                "products_from_db": products_from_db
-            })
+        response: Response,
+        sort: ProductSortKey = ProductSortKey.number_of_sales,
+        order: SortOrder | None = None,
+        cursor: str | None = None,
+        limit: int = Query(default=PRODUCTS_PAGE_SIZE, ge=1, le=MAX_PRODUCTS_PAGE_SIZE),
+        user: UserIdRole = Depends(check_jwt_access_token),
+        async_session: AsyncSession = Depends(get_cache_fill_async_session),
+        read_session_maker: async_sessionmaker = Depends(get_public_read_session_maker),
+        fill_cache: bool = Depends(can_fill_cache)):
+    # Готовая страница берется из кэша, если скидка известна без обращения к БД.
+    # При промахе страница и фрагменты сохраняются в кэш, только если данные прочитаны не с отстающей копии БД
+    order = order or DEFAULT_SORT_ORDERS[sort]
+    page_params = (product_type, product_subtype, sort.value, order.value, cursor, limit)
+    discount_amount_in_percent = get_known_discount(user, 0)
+    if discount_amount_in_percent is not None:
+        catalog_html = page_cache.get(
+            page_cache_key("catalog.html", page_params, user.role, discount_amount_in_percent))
+        if catalog_html is not None:
+            return pass_jwt_access_token(response, HTMLResponse(catalog_html))
+
+    table_versions = page_cache.snapshot_versions(catalog_page_version_keys(product_subtype))
+    fragment_context = fragment_cache_context(CATALOG_PAGE_TABLES) if fill_cache else dict()
+    streaming = 0 < settings.CATALOG_STREAMING_MIN_PAGE_SIZE <= limit
+    if streaming:
+        # Товары большой страницы читаются из БД во время отправки страницы
+        products_stream = SubtypeProductsPageStream(
+            read_session_maker, product_type, product_subtype, sort, order, cursor, limit)
+    else:
+        products_from_db, next_cursor = await get_subtype_products_page_from_db(
+            async_session, product_type, product_subtype, sort, order, cursor, limit)
+
+    # Заменить на HTML страницу
+    # if not products_from_db:
+    #     return JSONResponse(status_code=404, content={"detail": "Запрашиваемый ресурс не найден."})
+
+    if discount_amount_in_percent is None:
+        # Уровень бонусной карты в токене доступа устарел - скидку ищем в БД
+        discount_amount_in_percent = await get_user_discount(user, response, async_session)
+    cache_key = page_cache_key("catalog.html", page_params, user.role, discount_amount_in_percent)
+
+    # Возвращаем соединение в пул до рендеринга шаблона,
+    # отсоединенные от сессии объекты остаются доступны для чтения
+    await async_session.close()
+
+    context = {
+        "request": request,
+        **fragment_context,
+        "product_type": product_type,
+        "product_subtype": product_subtype,
+        "sort": sort.value,
+        "order": order.value
+    }
+    # Страница без товаров (в том числе несуществующей категории) не сохраняется в кэш,
+    # чтобы запросами произвольных адресов нельзя было вытеснить из него остальные страницы
+    if streaming:
+        pagination = CatalogPagination(sort, order, limit, cursor)
+        product_prices = dict()
+
+        def cache_catalog_page(catalog_html: bytes):
+            if fill_cache and product_prices:
+                page_cache.set(cache_key, catalog_html, table_versions)
+
+        context.update({
+            "products_from_db": with_discounted_prices(
+                products_stream, product_prices, discount_amount_in_percent, pagination),
+            "product_prices": product_prices,
+            "pagination": pagination
+        })
+        return pass_jwt_access_token(response, streaming_template_response(
+            "catalog.html", context, on_complete=cache_catalog_page))
+
+    # Цены со скидкой рассчитываются отдельно, объекты ORM не изменяются
+    context.update({
+        "products_from_db": products_from_db,
+        "product_prices": apply_discount_to_prices(
+            ((product.id, product.price) for product in products_from_db), discount_amount_in_percent),
+        "pagination": CatalogPagination(sort, order, limit, cursor, next_cursor)
+    })
+    catalog_html = templates.TemplateResponse(name="catalog.html", context=context)
+    if fill_cache and products_from_db:
+        page_cache.set(cache_key, catalog_html.body, table_versions)
+    return pass_jwt_access_token(response, catalog_html)
+
+
+@catalog_router.get('/{product_type}/{product_subtype}/bestsellers', response_model=list[ProductCardDTO])
+async def get_subtype_bestsellers(
+        product_type: str,
+        product_subtype: str,
+        response: Response,
+        user: UserIdRole = Depends(check_jwt_access_token),
+        async_session: AsyncSession = Depends(get_read_async_session),
+        cache_fill_session: AsyncSession = Depends(get_cache_fill_async_session),
+        fill_cache: bool = Depends(can_fill_cache)):
+    # Лидеры продаж берутся из списков, обновляемых по расписанию, БД нужна только для устаревшей скидки
+    leaderboard = await top_sellers_leaderboard.get_leaderboard()
+    bestsellers_dto = leaderboard.get_subtype_top_sellers(product_type, product_subtype)
+    if bestsellers_dto is None:
+        # Подтип мог быть создан после обновления списков - тогда он есть в дереве каталога, а лидеров продаж нет
+        catalog_tree = await get_catalog_tree_from_db(cache_fill_session, fill_cache)
+        await cache_fill_session.close()
+        if not catalog_tree_has_subtype(catalog_tree, product_type, product_subtype):
+            raise ProductSubtypeNotFound()
+        bestsellers_dto = ()
+
+    if user.role == "user":
+        discount_amount_in_percent = await get_user_discount(user, response, async_session)
+        await async_session.close()
+        bestsellers_prices = apply_discount_to_prices(
+            ((product.id, product.price) for product in bestsellers_dto), discount_amount_in_percent)
+        bestsellers_dto = [
+            product.model_copy(update={"price": float(bestsellers_prices[product.id])})
+            for product in bestsellers_dto
+        ]
+
+    return bestsellers_dto
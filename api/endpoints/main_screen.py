@@ -1,18 +1,21 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from api.caching.etag import make_etag, etag_matches, set_cache_headers, not_modified_response
+from api.pricing.discounts import apply_discount_to_prices
 from api.schemas.authentication import UserIdRole
-from database.actions import get_images_from_db, get_user_with_bonus_card_from_db
-from database.db import async_session_maker
-from database.models import MainInfoImage
-from api.schemas.main_page import ImageDTO, ProductTypeDTO, ProductCardDTO
-from sqlalchemy import select, desc
-from sqlalchemy.orm import selectinload
-from database.models import ProductType, PromotionImage, Product, ServiceImage
+from database.dependencies import get_read_async_session, get_cache_fill_async_session, can_fill_cache
+from database.main_page import load_main_page_data, get_main_page_version
+from database.routing import replica_router
 from api.errors.headers.exceptions import HeaderMissing
-from api.security.authentication import check_jwt_access_token
+from api.security.authentication import check_jwt_access_token, pass_jwt_access_token
+from api.security.customer_level import get_fresh_customer_level_claim, refresh_customer_level_claim
 
 main_screen_router = APIRouter()
 
+# Главная страница содержит данные пользователя: хранится только в браузере и проверяется при каждом запросе
+MAIN_PAGE_CACHE_CONTROL = "private, no-cache"
+
 
 @main_screen_router.get('/headers')
 async def get_headers(request: Request):
@@ -31,50 +34,61 @@ async def get_headers(request: Request):
 
 
 @main_screen_router.get('/')
-async def get_main_page_info(user: UserIdRole = Depends(check_jwt_access_token)):
-    async with async_session_maker() as async_session:
-        main_info_images_dto = await get_images_from_db(MainInfoImage, ImageDTO, async_session)
-
-        product_types_subtypes_from_db = await async_session.execute(
-            select(ProductType)
-            .options(selectinload(ProductType.product_subtypes))
-        )
-        product_types_subtypes_from_db = product_types_subtypes_from_db.scalars().all()
-        product_types_subtypes_dto = [
-            ProductTypeDTO.model_validate(product_type)
-            for product_type in product_types_subtypes_from_db
-        ]
-
-        promotion_images_dto = await get_images_from_db(PromotionImage, ImageDTO, async_session)
-
-        top_sellers_from_db = await async_session.execute(
-            select(Product)
-            .order_by(desc(Product.number_of_sales))
-            .limit(10)
-        )
-        top_sellers_from_db = top_sellers_from_db.scalars().all()
+async def get_main_page_info(
+        request: Request,
+        response: Response,
+        user: UserIdRole = Depends(check_jwt_access_token),
+        async_session: AsyncSession = Depends(get_read_async_session),
+        cache_fill_session: AsyncSession = Depends(get_cache_fill_async_session),
+        fill_cache: bool = Depends(can_fill_cache)):
+    # Уровень бонусной карты загружаем вместе с данными страницы, только если он устарел в токене доступа
+    customer_level = get_fresh_customer_level_claim(user)
+    discount_amount_in_percent = 0
+    if user.role == "user" and customer_level is not None:
+        discount_amount_in_percent = customer_level.discount_amount_in_percent
+
+    # Если скидка известна из токена доступа, а данные страницы в кэше не изменились,
+    # ответ 304 отправляется без запроса к БД
+    if user.role != "user" or customer_level is not None:
+        main_page_version = await get_main_page_version()
+        if main_page_version is not None:
+            etag = make_etag("main_page", user.id, user.role, discount_amount_in_percent, main_page_version)
+            if etag_matches(request, etag):
+                return pass_jwt_access_token(response, not_modified_response(etag, MAIN_PAGE_CACHE_CONTROL))
+
+    # Данные, которых нет в кэше справочных данных, загружаются и сохраняются в кэш, если копия БД не отстает
+    main_page_data = await load_main_page_data(
+        async_session, user, load_customer_level=customer_level is None, cache_fill_session=cache_fill_session,
+        store_in_cache=fill_cache)
+    await async_session.close()
+    await cache_fill_session.close()
+    top_sellers_dto = main_page_data["top_sellers"]
+
+    if user.role == "user":
+        if customer_level is None:
+            discount_amount_in_percent = await refresh_customer_level_claim(
+                response, user, main_page_data["customer_level_name"],
+                from_replica=replica_router.is_replica_session(async_session))
+        top_sellers_prices = apply_discount_to_prices(enumerate(
+            product.price for product in top_sellers_dto), discount_amount_in_percent)
         top_sellers_dto = [
-            ProductCardDTO.model_validate(product)
-            for product in top_sellers_from_db
+            product.model_copy(update={"price": float(top_sellers_prices[index])})
+            for index, product in enumerate(top_sellers_dto)
         ]
 
-        if user.role == "user":
-            user_from_db = await get_user_with_bonus_card_from_db(async_session, user)
-
-            for product in top_sellers_dto:
-                product.price = product.price - (
-                        product.price / 100 * user_from_db.bonus_card.customer_level.discount_amount_in_percent)
-
-        service_images_dto = await get_images_from_db(ServiceImage, ImageDTO, async_session)
-
-        response_data = {
-            "user_id": user.id,
-            "user_role": user.role,
-            "main_info_images": main_info_images_dto,
-            "product_types_subtypes": product_types_subtypes_dto,
-            "promotion_images": promotion_images_dto,
-            "top_sellers": top_sellers_dto,
-            "service_images": service_images_dto
-        }
+    etag = make_etag("main_page", user.id, user.role, discount_amount_in_percent, main_page_data["version"])
+    if etag_matches(request, etag):
+        return pass_jwt_access_token(response, not_modified_response(etag, MAIN_PAGE_CACHE_CONTROL))
+    set_cache_headers(response, etag, MAIN_PAGE_CACHE_CONTROL)
+
+    response_data = {
+        "user_id": user.id,
+        "user_role": user.role,
+        "main_info_images": main_page_data["main_info_images"],
+        "product_types_subtypes": main_page_data["product_types_subtypes"],
+        "promotion_images": main_page_data["promotion_images"],
+        "top_sellers": top_sellers_dto,
+        "service_images": main_page_data["service_images"]
+    }
 
     return response_data
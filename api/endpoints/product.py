@@ -1,28 +1,49 @@
 import asyncio
 import json
-from fastapi import APIRouter, WebSocket, Request, Depends
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, WebSocket, Request, Depends, Response, Query
 from fastapi.responses import HTMLResponse
 
+from api.caching.fragment_cache import fragment_cache, fragment_cache_context
+from api.caching.page_cache import page_cache, page_cache_key, product_page_version_keys, PRODUCT_PAGE_TABLES
+from api.pricing.discounts import apply_discount, GUEST_BONUS_DISCOUNT_IN_PERCENT
 from api.schemas.authentication import UserIdRole, UserFull
-from database.actions import get_user_by_id_from_db, get_product_feedback_by_id, get_user_with_bonus_card_from_db
+from database.actions import get_user_by_id_from_db, get_product_feedback_by_id, get_product_feedbacks_page_from_db, \
+    add_feedback_to_product_aggregates, remove_feedback_from_product_aggregates
 from database.db import async_session_maker
+from database.dependencies import get_read_async_session, get_cache_fill_async_session, can_fill_cache
 from database.models import Product, ProductFeedback, ProductSubtype
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from api.schemas.feedback import FeedbackTextWebsocket, FeedbackCreateToSend, FeedbackUpdateToSend, \
-    NotAuthorizedUser, AdminCommentWebsocket, DeleteFeedbackWebsocket, FeedbackDeleteToSend, Feedback
-from api.security.authentication import check_jwt_access_token
+    NotAuthorizedUser, AdminCommentWebsocket, DeleteFeedbackWebsocket, FeedbackDeleteToSend, Feedback, \
+    ProductFeedbackDTO, ProductFeedbackPageDTO
+from api.security.authentication import check_jwt_access_token, pass_jwt_access_token
+from api.security.customer_level import get_user_discount, get_known_discount
+from api.templating.templates import templates
 from pydantic import ValidationError
-from jinja2 import Environment, FileSystemLoader
 
 product_page_router = APIRouter(prefix="/catalog/product")
-# Инициализация директории шаблонов (для создания TemplateResponse)
-templates = Jinja2Templates(directory="templates")
-# Инициализация переменной окружения (для загрузки HTML-шаблона в websocket)
-env = Environment(loader=FileSystemLoader(searchpath="templates"))
 connected_users: dict[WebSocket, str] = dict()
 
+# Формат даты отзыва "день.месяц.год час:минута"
+FEEDBACK_DATE_FORMAT = "%d.%m.%Y %H:%M"
+# Количество отзывов, выводимых на странице продукта и подгружаемых кнопкой "Показать еще"
+FEEDBACKS_PAGE_SIZE = 10
+MAX_FEEDBACKS_PAGE_SIZE = 50
+
+
+def get_feedback_dto(feedback) -> ProductFeedbackDTO:
+    return ProductFeedbackDTO(
+        id=feedback.id,
+        user_name=f"{feedback.first_name} {feedback.last_name[0]}.",
+        feedback_date=feedback.date_of_update.strftime(FEEDBACK_DATE_FORMAT),
+        liked_text=feedback.liked_text,
+        disliked_text=feedback.disliked_text,
+        admin_comment=feedback.admin_comment,
+        rating=feedback.rating
+    )
+
 
 async def connect_guest(websocket: WebSocket):
     connected_users[websocket] = "guest"
@@ -54,10 +75,16 @@ async def connect_user(websocket: WebSocket, user_id: int, product_id: int, asyn
                     author_id=user_id,
                     product_id=product_id,
                     liked_text=new_feedback_data.liked_text,
-                    disliked_text=new_feedback_data.disliked_text
+                    disliked_text=new_feedback_data.disliked_text,
+                    rating=new_feedback_data.rating
                 )
                 async_session.add(new_feedback)
+                # Сводные данные по отзывам товара изменяются в той же транзакции, что и сам отзыв
+                await add_feedback_to_product_aggregates(async_session, new_feedback)
                 await async_session.commit()
+                # Другие процессы узнают об изменении отзывов из уведомления БД, этот - сразу
+                page_cache.row_changed(ProductFeedback.__tablename__, str(product_id))
+                fragment_cache.row_changed(ProductFeedback.__tablename__, str(product_id))
                 await async_session.refresh(new_feedback)
 
                 new_feedback = Feedback.model_validate(new_feedback)
@@ -65,14 +92,14 @@ async def connect_user(websocket: WebSocket, user_id: int, product_id: int, asyn
                 feedback_json_data = {
                     "id": new_feedback.id,
                     "user_name": f"{user_from_db.first_name} {user_from_db.last_name[0]}.",
-                    "feedback_date": new_feedback.date_of_update.strftime("%d.%m.%Y %H:%M"),
+                    "feedback_date": new_feedback.date_of_update.strftime(FEEDBACK_DATE_FORMAT),
                     "liked_text": new_feedback.liked_text,
                     "disliked_text": new_feedback.disliked_text
                 }
 
-                # Загружаем HTML-шаблоны
-                user_template_feedback = env.get_template("user_new_feedback.html")
-                admin_template_feedback = env.get_template("admin_new_feedback.html")
+                # Берем HTML-шаблоны, скомпилированные при запуске приложения
+                user_template_feedback = templates.get_template("user_new_feedback.html")
+                admin_template_feedback = templates.get_template("admin_new_feedback.html")
                 # Заполняем их данными
                 user_feedback_html = user_template_feedback.render(feedback_json_data)
                 admin_feedback_html = admin_template_feedback.render(feedback_json_data)
@@ -111,6 +138,8 @@ async def connect_admin(websocket: WebSocket, async_session):
 
                 feedback_to_update.admin_comment = new_admin_comment.admin_comment
                 await async_session.commit()
+                page_cache.row_changed(ProductFeedback.__tablename__, str(feedback_to_update.product_id))
+                fragment_cache.row_changed(ProductFeedback.__tablename__, str(feedback_to_update.product_id))
                 await async_session.refresh(feedback_to_update)
 
                 for user_websocket in connected_users.keys():
@@ -128,8 +157,12 @@ async def connect_admin(websocket: WebSocket, async_session):
 
                 feedback_to_delete_from_db = await get_product_feedback_by_id(async_session, feedback_to_delete_id)
 
+                product_id = feedback_to_delete_from_db.product_id
+                await remove_feedback_from_product_aggregates(async_session, feedback_to_delete_from_db)
                 await async_session.delete(feedback_to_delete_from_db)
                 await async_session.commit()
+                page_cache.row_changed(ProductFeedback.__tablename__, str(product_id))
+                fragment_cache.row_changed(ProductFeedback.__tablename__, str(product_id))
 
                 for user_websocket in connected_users.keys():
                     await user_websocket.send_json(
@@ -181,46 +214,78 @@ async def get_new_websocket_data(websocket: WebSocket) -> FeedbackTextWebsocket
 
 
 @product_page_router.get('/{product_id}', response_class=HTMLResponse)
-async def get_product_page(request: Request, product_id: int, user: UserIdRole = Depends(check_jwt_access_token)):
-    async with async_session_maker() as async_session:
-        # Получаем информацию о продукте из БД
-        product_from_db = await async_session.execute(
-            select(Product)
-            .where(Product.id == product_id)
-            .options(
-                joinedload(Product.product_subtype).joinedload(ProductSubtype.type),
-                selectinload(Product.feedbacks).joinedload(ProductFeedback.author)
-            )
-        )
-        product = product_from_db.scalar()
-
-        # Если пользователь не гость, то рассчитываем скидочную цену
-        if user.role == "user":
-            user_from_db = await get_user_with_bonus_card_from_db(async_session, user)
-            product_bonus_price = product.price - (
-                    product.price / 100 * user_from_db.bonus_card.customer_level.discount_amount_in_percent)
-        else:
-            product_bonus_price = product.price - (product.price / 100 * 3)
-
-        # Приводим дату создания отзыва к формату "день.месяц.год час:минута"
-        for feedback in product.feedbacks:
-            feedback.date_of_update = feedback.date_of_update.strftime("%d.%m.%Y %H:%M")
-
-        # Заполняем страницу продукта данными
-        product_html = templates.TemplateResponse(
-            name="product.html",
-            context={
-                "request": request,
-                "product_type": product.product_subtype.type.name,
-                "product_subtype": product.product_subtype.name,
-                "product_name": product.name,
-                "product_description": product.description,
-                "product_bonus_price": product_bonus_price,
-                "product_price": product.price,
-                "product_availability": product.quantity_in_stock,
-                "product_image_link": product.image_link,
-                "feedbacks": product.feedbacks,
-                "role": user.role
-            }
-        )
-        return product_html
+async def get_product_page(
+        request: Request,
+        product_id: int,
+        response: Response,
+        user: UserIdRole = Depends(check_jwt_access_token),
+        async_session: AsyncSession = Depends(get_cache_fill_async_session),
+        fill_cache: bool = Depends(can_fill_cache)):
+    # Готовая страница берется из кэша, если скидка известна без обращения к БД.
+    # При промахе страница и фрагменты сохраняются в кэш, только если данные прочитаны не с отстающей копии БД
+    discount_amount_in_percent = get_known_discount(user, GUEST_BONUS_DISCOUNT_IN_PERCENT)
+    if discount_amount_in_percent is not None:
+        product_html = page_cache.get(
+            page_cache_key("product.html", (product_id,), user.role, discount_amount_in_percent))
+        if product_html is not None:
+            return pass_jwt_access_token(response, HTMLResponse(product_html))
+
+    table_versions = page_cache.snapshot_versions(product_page_version_keys(product_id))
+    fragment_context = fragment_cache_context(PRODUCT_PAGE_TABLES) if fill_cache else dict()
+    # Получаем информацию о продукте из БД
+    product_from_db = await async_session.execute(
+        select(Product)
+        .where(Product.id == product_id)
+        .options(joinedload(Product.product_subtype).joinedload(ProductSubtype.type))
+    )
+    product = product_from_db.scalar()
+    # На странице выводятся только последние отзывы, остальные подгружаются постранично
+    feedbacks_from_db, feedbacks_next_cursor = await get_product_feedbacks_page_from_db(
+        async_session, product_id, None, FEEDBACKS_PAGE_SIZE)
+
+    if discount_amount_in_percent is None:
+        # Уровень бонусной карты в токене доступа устарел - скидку ищем в БД
+        discount_amount_in_percent = await get_user_discount(user, response, async_session)
+    product_bonus_price = apply_discount(product.price, discount_amount_in_percent)
+
+    # Работа с БД закончена - возвращаем соединение в пул до рендеринга шаблона
+    await async_session.close()
+
+    # Заполняем страницу продукта данными
+    product_html = templates.TemplateResponse(
+        name="product.html",
+        context={
+            "request": request,
+            **fragment_context,
+            "product_id": product_id,
+            "product_type": product.product_subtype.type.name,
+            "product_subtype": product.product_subtype.name,
+            "product_name": product.name,
+            "product_description": product.description,
+            "product_bonus_price": product_bonus_price,
+            "product_price": product.price,
+            "product_availability": product.quantity_in_stock,
+            "product_image_link": product.image_link,
+            "feedbacks": [get_feedback_dto(feedback) for feedback in feedbacks_from_db],
+            "feedbacks_next_cursor": feedbacks_next_cursor,
+            "feedbacks_count": product.feedbacks_count,
+            "role": user.role
+        }
+    )
+    if fill_cache:
+        page_cache.set(
+            page_cache_key("product.html", (product_id,), user.role, discount_amount_in_percent),
+            product_html.body, table_versions)
+    return pass_jwt_access_token(response, product_html)
+
+
+@product_page_router.get('/{product_id}/feedbacks', response_model=ProductFeedbackPageDTO)
+async def get_product_feedbacks(
+        product_id: int,
+        cursor: str | None = None,
+        limit: int = Query(default=FEEDBACKS_PAGE_SIZE, ge=1, le=MAX_FEEDBACKS_PAGE_SIZE),
+        async_session: AsyncSession = Depends(get_read_async_session)):
+    feedbacks_from_db, next_cursor = await get_product_feedbacks_page_from_db(async_session, product_id, cursor, limit)
+    return ProductFeedbackPageDTO(
+        feedbacks=[get_feedback_dto(feedback) for feedback in feedbacks_from_db],
+        next_cursor=next_cursor)
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.pricing.discounts import apply_discount_to_prices
+from api.schemas.authentication import UserIdRole
+from api.schemas.catalog import ProductSearchResultDTO, ProductSearchPageDTO, SuggestionDTO
+from api.security.authentication import check_jwt_access_token
+from api.security.customer_level import get_user_discount
+from database.actions import search_products_page_from_db
+from database.dependencies import get_read_async_session
+from database.suggestions import product_suggestions, MAX_SUGGESTIONS
+
+search_router = APIRouter(prefix="/catalog")
+
+# Количество товаров на странице результатов поиска
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+# Количество подсказок при наборе запроса
+SUGGESTIONS_LIMIT = 10
+
+
+@search_router.get("/search", response_model=ProductSearchPageDTO)
+async def search_products(
+        response: Response,
+        q: str = Query(min_length=1, max_length=200),
+        cursor: str | None = None,
+        limit: int = Query(default=SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+        user: UserIdRole = Depends(check_jwt_access_token),
+        async_session: AsyncSession = Depends(get_read_async_session)):
+    products_from_db, next_cursor = await search_products_page_from_db(async_session, q, cursor, limit)
+
+    discount_amount_in_percent = 0
+    if user.role == "user":
+        discount_amount_in_percent = await get_user_discount(user, response, async_session)
+    await async_session.close()
+
+    product_prices = apply_discount_to_prices(
+        ((product.id, product.price) for product, rank in products_from_db), discount_amount_in_percent)
+
+    return ProductSearchPageDTO(
+        products=[
+            ProductSearchResultDTO.model_validate(product).model_copy(update={"price": float(product_prices[product.id])})
+            for product, rank in products_from_db
+        ],
+        next_cursor=next_cursor)
+
+
+@search_router.get("/suggest", response_model=list[SuggestionDTO])
+async def suggest_products(
+        q: str = Query(min_length=1, max_length=100),
+        limit: int = Query(default=SUGGESTIONS_LIMIT, ge=1, le=MAX_SUGGESTIONS)):
+    # Подсказки выдаются из индекса в памяти, соединение с БД не занимается
+    suggestion_index = await product_suggestions.get_index()
+    return suggestion_index.suggest(q, limit)
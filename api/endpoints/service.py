@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends
+from starlette.responses import JSONResponse
+
+from api.caching.fragment_cache import fragment_cache
+from api.caching.page_cache import page_cache
+from api.schemas.authentication import UserIdRole
+from api.security.authentication import check_jwt_access_token
+from api.templating.templates import templates_preloader
+from database.cache import reference_data_cache
+from database.db import async_engine, async_replica_engine
+from database.pool import get_pool_stats
+
+service_router = APIRouter(prefix="/service")
+
+
+@service_router.get("/pool_stats")
+async def get_db_pool_stats(user: UserIdRole = Depends(check_jwt_access_token)):
+    if user.role == "admin":
+        return {
+            "primary": get_pool_stats(async_engine),
+            "replica": get_pool_stats(async_replica_engine)
+        }
+    else:
+        return JSONResponse(
+            status_code=403,
+            content={"message": "Недостаточно прав доступа. Статистика доступна только администратору."})
+
+
+@service_router.get("/cache_stats")
+async def get_cache_stats(user: UserIdRole = Depends(check_jwt_access_token)):
+    if user.role == "admin":
+        return {
+            "reference_data": reference_data_cache.stats(),
+            "pages": page_cache.stats(),
+            "fragments": fragment_cache.stats()
+        }
+    else:
+        return JSONResponse(
+            status_code=403,
+            content={"message": "Недостаточно прав доступа. Статистика доступна только администратору."})
+
+
+@service_router.get("/templates_stats")
+async def get_templates_stats(user: UserIdRole = Depends(check_jwt_access_token)):
+    if user.role == "admin":
+        return templates_preloader.stats()
+    else:
+        return JSONResponse(
+            status_code=403,
+            content={"message": "Недостаточно прав доступа. Статистика доступна только администратору."})
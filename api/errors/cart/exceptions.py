@@ -0,0 +1,42 @@
+from fastapi import HTTPException
+
+
+class CartProductNotFound(HTTPException):
+    def __init__(self, status_code: int = 404):
+        detail = "Product not found"
+        message = "Товар не найден. Возможно, он был удален из каталога."
+        super().__init__(status_code=status_code, detail=detail)
+        self.message = message
+
+
+class EmptyCart(HTTPException):
+    def __init__(self, status_code: int = 409):
+        detail = "Cart is empty"
+        message = "Корзина пуста. Добавьте товары в корзину, чтобы оформить заказ."
+        super().__init__(status_code=status_code, detail=detail)
+        self.message = message
+
+
+class OutOfStock(HTTPException):
+    def __init__(self, product_ids: list[int], status_code: int = 409):
+        detail = "Not enough products in stock"
+        message = "Некоторых товаров нет в нужном количестве. Измените количество в корзине и повторите заказ."
+        super().__init__(status_code=status_code, detail=detail)
+        self.message = message
+        self.product_ids = product_ids
+
+
+class CheckoutAddressNotFound(HTTPException):
+    def __init__(self, status_code: int = 404):
+        detail = "Address not found"
+        message = "Адрес доставки не найден. Выберите один из своих адресов."
+        super().__init__(status_code=status_code, detail=detail)
+        self.message = message
+
+
+class InvalidCheckoutOption(HTTPException):
+    def __init__(self, status_code: int = 422):
+        detail = "Invalid delivery type or payment method"
+        message = "Выбран неизвестный способ доставки или оплаты."
+        super().__init__(status_code=status_code, detail=detail)
+        self.message = message
@@ -0,0 +1,56 @@
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from api.errors.cart.exceptions import CartProductNotFound, EmptyCart, OutOfStock, CheckoutAddressNotFound, \
+    InvalidCheckoutOption
+
+
+async def cart_product_not_found_exception_handler(request: Request, exception: CartProductNotFound):
+    return JSONResponse(
+        status_code=exception.status_code,
+        content={
+            "error": exception.detail,
+            "message": exception.message
+        }
+    )
+
+
+async def empty_cart_exception_handler(request: Request, exception: EmptyCart):
+    return JSONResponse(
+        status_code=exception.status_code,
+        content={
+            "error": exception.detail,
+            "message": exception.message
+        }
+    )
+
+
+async def out_of_stock_exception_handler(request: Request, exception: OutOfStock):
+    return JSONResponse(
+        status_code=exception.status_code,
+        content={
+            "error": exception.detail,
+            "message": exception.message,
+            "product_ids": exception.product_ids
+        }
+    )
+
+
+async def checkout_address_not_found_exception_handler(request: Request, exception: CheckoutAddressNotFound):
+    return JSONResponse(
+        status_code=exception.status_code,
+        content={
+            "error": exception.detail,
+            "message": exception.message
+        }
+    )
+
+
+async def invalid_checkout_option_exception_handler(request: Request, exception: InvalidCheckoutOption):
+    return JSONResponse(
+        status_code=exception.status_code,
+        content={
+            "error": exception.detail,
+            "message": exception.message
+        }
+    )
@@ -0,0 +1,17 @@
+from fastapi import HTTPException
+
+
+class InvalidCursor(HTTPException):
+    def __init__(self, status_code: int = 400):
+        detail = "Invalid pagination cursor"
+        message = "Некорректный курсор страницы. Откройте первую страницу списка заново."
+        super().__init__(status_code=status_code, detail=detail)
+        self.message = message
+
+
+class ProductSubtypeNotFound(HTTPException):
+    def __init__(self, status_code: int = 404):
+        detail = "Product subtype not found"
+        message = "Такой категории товаров нет в каталоге."
+        super().__init__(status_code=status_code, detail=detail)
+        self.message = message
@@ -0,0 +1,24 @@
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from api.errors.catalog.exceptions import InvalidCursor, ProductSubtypeNotFound
+
+
+async def invalid_cursor_exception_handler(request: Request, exception: InvalidCursor):
+    return JSONResponse(
+        status_code=exception.status_code,
+        content={
+            "error": exception.detail,
+            "message": exception.message
+        }
+    )
+
+
+async def product_subtype_not_found_exception_handler(request: Request, exception: ProductSubtypeNotFound):
+    return JSONResponse(
+        status_code=exception.status_code,
+        content={
+            "error": exception.detail,
+            "message": exception.message
+        }
+    )
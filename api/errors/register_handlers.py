@@ -4,6 +4,8 @@ from fastapi import Request
 
 from api.errors.authentication import exceptions as auth_exc, handlers as auth_handlers
 from api.errors.user_profile import exceptions as user_profile_exc, handlers as user_profile_handlers
+from api.errors.catalog import exceptions as catalog_exc, handlers as catalog_handlers
+from api.errors.cart import exceptions as cart_exc, handlers as cart_handlers
 
 
 def register_exception_handlers(app: FastAPI):
@@ -47,3 +49,31 @@ def register_exception_handlers(app: FastAPI):
     @app.exception_handler(user_profile_exc.InvalidLength)
     async def invalid_length_exception_handler_(request: Request, exception: user_profile_exc.InvalidLength):
         return await user_profile_handlers.invalid_length_exception_handler(request=request, exception=exception)
+
+    @app.exception_handler(catalog_exc.InvalidCursor)
+    async def invalid_cursor_exception_handler_(request: Request, exception: catalog_exc.InvalidCursor):
+        return await catalog_handlers.invalid_cursor_exception_handler(request=request, exception=exception)
+
+    @app.exception_handler(catalog_exc.ProductSubtypeNotFound)
+    async def product_subtype_not_found_exception_handler_(request: Request, exception: catalog_exc.ProductSubtypeNotFound):
+        return await catalog_handlers.product_subtype_not_found_exception_handler(request=request, exception=exception)
+
+    @app.exception_handler(cart_exc.CartProductNotFound)
+    async def cart_product_not_found_exception_handler_(request: Request, exception: cart_exc.CartProductNotFound):
+        return await cart_handlers.cart_product_not_found_exception_handler(request=request, exception=exception)
+
+    @app.exception_handler(cart_exc.EmptyCart)
+    async def empty_cart_exception_handler_(request: Request, exception: cart_exc.EmptyCart):
+        return await cart_handlers.empty_cart_exception_handler(request=request, exception=exception)
+
+    @app.exception_handler(cart_exc.OutOfStock)
+    async def out_of_stock_exception_handler_(request: Request, exception: cart_exc.OutOfStock):
+        return await cart_handlers.out_of_stock_exception_handler(request=request, exception=exception)
+
+    @app.exception_handler(cart_exc.CheckoutAddressNotFound)
+    async def checkout_address_not_found_exception_handler_(request: Request, exception: cart_exc.CheckoutAddressNotFound):
+        return await cart_handlers.checkout_address_not_found_exception_handler(request=request, exception=exception)
+
+    @app.exception_handler(cart_exc.InvalidCheckoutOption)
+    async def invalid_checkout_option_exception_handler_(request: Request, exception: cart_exc.InvalidCheckoutOption):
+        return await cart_handlers.invalid_checkout_option_exception_handler(request=request, exception=exception)
@@ -0,0 +1,47 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Hashable, Iterable
+
+# Цена "с картой", которую видит гость на странице продукта (скидка начального уровня)
+GUEST_BONUS_DISCOUNT_IN_PERCENT = 3
+
+# Цены хранятся в БД с точностью до копеек (Numeric(7, 2))
+PRICE_QUANTUM = Decimal("0.01")
+
+
+def to_decimal_price(price: Decimal | float | int) -> Decimal:
+    # float переводится через строку, чтобы 0.1 стало Decimal("0.1"), а не двоичным приближением
+    return price if isinstance(price, Decimal) else Decimal(str(price))
+
+
+def get_discount_multiplier(discount_amount_in_percent: int) -> Decimal:
+    if not 0 <= discount_amount_in_percent <= 100:
+        raise ValueError(f"Скидка должна быть от 0 до 100 процентов, получено: {discount_amount_in_percent}")
+    return (Decimal(100) - discount_amount_in_percent) / Decimal(100)
+
+
+def apply_discount(price: Decimal | float | int, discount_amount_in_percent: int) -> Decimal:
+    """
+    Функция расчета цены одного товара со скидкой
+    :param price: цена без скидки;
+    :param discount_amount_in_percent: скидка в процентах;
+    :return: цена со скидкой, округленная до копеек.
+    """
+    return (to_decimal_price(price) * get_discount_multiplier(discount_amount_in_percent)).quantize(
+        PRICE_QUANTUM, rounding=ROUND_HALF_UP)
+
+
+def apply_discount_to_prices(
+        prices: Iterable[tuple[Hashable, Decimal | float | int]],
+        discount_amount_in_percent: int) -> dict[Hashable, Decimal]:
+    """
+    Функция расчета цен со скидкой для списка товаров за один проход: множитель скидки
+    вычисляется один раз, объекты ORM не изменяются
+    :param prices: пары (id товара, цена без скидки);
+    :param discount_amount_in_percent: скидка в процентах;
+    :return: словарь {id товара: цена со скидкой, округленная до копеек}.
+    """
+    multiplier = get_discount_multiplier(discount_amount_in_percent)
+    return {
+        product_id: (to_decimal_price(price) * multiplier).quantize(PRICE_QUANTUM, rounding=ROUND_HALF_UP)
+        for product_id, price in prices
+    }
@@ -78,6 +78,24 @@ class UserIdRole(BaseModel):
     role: str
 
 
+class CustomerLevelClaim(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    name: str
+    discount_amount_in_percent: int
+    # Время выдачи (unix time), по нему определяется, не устарел ли уровень в токене
+    issued_at: float
+    # Уровень прочитан с копии БД: она могла еще не получить изменение, о котором уже пришло уведомление
+    from_replica: bool = False
+
+
+class UserToken(UserIdRole):
+    customer_level: CustomerLevelClaim | None = None
+    # Время последнего изменения данных пользователем (unix time), по нему запросы на чтение
+    # отправляются на основную БД, пока копия может не содержать изменений
+    last_write_at: float | None = None
+
+
 class UserFull(BaseModel):
     model_config = ConfigDict(from_attributes=True, validate_assignment=True)
 
@@ -0,0 +1,61 @@
+from pydantic import BaseModel, ConfigDict, Field
+
+# Максимальное количество одного товара в корзине и товаров, добавляемых одним запросом
+MAX_CART_ITEM_QUANTITY = 999
+MAX_CART_ITEMS_TO_ADD = 100
+
+
+class CartItemQuantity(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    product_id: int = Field(gt=0)
+    quantity: int = Field(ge=1, le=MAX_CART_ITEM_QUANTITY)
+
+
+class CartItemsToAdd(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    items: list[CartItemQuantity] = Field(min_length=1, max_length=MAX_CART_ITEMS_TO_ADD)
+
+
+class CartQuantityToSet(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    quantity: int = Field(ge=1, le=MAX_CART_ITEM_QUANTITY)
+
+
+class CartItemDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    product_id: int
+    name: str
+    image_link: str
+    quantity: int
+    quantity_in_stock: int | None
+    price: float
+    discounted_price: float
+
+
+class CartDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    items: list[CartItemDTO]
+    total_price: float
+    total_discounted_price: float
+
+
+class CheckoutRequest(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    delivery_type_name: str = Field(max_length=50)
+    payment_method_name: str = Field(max_length=50)
+    address_id: int
+
+
+class OrderDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    order_id: int
+    status_name: str
+    total_price: float
+    items: list[CartItemQuantity]
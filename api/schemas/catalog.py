@@ -0,0 +1,76 @@
+from enum import Enum
+
+from pydantic import BaseModel, ConfigDict
+
+
+class ProductSortKey(str, Enum):
+    price = "price"
+    rating = "rating"
+    number_of_sales = "number_of_sales"
+    name = "name"
+
+
+class SortOrder(str, Enum):
+    asc = "asc"
+    desc = "desc"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+# Порядок сортировки, если он не указан в запросе: дешевые, лучшие и популярные товары первыми
+DEFAULT_SORT_ORDERS = {
+    ProductSortKey.price: SortOrder.asc,
+    ProductSortKey.rating: SortOrder.desc,
+    ProductSortKey.number_of_sales: SortOrder.desc,
+    ProductSortKey.name: SortOrder.asc
+}
+
+
+class ProductsCursor(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    sort: ProductSortKey
+    order: SortOrder
+    # Значение ключа сортировки (цены и рейтинг - строкой, чтобы не терять точность) и id
+    # последнего товара на предыдущей странице
+    key: int | str
+    id: int
+
+
+class SearchCursor(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    # Поисковый запрос, для которого выдан курсор, ранг и id последнего товара на предыдущей странице
+    query: str
+    rank: float
+    id: int
+
+
+class ProductSearchResultDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    id: int
+    name: str
+    price: float
+    image_link: str
+    rating: float
+    product_subtype_name: str
+
+
+class ProductSearchPageDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    products: list[ProductSearchResultDTO]
+    next_cursor: str | None
+
+
+class SuggestionDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    # "category" - подтип товаров, "product" - товар
+    kind: str
+    name: str
+    url: str
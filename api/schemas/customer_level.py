@@ -0,0 +1,10 @@
+from pydantic import BaseModel, ConfigDict
+
+
+class CustomerLevelDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    name: str
+    discount_amount_in_percent: int
+    lower_threshold: int
+    level_number: int | None
@@ -1,6 +1,6 @@
 import datetime
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class UserRole:
@@ -12,6 +12,7 @@ class FeedbackTextWebsocket(BaseModel, UserRole):
 
     liked_text: str
     disliked_text: str
+    rating: int | None = Field(default=None, ge=1, le=5)
 
 
 class AdminCommentWebsocket(BaseModel, UserRole):
@@ -39,6 +40,36 @@ class Feedback(BaseModel):
     disliked_text: str
 
 
+class ProductFeedbackDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    id: int
+    # Имя и первая буква фамилии автора: "Иван П."
+    user_name: str
+    # Дата изменения отзыва в формате "день.месяц.год час:минута"
+    feedback_date: str
+    liked_text: str
+    disliked_text: str
+    admin_comment: str | None
+    rating: int | None
+
+
+class FeedbackCursor(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    # Товар, для которого выдан курсор, дата изменения и id последнего отзыва на предыдущей странице
+    product_id: int
+    date_of_update: datetime.datetime
+    id: int
+
+
+class ProductFeedbackPageDTO(BaseModel):
+    model_config = ConfigDict(from_attributes=True, validate_assignment=True)
+
+    feedbacks: list[ProductFeedbackDTO]
+    next_cursor: str | None
+
+
 class FeedbackOperationToSend(BaseModel):
     status_code: int
     operation_type: str
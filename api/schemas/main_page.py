@@ -23,6 +23,7 @@ class ProductTypeDTO(BaseModel):
 class ProductCardDTO(BaseModel):
     model_config = ConfigDict(from_attributes=True, validate_assignment=True)
 
+    id: int
     name: str
     price: float
     image_link: str
@@ -1,10 +1,12 @@
+import time
+
 import bcrypt
 from jose import jwt
 from fastapi import Request, Response
 from datetime import datetime, timedelta, timezone
 
 from config import settings
-from api.schemas.authentication import UserIdRole
+from api.schemas.authentication import UserIdRole, UserToken, CustomerLevelClaim
 
 
 def create_hashed_password(password: str):
@@ -15,12 +17,22 @@ def check_password(password: str, hashed_password: bytes):
     return bcrypt.checkpw(password=password.encode('utf-8'), hashed_password=hashed_password)
 
 
-def create_jwt_token(user_id: int, user_role: str = "guest"):
+def create_jwt_token(
+        user_id: int,
+        user_role: str = "guest",
+        customer_level: CustomerLevelClaim | None = None,
+        last_write_at: float | None = None):
     payload = {
         "id": user_id,
         "role": user_role,
         "exp": datetime.now(timezone.utc) + timedelta(hours=1)
     }
+    if customer_level is not None:
+        # Уровень бонусной карты и скидка, чтобы не искать их в БД при каждом запросе
+        payload["customer_level"] = customer_level.model_dump()
+    if last_write_at is not None and last_write_at > time.time() - settings.DB_READ_YOUR_WRITES_WINDOW:
+        # Время изменения данных нужно, только пока не истекло окно read-your-writes
+        payload["last_write_at"] = last_write_at
     return jwt.encode(claims=payload, key=settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
 
@@ -34,11 +46,41 @@ def check_jwt_access_token(request: Request, response: Response):
 
     if jwt_access_token:
         payload = jwt.decode(jwt_access_token, key=settings.SECRET_KEY, algorithms=settings.JWT_ALGORITHM)
-        new_jwt_access_token = create_jwt_token(user_id=payload["id"], user_role=payload["role"])
-        response.set_cookie(key="jwt_access_token", value=new_jwt_access_token, max_age=3600, httponly=True)
-        return UserIdRole.model_validate(payload)
+        user = UserToken.model_validate(payload)
+        new_jwt_access_token = create_jwt_token(
+            user_id=user.id, user_role=user.role, customer_level=user.customer_level, last_write_at=user.last_write_at)
+        set_jwt_access_token(response, new_jwt_access_token)
+        return user
     else:
-        return UserIdRole(id=0, role="guest")
+        return UserToken(id=0, role="guest")
+
+
+def set_jwt_access_token(response: Response, jwt_access_token: str):
+    # Токен мог быть уже выдан в этом запросе (например, при проверке токена), оставляем только последний
+    response.headers.raw[:] = [
+        (header_name, header_value)
+        for header_name, header_value in response.headers.raw
+        if not (header_name == b"set-cookie" and header_value.startswith(b"jwt_access_token="))
+    ]
+    response.set_cookie(key="jwt_access_token", value=jwt_access_token, max_age=3600, httponly=True)
+
+
+def mark_user_write(response: Response, user: UserIdRole):
+    """
+    Функция выдачи токена доступа с временем изменения данных пользователем: пока не истечет окно
+    DB_READ_YOUR_WRITES_WINDOW, запросы пользователя на чтение отправляются на основную БД (read-your-writes).
+    Время хранится в токене, а не в памяти процесса, поэтому его учитывает любой воркер uvicorn
+    (часы серверов приложения должны быть синхронизированы)
+    :param response: ответ, в который устанавливается новый токен;
+    :param user: пользователь из токена доступа.
+    """
+    last_write_at = time.time()
+    customer_level = None
+    if isinstance(user, UserToken):
+        user.last_write_at = last_write_at
+        customer_level = user.customer_level
+    set_jwt_access_token(response, create_jwt_token(
+        user_id=user.id, user_role=user.role, customer_level=customer_level, last_write_at=last_write_at))
 
 
 def set_empty_jwt_access_token(response: Response):
@@ -46,3 +88,19 @@ def set_empty_jwt_access_token(response: Response):
     response.set_cookie(key="jwt_access_token", value=empty_jwt_access_token, max_age=0, httponly=True)
     response.status_code = 204
     return response
+
+
+def pass_jwt_access_token(response: Response, returned_response: Response) -> Response:
+    """
+    FastAPI переносит cookie из зависимости Response, только если обработчик возвращает данные,
+    а не готовый ответ (например, TemplateResponse). Функция переносит выданный токен доступа в готовый ответ
+    :param response: ответ из зависимостей обработчика;
+    :param returned_response: ответ, который возвращает обработчик;
+    :return: returned_response с установленным токеном доступа.
+    """
+    returned_response.headers.raw.extend(
+        (header_name, header_value)
+        for header_name, header_value in response.headers.raw
+        if header_name == b"set-cookie" and header_value.startswith(b"jwt_access_token=")
+    )
+    return returned_response
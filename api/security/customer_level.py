@@ -0,0 +1,95 @@
+import time
+
+from fastapi import Response
+
+from api.schemas.authentication import UserIdRole, UserToken, CustomerLevelClaim
+from api.security.authentication import create_jwt_token, set_jwt_access_token
+from config import settings
+from database.actions import get_customer_level_name_from_db
+from database.customer_levels import customer_levels
+from database.routing import replica_router
+
+
+def get_fresh_customer_level_claim(user: UserIdRole) -> CustomerLevelClaim | None:
+    """
+    Функция проверки уровня бонусной карты из токена доступа. Уровень устаревает через
+    CUSTOMER_LEVEL_CLAIM_TTL, при изменении таблицы customer_levels и при изменении уровня
+    бонусной карты пользователя после выдачи токена. Уровень, прочитанный с копии БД, мог быть прочитан
+    и после уведомления об изменении, поэтому для него устаревшими считаются и токены,
+    выданные в течение DB_REPLICA_MAX_LAG после изменения
+    :param user: пользователь из токена доступа;
+    :return: уровень из токена или None, если его нет или он устарел.
+    """
+    customer_level = user.customer_level if isinstance(user, UserToken) else None
+    if customer_level is None:
+        return None
+    claims_changed_at = customer_levels.claims_changed_at(user.id)
+    if customer_level.from_replica:
+        claims_changed_at += settings.DB_REPLICA_MAX_LAG
+    if customer_level.issued_at < max(time.time() - settings.CUSTOMER_LEVEL_CLAIM_TTL, claims_changed_at):
+        return None
+    return customer_level
+
+
+async def refresh_customer_level_claim(
+        response: Response,
+        user: UserIdRole,
+        customer_level_name: str | None,
+        from_replica: bool = False) -> int:
+    """
+    Функция выдачи токена доступа с актуальным уровнем бонусной карты
+    :param response: ответ, в который устанавливается новый токен;
+    :param user: пользователь из токена доступа;
+    :param customer_level_name: название уровня из бонусной карты пользователя;
+    :param from_replica: уровень прочитан с копии БД;
+    :return: скидка пользователя в процентах.
+    """
+    customer_level = await customer_levels.get_customer_level(customer_level_name)
+    if customer_level is None:
+        return 0
+
+    customer_level_claim = CustomerLevelClaim(
+        name=customer_level.name,
+        discount_amount_in_percent=customer_level.discount_amount_in_percent,
+        issued_at=time.time(),
+        from_replica=from_replica)
+    # Время изменения данных пользователем сохраняется в новом токене, а новый уровень - в пользователе,
+    # если токен в этом же запросе выдается еще раз
+    last_write_at = None
+    if isinstance(user, UserToken):
+        user.customer_level = customer_level_claim
+        last_write_at = user.last_write_at
+    set_jwt_access_token(response, create_jwt_token(
+        user_id=user.id, user_role=user.role, customer_level=customer_level_claim, last_write_at=last_write_at))
+    return customer_level.discount_amount_in_percent
+
+
+async def get_user_discount(user: UserIdRole, response: Response, async_session) -> int:
+    """
+    Функция получения скидки пользователя: из токена доступа, если уровень в нем актуален,
+    иначе из БД с выдачей нового токена
+    :param user: пользователь из токена доступа;
+    :param response: ответ, в который при необходимости устанавливается новый токен;
+    :param async_session: экземпляр асинхронной сессии;
+    :return: скидка пользователя в процентах.
+    """
+    customer_level = get_fresh_customer_level_claim(user)
+    if customer_level is not None:
+        return customer_level.discount_amount_in_percent
+
+    customer_level_name = await get_customer_level_name_from_db(async_session, user)
+    return await refresh_customer_level_claim(
+        response, user, customer_level_name, from_replica=replica_router.is_replica_session(async_session))
+
+
+def get_known_discount(user: UserIdRole, non_user_discount_amount_in_percent: int) -> int | None:
+    """
+    Функция получения скидки без обращения к БД
+    :param user: пользователь из токена доступа;
+    :param non_user_discount_amount_in_percent: скидка для гостя и администратора;
+    :return: скидка в процентах или None, если уровень бонусной карты в токене устарел.
+    """
+    if user.role != "user":
+        return non_user_discount_amount_in_percent
+    customer_level = get_fresh_customer_level_claim(user)
+    return None if customer_level is None else customer_level.discount_amount_in_percent
@@ -0,0 +1,96 @@
+import asyncio
+from contextlib import suppress
+from typing import AsyncIterator, Callable
+
+from fastapi.responses import StreamingResponse
+from jinja2 import Template
+
+from api.templating.templates import streaming_templates_environment
+from config import settings
+
+
+async def stream_template(template: Template, context: dict, chunk_size: int) -> AsyncIterator[str]:
+    """
+    Функция потокового рендеринга шаблона. Шаблон рендерится в отдельной задаче, а готовая часть страницы
+    отправляется, как только рендеринг останавливается в ожидании данных (например, следующих строк из курсора БД)
+    или набирается chunk_size символов. Так начало страницы уходит клиенту до того, как прочитаны данные ниже
+    :param template: шаблон асинхронного окружения;
+    :param context: контекст шаблона, асинхронные итераторы в нем читаются во время рендеринга;
+    :param chunk_size: наибольший размер части страницы, после которого рендеринг ждет ее отправки;
+    :return: асинхронный итератор частей страницы.
+    """
+    parts: list[str] = []
+    parts_added = asyncio.Event()
+    parts_sent = asyncio.Event()
+    buffered_size = 0
+    rendering_done = False
+    rendering_error: Exception | None = None
+
+    async def render():
+        nonlocal buffered_size, rendering_done, rendering_error
+        try:
+            async for part in template.generate_async(context):
+                parts.append(part)
+                buffered_size += len(part)
+                parts_added.set()
+                # Рендеринг не уходит дальше отправки больше чем на одну часть страницы
+                if buffered_size >= chunk_size:
+                    parts_sent.clear()
+                    await parts_sent.wait()
+        except Exception as e:
+            rendering_error = e
+        finally:
+            rendering_done = True
+            parts_added.set()
+
+    render_task = asyncio.create_task(render())
+    try:
+        while parts or not rendering_done:
+            if not parts:
+                await parts_added.wait()
+                parts_added.clear()
+                continue
+            chunk = "".join(parts)
+            parts.clear()
+            buffered_size = 0
+            parts_sent.set()
+            yield chunk
+        if rendering_error is not None:
+            # Начало страницы уже отправлено со статусом 200: ошибка передается серверу, который обрывает
+            # соединение, чтобы клиент не принял часть страницы за всю страницу
+            print(f"Не удалось отрендерить шаблон {template.name}: {rendering_error!r}")
+            raise rendering_error
+    finally:
+        # Клиент отключился до конца страницы - рендеринг и чтение данных из БД прекращаются
+        render_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await render_task
+
+
+async def collect_chunks(chunks: AsyncIterator[str], on_complete: Callable[[bytes], None]) -> AsyncIterator[str]:
+    # Страница, отправленная полностью, передается в on_complete (например, для сохранения в кэш страниц).
+    # Если рендеринг прерван ошибкой, on_complete не вызывается
+    sent_chunks = []
+    async for chunk in chunks:
+        sent_chunks.append(chunk)
+        yield chunk
+    on_complete("".join(sent_chunks).encode())
+
+
+def streaming_template_response(
+        name: str,
+        context: dict,
+        on_complete: Callable[[bytes], None] | None = None) -> StreamingResponse:
+    """
+    Функция создания ответа, который отправляет HTML-страницу по мере рендеринга шаблона
+    (вместо TemplateResponse, который рендерит всю страницу до отправки первого байта)
+    :param name: название шаблона;
+    :param context: контекст шаблона;
+    :param on_complete: функция, которая получает страницу целиком после ее отправки;
+    :return: потоковый ответ text/html.
+    """
+    chunks = stream_template(
+        streaming_templates_environment.get_template(name), context, settings.HTML_STREAMING_CHUNK_SIZE)
+    if on_complete is not None:
+        chunks = collect_chunks(chunks, on_complete)
+    return StreamingResponse(chunks, media_type="text/html")
@@ -0,0 +1,96 @@
+import time
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from pydantic import BaseModel
+
+from api.caching.fragment_cache import FragmentCacheExtension
+from config import settings
+
+TEMPLATES_DIRECTORY = "templates"
+
+
+class TemplatesPreloadStats(BaseModel):
+    number_of_templates: int
+    preload_time_in_ms: float | None
+    bytecode_cache_enabled: bool
+    auto_reload: bool
+
+
+def create_templates_environment(
+        directory: str,
+        auto_reload: bool,
+        bytecode_cache_enabled: bool,
+        bytecode_cache_directory: str | None,
+        enable_async: bool = False) -> Environment:
+    """
+    Функция создания окружения Jinja2, общего для всех HTML-шаблонов приложения
+    :param directory: директория шаблонов;
+    :param auto_reload: True - измененные файлы шаблонов перекомпилируются (для разработки);
+    :param bytecode_cache_enabled: True - скомпилированные шаблоны сохраняются в файлы и используются
+    другими процессами и после перезапуска;
+    :param bytecode_cache_directory: директория файлов скомпилированных шаблонов (None - временная директория);
+    :param enable_async: True - окружение для асинхронного рендеринга (потоковая передача страниц);
+    :return: окружение Jinja2.
+    """
+    # Код асинхронных шаблонов отличается от синхронного, поэтому они сохраняются в отдельные файлы
+    bytecode_cache_pattern = "__jinja2_async_%s.cache" if enable_async else "__jinja2_%s.cache"
+    return Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=True,
+        auto_reload=auto_reload,
+        bytecode_cache=FileSystemBytecodeCache(
+            bytecode_cache_directory, bytecode_cache_pattern) if bytecode_cache_enabled else None,
+        # Шаблонов немного, поэтому все скомпилированные шаблоны хранятся в памяти без вытеснения
+        cache_size=-1,
+        extensions=[FragmentCacheExtension],
+        enable_async=enable_async
+    )
+
+
+class TemplatesPreloader:
+    """
+    Компиляция всех шаблонов при запуске приложения, чтобы первые запросы к страницам
+    не ждали разбора и компиляции шаблонов
+    """
+    def __init__(self, *environments: Environment):
+        self.environments = environments
+        self.number_of_templates = 0
+        self.preload_time: float | None = None
+
+    def preload(self) -> TemplatesPreloadStats:
+        started_at = time.perf_counter()
+        number_of_templates = 0
+        for environment in self.environments:
+            for template_name in environment.list_templates(extensions=["html"]):
+                environment.get_template(template_name)
+                number_of_templates += 1
+        self.preload_time = time.perf_counter() - started_at
+        self.number_of_templates = number_of_templates
+        return self.stats()
+
+    def stats(self) -> TemplatesPreloadStats:
+        return TemplatesPreloadStats(
+            number_of_templates=self.number_of_templates,
+            preload_time_in_ms=None if self.preload_time is None else round(self.preload_time * 1000, 3),
+            bytecode_cache_enabled=self.environments[0].bytecode_cache is not None,
+            auto_reload=self.environments[0].auto_reload
+        )
+
+
+# Шаблоны страниц (TemplateResponse) и фрагментов, отправляемых по websocket
+templates = Jinja2Templates(env=create_templates_environment(
+    TEMPLATES_DIRECTORY,
+    auto_reload=settings.TEMPLATES_AUTO_RELOAD,
+    bytecode_cache_enabled=settings.TEMPLATES_BYTECODE_CACHE_ENABLED,
+    bytecode_cache_directory=settings.TEMPLATES_BYTECODE_CACHE_DIRECTORY
+))
+# Те же шаблоны для потоковой передачи страниц (api.templating.streaming)
+streaming_templates_environment = create_templates_environment(
+    TEMPLATES_DIRECTORY,
+    auto_reload=settings.TEMPLATES_AUTO_RELOAD,
+    bytecode_cache_enabled=settings.TEMPLATES_BYTECODE_CACHE_ENABLED,
+    bytecode_cache_directory=settings.TEMPLATES_BYTECODE_CACHE_DIRECTORY,
+    enable_async=True
+)
+templates_preloader = TemplatesPreloader(templates.env, streaming_templates_environment)
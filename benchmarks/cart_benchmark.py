@@ -0,0 +1,86 @@
+# benchmarks.cart_benchmark.py
+# Нагрузочный тест корзины: одновременное добавление популярных товаров в корзины многих пользователей
+# (INSERT ... ON CONFLICT DO UPDATE) и сравнение добавления нескольких товаров одной командой и по одному.
+# Запуск: python -m benchmarks.cart_benchmark (нужна тестовая БД TEST_DB_NAME, она будет пересоздана)
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from benchmarks.seed import seed_database
+from benchmarks.stats import measure_async, print_report
+from config import settings
+from database.cart import upsert_cart_items
+from database.db import create_pooled_async_engine
+from database.models import CartItem
+
+
+async def add_hot_products(session_maker: async_sessionmaker, user_ids: list[int], hot_product_ids: list[int],
+                           samples: list[float], requests: int):
+    for _ in range(requests):
+        quantities = {product_id: random.randint(1, 3) for product_id in random.sample(hot_product_ids, 2)}
+        started_at = time.perf_counter()
+        async with session_maker() as async_session:
+            await upsert_cart_items(async_session, random.choice(user_ids), quantities)
+        samples.append((time.perf_counter() - started_at) * 1000)
+
+
+async def add_items_one_by_one(session_maker: async_sessionmaker, user_id: int, quantities: dict[int, int]):
+    async with session_maker() as async_session:
+        for product_id, quantity in quantities.items():
+            await upsert_cart_items(async_session, user_id, {product_id: quantity})
+
+
+async def add_items_in_one_statement(session_maker: async_sessionmaker, user_id: int, quantities: dict[int, int]):
+    async with session_maker() as async_session:
+        await upsert_cart_items(async_session, user_id, quantities)
+
+
+async def main(number_of_users: int, concurrency: int, requests: int, hot_products: int, iterations: int):
+    async_engine = create_pooled_async_engine(settings.ASYNCPG_TEST_DATABASE_URL)
+    await seed_database(async_engine, number_of_products=10_000, number_of_users=number_of_users)
+    session_maker = async_sessionmaker(async_engine, class_=AsyncSession)
+
+    user_ids = list(range(1, number_of_users + 1))
+    hot_product_ids = list(range(1, hot_products + 1))
+    print(f"Корзина, пользователей: {number_of_users}, одновременных клиентов: {concurrency}, "
+          f"запросов: {requests}, популярных товаров: {hot_products}")
+
+    samples = []
+    started_at = time.perf_counter()
+    await asyncio.gather(*(
+        add_hot_products(session_maker, user_ids, hot_product_ids, samples, requests // concurrency)
+        for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started_at
+    print_report("Добавление 2 популярных товаров", samples)
+    print(f"Пропускная способность: {len(samples) / elapsed:.0f} запросов/с")
+
+    async with session_maker() as async_session:
+        cart_items = await async_session.execute(select(func.count(), func.sum(CartItem.quantity)))
+        number_of_rows, total_quantity = cart_items.one()
+    print(f"Строк в корзинах: {number_of_rows}, товаров: {total_quantity}")
+
+    quantities = {product_id: 1 for product_id in range(hot_products + 1, hot_products + 11)}
+    print_report(
+        "10 товаров по одному",
+        await measure_async(lambda: add_items_one_by_one(session_maker, 1, quantities), iterations))
+    print_report(
+        "10 товаров одной командой",
+        await measure_async(lambda: add_items_in_one_statement(session_maker, 1, quantities), iterations))
+
+    await async_engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--hot-products", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.concurrency, args.requests, args.hot_products, args.iterations))
@@ -0,0 +1,70 @@
+# benchmarks.import_benchmark.py
+# Загрузка товаров из CSV (jobs.import_products): сначала новые товары со всеми столбцами,
+# затем прайс-лист из названий и цен для тех же товаров. Выводится скорость загрузки и пиковый расход памяти.
+# Запуск: python -m benchmarks.import_benchmark (нужна тестовая БД TEST_DB_NAME, она будет пересоздана)
+import argparse
+import asyncio
+import csv
+import random
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks.seed import seed_database, product_row, PRODUCT_TYPES
+from config import settings
+from jobs.import_products import import_products, read_csv_rows, PRODUCT_COLUMNS
+
+
+def write_products_csv(path: Path, number_of_products: int, columns: list[str]):
+    subtype_names = [name for subtype_names in PRODUCT_TYPES.values() for name in subtype_names]
+    with path.open("w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for product_id in range(1, number_of_products + 1):
+            product = product_row(product_id, subtype_names)
+            # Название товара не зависит от случайных чисел, чтобы прайс-лист совпадал с товарами
+            product["name"] = f"Товар {product_id}"
+            writer.writerow([product[column] for column in columns])
+
+
+async def import_file(async_engine, title: str, path: Path, chunk_size: int):
+    columns, rows = read_csv_rows(path)
+    started_at = time.perf_counter()
+    async with async_engine.begin() as connection:
+        number_of_rows, number_of_products = await import_products(connection, columns, rows, chunk_size)
+    elapsed = time.perf_counter() - started_at
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{title}: строк: {number_of_rows}, добавлено или изменено товаров: {number_of_products}, "
+          f"время: {elapsed:.1f} с, {number_of_rows / elapsed:.0f} строк/с, пиковая память процесса: {peak_memory:.0f} МБ")
+
+
+async def main(number_of_products: int, chunk_size: int):
+    async_engine = create_async_engine(settings.ASYNCPG_TEST_DATABASE_URL)
+    await seed_database(async_engine, number_of_products=0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        products_path = Path(directory) / "products.csv"
+        prices_path = Path(directory) / "prices.csv"
+        random.seed(1)
+        write_products_csv(products_path, number_of_products, PRODUCT_COLUMNS)
+        random.seed(2)
+        write_products_csv(prices_path, number_of_products, ["name", "price"])
+        print(f"Размер файла товаров: {products_path.stat().st_size / 1024 / 1024:.0f} МБ, "
+              f"части по {chunk_size} строк")
+
+        await import_file(async_engine, "Новые товары", products_path, chunk_size)
+        await import_file(async_engine, "Прайс-лист", prices_path, chunk_size)
+        await import_file(async_engine, "Тот же прайс-лист", prices_path, chunk_size)
+
+    await async_engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.products, args.chunk_size))
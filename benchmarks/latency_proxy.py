@@ -0,0 +1,50 @@
+# benchmarks.latency_proxy.py
+# TCP-прокси, добавляющий задержку к каждому пакету. Позволяет измерить в бенчмарках
+# влияние сетевых обменов с БД так, как если бы БД находилась на отдельном сервере
+import asyncio
+import time
+
+
+async def forward_with_delay(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delay_seconds: float):
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def receive():
+        while data := await reader.read(65536):
+            queue.put_nowait((time.perf_counter() + delay_seconds, data))
+        queue.put_nowait((0.0, b""))
+
+    async def send():
+        while True:
+            send_at, data = await queue.get()
+            if not data:
+                break
+            await asyncio.sleep(max(0.0, send_at - time.perf_counter()))
+            writer.write(data)
+            await writer.drain()
+        writer.close()
+
+    await asyncio.gather(receive(), send(), return_exceptions=True)
+
+
+async def start_latency_proxy(target_host: str, target_port: int, round_trip_ms: float) -> asyncio.Server:
+    """
+    Функция запуска прокси на случайном локальном порту
+    :param target_host: адрес БД;
+    :param target_port: порт БД;
+    :param round_trip_ms: добавляемое время сетевого обмена (по половине в каждую сторону);
+    :return: запущенный сервер, порт - server.sockets[0].getsockname()[1].
+    """
+    one_way_delay = round_trip_ms / 2 / 1000
+
+    async def handle_client(client_reader, client_writer):
+        server_reader, server_writer = await asyncio.open_connection(target_host, target_port)
+        try:
+            await asyncio.gather(
+                forward_with_delay(client_reader, server_writer, one_way_delay),
+                forward_with_delay(server_reader, client_writer, one_way_delay))
+        except (asyncio.CancelledError, ConnectionError):
+            # Соединение закрыто при завершении бенчмарка
+            server_writer.close()
+            client_writer.close()
+
+    return await asyncio.start_server(handle_client, "127.0.0.1", 0)
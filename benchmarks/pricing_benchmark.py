@@ -0,0 +1,55 @@
+# benchmarks.pricing_benchmark.py
+# Сравнение расчета цен со скидкой изменением объектов ORM (прежний способ в get_items)
+# и расчетом цен модулем api.pricing за один проход.
+# Запуск: python -m benchmarks.pricing_benchmark (БД не нужна)
+import argparse
+import random
+from decimal import Decimal
+
+from api.pricing.discounts import apply_discount_to_prices
+from benchmarks.stats import measure, print_report
+from database.models import Product
+
+
+def make_products(number_of_products: int) -> list[Product]:
+    random.seed(42)
+    return [
+        Product(id=product_id, price=Decimal(random.randint(1_000, 9_999_999)) / 100)
+        for product_id in range(1, number_of_products + 1)
+    ]
+
+
+def discount_orm_prices(products: list[Product], discount_amount_in_percent: int):
+    for product in products:
+        product.price = product.price - (product.price / 100 * discount_amount_in_percent)
+
+
+def main(number_of_products: int, iterations: int):
+    discount_amount_in_percent = 7
+    print(f"Цены со скидкой, товаров: {number_of_products}, замеров: {iterations}")
+
+    # Каждый замер изменяет цены заново, поэтому список создается один раз, а не перед каждым замером
+    orm_products = make_products(number_of_products)
+    print_report(
+        "Изменение price у объектов ORM",
+        measure(lambda: discount_orm_prices(orm_products, discount_amount_in_percent), iterations))
+
+    products = make_products(number_of_products)
+    print_report(
+        "Чтение цен из ORM + apply_discount_to_prices",
+        measure(lambda: apply_discount_to_prices(
+            ((product.id, product.price) for product in products), discount_amount_in_percent), iterations))
+
+    # Отдельно - только расчет, без чтения атрибутов объектов ORM
+    product_prices = [(product.id, product.price) for product in products]
+    print_report(
+        "apply_discount_to_prices",
+        measure(lambda: apply_discount_to_prices(product_prices, discount_amount_in_percent), iterations))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    main(args.products, args.iterations)
@@ -0,0 +1,81 @@
+# benchmarks.search_benchmark.py
+# Полнотекстовый поиск товаров на большой таблице: время первой и следующих страниц
+# и планы запросов (совпадения должны находиться по GIN-индексу, без Seq Scan по products).
+# Запуск: python -m benchmarks.search_benchmark (нужна тестовая БД TEST_DB_NAME, она будет пересоздана)
+import argparse
+import asyncio
+import json
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from benchmarks.seed import seed_database
+from benchmarks.stats import measure_async, print_report
+from config import settings
+from database.actions import search_products_page_from_db, search_products_query
+from database.db import create_pooled_async_engine
+
+# В тестовых данных одно слово из названия встречается в каждом 15-м товаре: на таком широком запросе
+# планировщик справедливо выбирает Seq Scan (ранг все равно считается для всех совпадений),
+# поэтому в замерах запросы из двух слов, как в поиске по каталогу
+SEARCH_QUERIES = ["доска строганая", "трубы алюминиевые", "\"брус сосновый\"", "фанера сухая -сосновая",
+                  "арматура стальная"]
+
+
+def collect_plan_nodes(plan: dict) -> list[str]:
+    node = plan["Node Type"]
+    if "Index Name" in plan:
+        node = f"{node} ({plan['Index Name']})"
+    elif "Relation Name" in plan:
+        node = f"{node} ({plan['Relation Name']})"
+    return [node] + [child_node for child in plan.get("Plans", []) for child_node in collect_plan_nodes(child)]
+
+
+async def explain_search(async_session: AsyncSession, search_query: str, limit: int) -> list[str]:
+    # Запрос выполняется с теми же параметрами, что и в приложении (без подстановки значений в текст)
+    compiled = search_products_query(search_query, None, limit).compile(dialect=async_session.bind.dialect)
+    parameters = compiled.construct_params()
+    connection = await async_session.connection()
+    plan = await connection.exec_driver_sql(
+        "EXPLAIN (ANALYZE, FORMAT JSON) " + compiled.string,
+        tuple(parameters[name] for name in compiled.positiontup))
+    plan = plan.scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return collect_plan_nodes(plan[0]["Plan"])
+
+
+async def main(number_of_products: int, iterations: int, limit: int, skip_seed: bool):
+    async_engine = create_pooled_async_engine(settings.ASYNCPG_TEST_DATABASE_URL)
+    if not skip_seed:
+        await seed_database(async_engine, number_of_products=number_of_products, batch_size=10_000)
+    session_maker = async_sessionmaker(async_engine, class_=AsyncSession)
+
+    print(f"Полнотекстовый поиск, товаров в БД: {number_of_products}, замеров: {iterations}, страница: {limit}")
+    async with session_maker() as async_session:
+        for search_query in SEARCH_QUERIES:
+            plan_nodes = await explain_search(async_session, search_query, limit)
+            print(f"{search_query}: {' -> '.join(plan_nodes)}")
+            assert not any(node.startswith("Seq Scan (products)") for node in plan_nodes), "Seq Scan по products"
+
+            _, next_cursor = await search_products_page_from_db(async_session, search_query, None, limit)
+            print_report(
+                "  первая страница",
+                await measure_async(
+                    lambda: search_products_page_from_db(async_session, search_query, None, limit), iterations))
+            if next_cursor is not None:
+                print_report(
+                    "  вторая страница",
+                    await measure_async(
+                        lambda: search_products_page_from_db(async_session, search_query, next_cursor, limit),
+                        iterations))
+
+    await async_engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--skip-seed", action="store_true", help="не пересоздавать тестовую БД")
+    args = parser.parse_args()
+    asyncio.run(main(args.products, args.iterations, args.limit, args.skip_seed))
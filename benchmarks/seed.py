@@ -0,0 +1,175 @@
+# benchmarks.seed.py
+# Заполнение тестовой БД (TEST_DB_NAME) синтетическими данными для бенчмарков
+import random
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from database.checkout import ORDER_STATUS_CREATED
+from database.db import Base
+from database.models import (ProductType, ProductSubtype, Product, MainInfoImage, PromotionImage, ServiceImage,
+                             CustomerLevel, User, BonusCard, ProductFeedback, CartItem, UserAddress, DeliveryType,
+                             PaymentMethod, OrderStatus, Order, OrderItem)
+
+PRODUCT_TYPES = {
+    "Пиломатериалы": ["Брус", "Доски строительные", "Строительная рейка и брусок", "Фанера"],
+    "Металлопрокат": ["Листовой прокат", "Проволока и арматура", "Сетка", "Столбы, профильные трубы",
+                      "Швеллеры и уголки"],
+    "Алюминиевые профиля": ["Тавр и Полоса алюминиевые", "Труба алюминиевая круглая",
+                            "Труба алюминиевая профильная Бокс", "Уголок алюминиевый", "Швеллер алюминиевый"]
+}
+
+CUSTOMER_LEVELS = [
+    {"name": "Новичок", "discount_amount_in_percent": 3, "lower_threshold": 0, "level_number": 1},
+    {"name": "Постоянный покупатель", "discount_amount_in_percent": 5, "lower_threshold": 50_000, "level_number": 2},
+    {"name": "Профессионал", "discount_amount_in_percent": 7, "lower_threshold": 200_000, "level_number": 3},
+    {"name": "Партнер", "discount_amount_in_percent": 10, "lower_threshold": 1_000_000, "level_number": 4}
+]
+
+DELIVERY_TYPE = "Доставка до двери"
+PAYMENT_METHOD = "Картой при получении"
+
+PRODUCT_WORDS = ["Доска", "Брус", "Рейка", "Фанера", "Лист", "Проволока", "Арматура", "Сетка", "Труба", "Уголок",
+                 "Швеллер", "Полоса", "Тавр", "Профиль", "Столб"]
+PRODUCT_ADJECTIVES = ["строганая", "обрезная", "сухая", "оцинкованная", "алюминиевая", "стальная", "сосновая",
+                      "березовая", "влагостойкая", "профильная", "круглая", "квадратная"]
+
+
+def product_row(product_id: int, subtype_names: list[str]) -> dict:
+    word = PRODUCT_WORDS[product_id % len(PRODUCT_WORDS)]
+    adjective = PRODUCT_ADJECTIVES[(product_id // len(PRODUCT_WORDS)) % len(PRODUCT_ADJECTIVES)]
+    return {
+        "id": product_id,
+        "name": f"{word} {adjective} {product_id}x{random.randint(10, 200)}",
+        "price": round(random.uniform(10, 99_999), 2),
+        "description": f"{word} {adjective} для строительства и ремонта, артикул {product_id}",
+        "image_link": f"images/products/{product_id % 100}.jpg",
+        "quantity_in_stock": random.randint(0, 500),
+        "product_subtype_name": subtype_names[product_id % len(subtype_names)],
+        "additional_information": f"Производитель: завод №{product_id % 37}",
+        "rating": round(random.uniform(0, 0.9), 1),
+        "number_of_sales": random.randint(0, 10_000)
+    }
+
+
+async def seed_database(
+        async_engine: AsyncEngine,
+        number_of_products: int = 10_000,
+        number_of_feedbacks: int = 0,
+        number_of_users: int = 1,
+        number_of_cart_items: int = 0,
+        number_of_orders: int = 0,
+        batch_size: int = 5_000):
+    """
+    Функция пересоздания таблиц тестовой БД и заполнения их данными
+    :param async_engine: движок, подключенный к тестовой БД;
+    :param number_of_products: количество товаров;
+    :param number_of_feedbacks: количество отзывов (распределяются по первым 100 товарам и по всем пользователям);
+    :param number_of_users: количество пользователей с бонусными картами и адресами (логин первого - benchmarkUser);
+    :param number_of_cart_items: количество товаров в корзинах (распределяются по всем пользователям);
+    :param number_of_orders: количество заказов из одного товара (распределяются по всем пользователям);
+    :param batch_size: количество строк в одном INSERT.
+    """
+    random.seed(42)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+        await conn.execute(CustomerLevel.__table__.insert(), CUSTOMER_LEVELS)
+        await conn.execute(DeliveryType.__table__.insert(), [{"name": DELIVERY_TYPE}])
+        await conn.execute(PaymentMethod.__table__.insert(), [{"name": PAYMENT_METHOD}])
+        await conn.execute(OrderStatus.__table__.insert(), [{"name": ORDER_STATUS_CREATED}])
+        await conn.execute(ProductType.__table__.insert(), [
+            {"name": type_name, "image_link": f"images/types/{index}.jpg"}
+            for index, type_name in enumerate(PRODUCT_TYPES)
+        ])
+        await conn.execute(ProductSubtype.__table__.insert(), [
+            {"name": subtype_name, "image_link": f"images/subtypes/{index}.jpg", "type_name": type_name}
+            for type_name, subtype_names in PRODUCT_TYPES.items()
+            for index, subtype_name in enumerate(subtype_names)
+        ])
+        for ImageTable in (MainInfoImage, PromotionImage, ServiceImage):
+            await conn.execute(ImageTable.__table__.insert(), [
+                {"name": f"{ImageTable.__tablename__}_{index}", "image_link": f"images/{ImageTable.__tablename__}/{index}.jpg"}
+                for index in range(5)
+            ])
+
+        subtype_names = [name for subtype_names in PRODUCT_TYPES.values() for name in subtype_names]
+        for batch_start in range(1, number_of_products + 1, batch_size):
+            batch_end = min(batch_start + batch_size, number_of_products + 1)
+            await conn.execute(Product.__table__.insert(), [
+                product_row(product_id, subtype_names)
+                for product_id in range(batch_start, batch_end)
+            ])
+
+        for batch_start in range(1, number_of_users + 1, batch_size):
+            batch_end = min(batch_start + batch_size, number_of_users + 1)
+            await conn.execute(User.__table__.insert(), [
+                {"id": user_id, "login": "benchmarkUser" if user_id == 1 else f"benchmarkUser{user_id}"}
+                for user_id in range(batch_start, batch_end)
+            ])
+            await conn.execute(BonusCard.__table__.insert(), [
+                {"user_id": user_id}
+                for user_id in range(batch_start, batch_end)
+            ])
+            await conn.execute(UserAddress.__table__.insert(), [
+                {"id": user_id, "user_id": user_id, "city": "Москва", "street": "Строителей", "house_number": str(user_id),
+                 "entrance": "1", "delivery_point": "Дверь"}
+                for user_id in range(batch_start, batch_end)
+            ])
+
+        for batch_start in range(0, number_of_feedbacks, batch_size):
+            batch_end = min(batch_start + batch_size, number_of_feedbacks)
+            await conn.execute(ProductFeedback.__table__.insert(), [
+                {
+                    "author_id": feedback_number % number_of_users + 1,
+                    "product_id": feedback_number % min(100, number_of_products) + 1,
+                    "liked_text": "Хорошее качество",
+                    "disliked_text": "Нет",
+                    "number_of_likes": feedback_number % 7,
+                    "number_of_dislikes": feedback_number % 3
+                }
+                for feedback_number in range(batch_start, batch_end)
+            ])
+
+        for batch_start in range(0, number_of_cart_items, batch_size):
+            batch_end = min(batch_start + batch_size, number_of_cart_items)
+            await conn.execute(CartItem.__table__.insert(), [
+                {
+                    "user_id": item_number % number_of_users + 1,
+                    "product_id": item_number // number_of_users % number_of_products + 1,
+                    "quantity": item_number % 5 + 1
+                }
+                for item_number in range(batch_start, batch_end)
+            ])
+
+        for batch_start in range(0, number_of_orders, batch_size):
+            batch_end = min(batch_start + batch_size, number_of_orders)
+            await conn.execute(Order.__table__.insert(), [
+                {
+                    "id": order_number + 1,
+                    "delivery_type_name": DELIVERY_TYPE,
+                    "user_id": order_number % number_of_users + 1,
+                    "address_id": order_number % number_of_users + 1,
+                    "status_name": ORDER_STATUS_CREATED,
+                    "payment_method_name": PAYMENT_METHOD,
+                    "total_price": 1000,
+                    "idempotency_key": f"seed-{order_number}"
+                }
+                for order_number in range(batch_start, batch_end)
+            ])
+            await conn.execute(OrderItem.__table__.insert(), [
+                {"order_id": order_number + 1, "product_id": order_number % number_of_products + 1, "quantity": 1}
+                for order_number in range(batch_start, batch_end)
+            ])
+
+        # Последовательности id не знают о вставленных вручную значениях
+        await conn.execute(text("SELECT setval('products_id_seq', (SELECT max(id) FROM products))"))
+        await conn.execute(text("SELECT setval('users_id_seq', (SELECT max(id) FROM users))"))
+        await conn.execute(text("SELECT setval('users_addresses_id_seq', (SELECT max(id) FROM users_addresses))"))
+        if number_of_orders:
+            await conn.execute(text("SELECT setval('orders_id_seq', (SELECT max(id) FROM orders))"))
+
+    async with async_engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE"))
@@ -0,0 +1,45 @@
+# benchmarks.stats.py
+import statistics
+import time
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    ordered_samples = sorted(samples)
+    index = min(len(ordered_samples) - 1, round(percent / 100 * (len(ordered_samples) - 1)))
+    return ordered_samples[index]
+
+
+async def measure_async(action, iterations: int, warmup: int = 10) -> list[float]:
+    """
+    Функция замера времени выполнения корутины
+    :param action: функция без аргументов, возвращающая корутину;
+    :param iterations: количество замеров;
+    :param warmup: количество прогревочных запусков, не попадающих в замеры;
+    :return: список длительностей в миллисекундах.
+    """
+    for _ in range(warmup):
+        await action()
+
+    samples = []
+    for _ in range(iterations):
+        started_at = time.perf_counter()
+        await action()
+        samples.append((time.perf_counter() - started_at) * 1000)
+    return samples
+
+
+def measure(action, iterations: int, warmup: int = 10) -> list[float]:
+    for _ in range(warmup):
+        action()
+
+    samples = []
+    for _ in range(iterations):
+        started_at = time.perf_counter()
+        action()
+        samples.append((time.perf_counter() - started_at) * 1000)
+    return samples
+
+
+def print_report(title: str, samples: list[float]):
+    print(f"{title:<46} p50={percentile(samples, 50):8.3f} ms  "
+          f"p99={percentile(samples, 99):8.3f} ms  mean={statistics.mean(samples):8.3f} ms")
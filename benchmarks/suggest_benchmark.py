@@ -0,0 +1,75 @@
+# benchmarks.suggest_benchmark.py
+# Индекс подсказок на синтетическом каталоге: время построения, занимаемая память
+# и время получения подсказок (префиксы, несколько слов, другая раскладка, опечатки).
+# БД не нужна. Запуск: python -m benchmarks.suggest_benchmark
+import argparse
+import random
+import sys
+import time
+from array import array
+
+from benchmarks.seed import PRODUCT_TYPES, product_row
+from benchmarks.stats import measure, print_report
+from database.suggestions import SuggestionIndex
+
+SUGGEST_QUERIES = ["д", "дос", "доска", "доска стр", "доска строганая 12", "1234", "ljcrf", "ljcrf cnhju",
+                   "досак", "строгоная", "пиломат", "ыыыы"]
+
+
+def generate_catalog(number_of_products: int) -> tuple[list, list]:
+    subtypes = [
+        (subtype_name, type_name)
+        for type_name, subtype_names in PRODUCT_TYPES.items()
+        for subtype_name in subtype_names
+    ]
+    subtype_names = [subtype_name for subtype_name, _ in subtypes]
+    products = []
+    for product_id in range(1, number_of_products + 1):
+        product = product_row(product_id, subtype_names)
+        products.append((product_id, product["name"], product["number_of_sales"]))
+    return subtypes, products
+
+
+def get_memory_size(value) -> int:
+    # Размер массивов, списков и словарей индекса вместе со строками и вложенными массивами
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(get_memory_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(get_memory_size(key) + get_memory_size(item) for key, item in value.items())
+    if isinstance(value, (str, array)):
+        return sys.getsizeof(value)
+    return 0
+
+
+def main(number_of_products: int, iterations: int, number_of_changes: int):
+    subtypes, products = generate_catalog(number_of_products)
+    started_at = time.perf_counter()
+    suggestion_index = SuggestionIndex.build(subtypes, products)
+    build_time = time.perf_counter() - started_at
+    index_memory = sum(get_memory_size(value) for value in vars(suggestion_index.products).values())
+
+    print(f"Подсказки, товаров в индексе: {number_of_products}, замеров: {iterations}")
+    print(f"Построение: {build_time:.1f} s, память индекса товаров: {index_memory / 2 ** 20:.0f} MB")
+
+    for search_query in SUGGEST_QUERIES:
+        suggestions = suggestion_index.suggest(search_query, 10)
+        first_suggestion = suggestions[0].name if suggestions else "-"
+        print_report(
+            f"  {search_query} ({len(suggestions)}: {first_suggestion})"[:46],
+            measure(lambda: suggestion_index.suggest(search_query, 10), iterations))
+
+    # Изменения товаров после построения просматриваются целиком, их количество ограничено SUGGEST_INDEX_MAX_CHANGES
+    for product_id in random.sample(range(1, number_of_products + 1), number_of_changes):
+        suggestion_index.apply_product_change(product_id, f"Доска палубная {product_id}", random.randint(0, 10_000))
+    print(f"После {number_of_changes} изменений товаров:")
+    for search_query in ("доска", "доска пал", "ljcrf"):
+        print_report(f"  {search_query}", measure(lambda: suggestion_index.suggest(search_query, 10), iterations))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=500_000)
+    parser.add_argument("--iterations", type=int, default=1_000)
+    parser.add_argument("--changes", type=int, default=500)
+    args = parser.parse_args()
+    main(args.products, args.iterations, args.changes)
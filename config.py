@@ -12,6 +12,70 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     JWT_ALGORITHM: str
 
+    # Настройки пула соединений (на один процесс uvicorn)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    # Настройки чтения с копии БД (DB_COPY_NAME). Копия должна быть резервным сервером потоковой
+    # репликации (hot standby): у обычной БД отставание определить нельзя, и запросы идут на основную БД
+    DB_REPLICA_ENABLED: bool = True
+    DB_REPLICA_MAX_LAG: float = 5.0
+    DB_REPLICA_CHECK_INTERVAL: float = 10.0
+    DB_REPLICA_CHECK_TIMEOUT: float = 1.0
+    DB_READ_YOUR_WRITES_WINDOW: float = 15.0
+
+    # Настройки кэша справочных данных и уведомлений об изменении таблиц (LISTEN/NOTIFY)
+    REFERENCE_CACHE_TTL: float = 300.0
+    REFERENCE_CACHE_MAX_SIZE: int = 128
+    DB_NOTIFICATIONS_ENABLED: bool = True
+    DB_NOTIFICATIONS_RECONNECT_DELAY: float = 5.0
+    DB_NOTIFICATIONS_PING_INTERVAL: float = 30.0
+
+    # Настройки кэша HTML-страниц каталога и товаров: суммарный размер страниц (в байтах)
+    # и время жизни страницы (в секундах) на случай пропущенных уведомлений об изменении данных.
+    # Фрагменты страниц (тег {% cache %} шаблонов) хранятся отдельно с тем же временем жизни
+    PAGE_CACHE_MAX_SIZE: int = 64 * 1024 * 1024
+    PAGE_CACHE_TTL: float = 30.0
+    FRAGMENT_CACHE_MAX_SIZE: int = 16 * 1024 * 1024
+
+    # Настройки шаблонов: перекомпиляция измененных файлов шаблонов (включается при разработке)
+    # и сохранение скомпилированных шаблонов в файлы (None - во временную директорию пользователя)
+    TEMPLATES_AUTO_RELOAD: bool = False
+    TEMPLATES_BYTECODE_CACHE_ENABLED: bool = True
+    TEMPLATES_BYTECODE_CACHE_DIRECTORY: str | None = None
+
+    # Настройки потоковой передачи HTML-страниц: страницы каталога, на которых не меньше
+    # CATALOG_STREAMING_MIN_PAGE_SIZE товаров (0 - потоковая передача выключена), отправляются по мере рендеринга
+    # частями до HTML_STREAMING_CHUNK_SIZE символов: начало страницы уходит до чтения товаров из БД
+    CATALOG_STREAMING_MIN_PAGE_SIZE: int = 50
+    HTML_STREAMING_CHUNK_SIZE: int = 16 * 1024
+
+    # Время (в секундах), в течение которого уровень бонусной карты из токена доступа считается актуальным
+    CUSTOMER_LEVEL_CLAIM_TTL: float = 600.0
+
+    # Настройки индекса подсказок: максимальное количество товаров в индексе (самые продаваемые)
+    # и количество изменений товаров, после которого индекс перестраивается
+    SUGGEST_INDEX_MAX_PRODUCTS: int = 1_000_000
+    SUGGEST_INDEX_MAX_CHANGES: int = 500
+
+    # Настройки лидеров продаж: количество товаров в общем списке и в списке подтипа
+    # и период (в секундах) обновления списков
+    LEADERBOARD_SIZE: int = 10
+    LEADERBOARD_REFRESH_INTERVAL: float = 60.0
+
+    # Количество товаров, читаемых из курсора БД за один раз при выгрузке каталога
+    CATALOG_EXPORT_FETCH_SIZE: int = 1_000
+
+    # Настройки пересчета уровней бонусных карт: период (в секундах) пересчета в фоне (0 - пересчет в фоне
+    # выключен, задача запускается из командной строки) и запас (в секундах), на который пересчет в режиме
+    # --incremental захватывает изменения до прошлого запуска (транзакции, начатые до него, но завершенные после)
+    CUSTOMER_LEVELS_RECALCULATION_INTERVAL: float = 0.0
+    CUSTOMER_LEVELS_RECALCULATION_OVERLAP: float = 300.0
+
     @property
     def ASYNCPG_DATABASE_URL(self):
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
@@ -24,6 +88,11 @@ class Settings(BaseSettings):
     def ASYNCPG_DATABASE_COPY_URL(self):
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_COPY_NAME}"
 
+    @property
+    def POSTGRES_DSN(self):
+        # Строка подключения для asyncpg без SQLAlchemy
+        return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+
     @property
     def PSYCOPG_DATABASE_URL(self):
         return f"postgresql+psycopg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
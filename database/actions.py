@@ -1,30 +1,282 @@
 # database.actions.py
+from decimal import Decimal
+
+from fastapi import Depends
 from pydantic import BaseModel
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select, func, update
+from sqlalchemy.dialects.postgresql import REAL
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import joinedload, selectinload
 
 import database.db
 from api.errors.authentication.exceptions import UnavailableLogin
+from api.errors.catalog.exceptions import InvalidCursor
 from api.schemas.authentication import UserIdRole, RegistrationCredentials
-from database.db import async_session_maker
-from database.models import ImageTable, BonusCard, ProductFeedback
+from api.schemas.catalog import ProductSortKey, SortOrder, ProductsCursor, SearchCursor
+from api.schemas.feedback import FeedbackCursor
+from database.cache import reference_data_cache, content_version, MISSING
+from database.pagination import encode_cursor, decode_cursor, keyset_page_query
+from database.dependencies import get_async_session
+from api.schemas.main_page import ProductTypeDTO
+from database.models import ImageTable, BonusCard, ProductFeedback, ProductType, ProductSubtype, Product
 from typing import Type
 from database.models import User
 
-async def get_images_from_db(ImagesToFind: Type[ImageTable], DTO: Type[BaseModel], async_session) -> list:
+# Ключи и таблицы записей кэша справочных данных. Списки DTO из кэша общие для всех запросов,
+# поэтому изменять их нельзя
+CATALOG_TREE_CACHE_KEY = ("catalog_tree", ProductTypeDTO.__name__)
+CATALOG_TREE_TABLES = (ProductType.__tablename__, ProductSubtype.__tablename__)
+
+def images_cache_key(ImagesToFind: Type[ImageTable], DTO: Type[BaseModel]) -> tuple:
+    return ("images", ImagesToFind.__tablename__, DTO.__name__)
+
+async def get_images_from_db(
+        ImagesToFind: Type[ImageTable],
+        DTO: Type[BaseModel],
+        async_session,
+        store_in_cache: bool = True) -> list:
     """
-    Функция поиска объектов с информацией об изображениях в БД (в простых таблицах без связей)
+    Функция поиска объектов с информацией об изображениях в БД (в простых таблицах без связей).
+    Результат кэшируется до изменения таблицы или истечения REFERENCE_CACHE_TTL
     :param ImagesToFind: модель SQLAlchemy описывающая таблицу в БД (class);
     :param DTO: модель DTO (модель для передачи данных в запросе) (class);
     :param async_session: экземпляр асинхронной сессии;
+    :param store_in_cache: сохранять ли результат в кэш (нельзя, если сессия читает с отстающей копии БД -
+    см. can_fill_cache);
     :return: список объектов, где каждый объект это строка из БД.
     """
+    cache_key = images_cache_key(ImagesToFind, DTO)
+    images = reference_data_cache.get(cache_key)
+    if images is not MISSING:
+        return images
+
+    table_versions = reference_data_cache.snapshot_versions([ImagesToFind.__tablename__])
     images_from_db = await async_session.execute(select(ImagesToFind))
     images_from_db = images_from_db.scalars().all()
-    return [
+    images = [
         DTO.model_validate(image)
         for image in images_from_db
     ]
+    if store_in_cache:
+        reference_data_cache.set(cache_key, images, table_versions)
+    return images
+
+def get_catalog_tree_version() -> str | None:
+    # Версия дерева каталога в кэше (None, если дерево нужно загрузить из БД)
+    return reference_data_cache.get_with_version(CATALOG_TREE_CACHE_KEY)[1]
+
+async def get_catalog_tree_from_db(async_session, store_in_cache: bool = True) -> list[ProductTypeDTO]:
+    return (await get_versioned_catalog_tree_from_db(async_session, store_in_cache))[0]
+
+async def get_versioned_catalog_tree_from_db(
+        async_session,
+        store_in_cache: bool = True) -> tuple[list[ProductTypeDTO], str]:
+    """
+    Функция получения дерева каталога из кэша или из БД вместе с версией записи кэша
+    (одинаковая версия - одинаковое дерево каталога)
+    :param async_session: экземпляр асинхронной сессии;
+    :param store_in_cache: сохранять ли результат в кэш (нельзя, если сессия читает с отстающей копии БД -
+    см. can_fill_cache);
+    :return: список типов товаров с подтипами и версия.
+    """
+    catalog_tree, version = reference_data_cache.get_with_version(CATALOG_TREE_CACHE_KEY)
+    if catalog_tree is not MISSING:
+        return catalog_tree, version
+
+    table_versions = reference_data_cache.snapshot_versions(CATALOG_TREE_TABLES)
+    catalog_tree_from_db = await async_session.execute(
+        select(ProductType)
+        .options(selectinload(ProductType.product_subtypes))
+    )
+    catalog_tree = [
+        ProductTypeDTO.model_validate(product_type)
+        for product_type in catalog_tree_from_db.scalars().all()
+    ]
+    if not store_in_cache:
+        return catalog_tree, content_version(catalog_tree)
+    return catalog_tree, reference_data_cache.set(CATALOG_TREE_CACHE_KEY, catalog_tree, table_versions)
+
+def catalog_tree_has_subtype(catalog_tree: list[ProductTypeDTO], product_type: str, product_subtype: str) -> bool:
+    return any(
+        product_type_dto.name == product_type and any(
+            product_subtype_dto.name == product_subtype for product_subtype_dto in product_type_dto.product_subtypes)
+        for product_type_dto in catalog_tree
+    )
+
+# Столбец сортировки товаров и тип его значения в курсоре страницы
+PRODUCT_SORT_COLUMNS = {
+    ProductSortKey.price: (Product.price, Decimal),
+    ProductSortKey.rating: (Product.rating, Decimal),
+    ProductSortKey.number_of_sales: (Product.number_of_sales, int),
+    ProductSortKey.name: (Product.name, str)
+}
+
+def subtype_products_page_query(
+        product_type: str,
+        product_subtype: str,
+        sort: ProductSortKey,
+        order: SortOrder,
+        cursor: str | None,
+        limit: int):
+    """
+    Запрос страницы товаров подтипа, отсортированных на стороне БД
+    :param product_type: название типа продукта;
+    :param product_subtype: название подтипа продукта;
+    :param sort: ключ сортировки;
+    :param order: направление сортировки;
+    :param cursor: курсор страницы из предыдущего ответа (None - первая страница);
+    :param limit: количество товаров на странице;
+    :return: запрос limit + 1 товаров (лишний товар означает, что страница не последняя).
+    """
+    sort_column, key_type = PRODUCT_SORT_COLUMNS[sort]
+
+    after_values = None
+    if cursor is not None:
+        products_cursor = decode_cursor(cursor, ProductsCursor)
+        # Курсор действителен только для той сортировки, в которой он выдан
+        if products_cursor.sort != sort or products_cursor.order != order:
+            raise InvalidCursor()
+        try:
+            after_values = (key_type(products_cursor.key), products_cursor.id)
+        except (ArithmeticError, ValueError):
+            raise InvalidCursor()
+
+    return keyset_page_query(
+        select(Product)
+        .join(ProductSubtype)
+        .where(
+            Product.product_subtype_name == product_subtype,
+            ProductSubtype.type_name == product_type),
+        order_columns=(sort_column, Product.id),
+        descending=order == SortOrder.desc,
+        after_values=after_values,
+        limit=limit
+    )
+
+def subtype_products_next_cursor(last_product: Product, sort: ProductSortKey, order: SortOrder) -> str:
+    sort_column, key_type = PRODUCT_SORT_COLUMNS[sort]
+    last_key = getattr(last_product, sort_column.key)
+    return encode_cursor(ProductsCursor(
+        sort=sort,
+        order=order,
+        key=str(last_key) if key_type is Decimal else last_key,
+        id=last_product.id))
+
+async def get_subtype_products_page_from_db(
+        async_session,
+        product_type: str,
+        product_subtype: str,
+        sort: ProductSortKey,
+        order: SortOrder,
+        cursor: str | None,
+        limit: int) -> tuple[list[Product], str | None]:
+    """
+    Функция получения страницы товаров подтипа, отсортированных на стороне БД
+    :param async_session: экземпляр асинхронной сессии;
+    :param product_type: название типа продукта;
+    :param product_subtype: название подтипа продукта;
+    :param sort: ключ сортировки;
+    :param order: направление сортировки;
+    :param cursor: курсор страницы из предыдущего ответа (None - первая страница);
+    :param limit: количество товаров на странице;
+    :return: товары страницы и курсор следующей страницы (None, если страница последняя).
+    """
+    products_from_db = await async_session.execute(
+        subtype_products_page_query(product_type, product_subtype, sort, order, cursor, limit))
+    products_from_db = products_from_db.scalars().all()
+
+    if len(products_from_db) <= limit:
+        return products_from_db, None
+
+    products_from_db = products_from_db[:limit]
+    return products_from_db, subtype_products_next_cursor(products_from_db[-1], sort, order)
+
+class SubtypeProductsPageStream:
+    """
+    Страница товаров подтипа, которая читается из БД во время рендеринга шаблона (потоковая передача
+    страницы каталога): асинхронный итератор товаров страницы. Запрос выполняется, когда рендеринг
+    доходит до товаров, то есть после отправки начала страницы. Курсор следующей страницы
+    известен после чтения всех товаров страницы
+    """
+    def __init__(
+            self,
+            read_session_maker: async_sessionmaker,
+            product_type: str,
+            product_subtype: str,
+            sort: ProductSortKey,
+            order: SortOrder,
+            cursor: str | None,
+            limit: int):
+        # Запрос строится сразу, чтобы ошибка в курсоре страницы была обнаружена до начала ответа
+        self.query = subtype_products_page_query(product_type, product_subtype, sort, order, cursor, limit)
+        self.read_session_maker = read_session_maker
+        self.sort = sort
+        self.order = order
+        self.limit = limit
+        self.next_cursor: str | None = None
+
+    async def __aiter__(self):
+        # Страница ограничена MAX_PRODUCTS_PAGE_SIZE товаров, поэтому она читается одним запросом
+        # (курсор БД на стороне сервера требует транзакции и дополнительных обращений к БД),
+        # а соединение возвращается в пул до рендеринга товаров
+        async with self.read_session_maker() as async_session:
+            products = (await async_session.scalars(self.query)).all()
+        if len(products) > self.limit:
+            products = products[:self.limit]
+            self.next_cursor = subtype_products_next_cursor(products[-1], self.sort, self.order)
+        for product in products:
+            yield product
+
+def search_products_query(search_query: str, after_values: tuple[float, int] | None, limit: int):
+    """
+    Запрос страницы полнотекстового поиска товаров по названию, описанию и дополнительной информации.
+    Совпадения находятся по GIN-индексу на products.search_vector, сортируются по рангу
+    (ts_rank с весами полей) и выдаются страницами по ключу (ранг, id)
+    :param search_query: запрос пользователя (синтаксис websearch: "слова в кавычках", -исключение, or);
+    :param after_values: ранг и id последнего товара предыдущей страницы (None - первая страница);
+    :param limit: количество товаров на странице.
+    """
+    ts_query = func.websearch_to_tsquery("russian", search_query)
+    rank = func.ts_rank(Product.search_vector, ts_query, type_=REAL).label("rank")
+    return keyset_page_query(
+        select(Product, rank)
+        .where(Product.search_vector.bool_op("@@")(ts_query)),
+        order_columns=(rank, Product.id),
+        descending=True,
+        after_values=after_values,
+        limit=limit
+    )
+
+async def search_products_page_from_db(
+        async_session,
+        search_query: str,
+        cursor: str | None,
+        limit: int) -> tuple[list, str | None]:
+    """
+    Функция полнотекстового поиска товаров
+    :param async_session: экземпляр асинхронной сессии;
+    :param search_query: запрос пользователя;
+    :param cursor: курсор страницы из предыдущего ответа (None - первая страница);
+    :param limit: количество товаров на странице;
+    :return: строки (товар, ранг) страницы и курсор следующей страницы (None, если страница последняя).
+    """
+    after_values = None
+    if cursor is not None:
+        search_cursor = decode_cursor(cursor, SearchCursor)
+        if search_cursor.query != search_query:
+            raise InvalidCursor()
+        after_values = (search_cursor.rank, search_cursor.id)
+
+    products_from_db = await async_session.execute(search_products_query(search_query, after_values, limit))
+    products_from_db = products_from_db.all()
+
+    if len(products_from_db) <= limit:
+        return products_from_db, None
+
+    products_from_db = products_from_db[:limit]
+    last_product, last_rank = products_from_db[-1]
+    next_cursor = encode_cursor(SearchCursor(query=search_query, rank=last_rank, id=last_product.id))
+    return products_from_db, next_cursor
 
 async def get_user_by_login_from_db(login: str, async_session):
     user_from_db = await async_session.execute(
@@ -44,10 +296,105 @@ async def get_user_with_bonus_card_from_db(async_session, user: UserIdRole):
     user_from_db = await async_session.execute(
         select(User)
         .where(User.id == user.id)
-        .options(joinedload(User.bonus_card).joinedload(BonusCard.customer_level))
+        .options(joinedload(User.bonus_card))
     )
     return user_from_db.scalar()
 
+async def get_customer_level_name_from_db(async_session, user: UserIdRole) -> str | None:
+    # Скидка и пороги уровня берутся из лестницы уровней в памяти (database.customer_levels)
+    customer_level_name_from_db = await async_session.execute(
+        select(BonusCard.customer_level_name)
+        .where(BonusCard.user_id == user.id)
+    )
+    return customer_level_name_from_db.scalar()
+
+def product_feedbacks_query(product_id: int, after_values: tuple | None, limit: int):
+    """
+    Запрос страницы отзывов товара от новых к старым. Из таблицы users читаются только имя
+    и фамилия автора, страница читается по индексу ix_product_feedbacks_product_date_of_update_id
+    :param product_id: id товара;
+    :param after_values: дата изменения и id последнего отзыва предыдущей страницы (None - первая страница);
+    :param limit: количество отзывов на странице.
+    """
+    return keyset_page_query(
+        select(
+            ProductFeedback.id,
+            ProductFeedback.date_of_update,
+            ProductFeedback.liked_text,
+            ProductFeedback.disliked_text,
+            ProductFeedback.admin_comment,
+            ProductFeedback.rating,
+            User.first_name,
+            User.last_name
+        )
+        .join(ProductFeedback.author)
+        .where(ProductFeedback.product_id == product_id),
+        order_columns=(ProductFeedback.date_of_update, ProductFeedback.id),
+        descending=True,
+        after_values=after_values,
+        limit=limit
+    )
+
+async def get_product_feedbacks_page_from_db(
+        async_session,
+        product_id: int,
+        cursor: str | None,
+        limit: int) -> tuple[list, str | None]:
+    """
+    Функция получения страницы отзывов товара
+    :param async_session: экземпляр асинхронной сессии;
+    :param product_id: id товара;
+    :param cursor: курсор страницы из предыдущего ответа (None - первая страница);
+    :param limit: количество отзывов на странице;
+    :return: строки отзывов страницы и курсор следующей страницы (None, если страница последняя).
+    """
+    after_values = None
+    if cursor is not None:
+        feedback_cursor = decode_cursor(cursor, FeedbackCursor)
+        if feedback_cursor.product_id != product_id:
+            raise InvalidCursor()
+        after_values = (feedback_cursor.date_of_update, feedback_cursor.id)
+
+    feedbacks_from_db = await async_session.execute(product_feedbacks_query(product_id, after_values, limit))
+    feedbacks_from_db = feedbacks_from_db.all()
+
+    if len(feedbacks_from_db) <= limit:
+        return feedbacks_from_db, None
+
+    feedbacks_from_db = feedbacks_from_db[:limit]
+    last_feedback = feedbacks_from_db[-1]
+    next_cursor = encode_cursor(FeedbackCursor(
+        product_id=product_id, date_of_update=last_feedback.date_of_update, id=last_feedback.id))
+    return feedbacks_from_db, next_cursor
+
+def product_feedback_aggregates_update(feedback: ProductFeedback, sign: int):
+    """
+    Запрос изменения сводных данных по отзывам товара на значения одного отзыва. Значения
+    изменяются в БД (столбец = столбец + n), поэтому одновременные отзывы на один товар не теряются
+    :param feedback: созданный или удаляемый отзыв;
+    :param sign: 1 - отзыв создан, -1 - отзыв удален.
+    """
+    return (
+        update(Product)
+        .where(Product.id == feedback.product_id)
+        .values(
+            feedbacks_count=Product.feedbacks_count + sign,
+            feedback_likes_count=Product.feedback_likes_count + sign * (feedback.number_of_likes or 0),
+            feedback_dislikes_count=Product.feedback_dislikes_count + sign * (feedback.number_of_dislikes or 0),
+            feedback_ratings_sum=Product.feedback_ratings_sum + sign * (feedback.rating or 0),
+            feedback_ratings_count=Product.feedback_ratings_count + sign * (feedback.rating is not None)
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+async def add_feedback_to_product_aggregates(async_session, feedback: ProductFeedback):
+    # Выполняется до фиксации транзакции, в которой создается отзыв
+    await async_session.execute(product_feedback_aggregates_update(feedback, 1))
+
+async def remove_feedback_from_product_aggregates(async_session, feedback: ProductFeedback):
+    # Выполняется до фиксации транзакции, в которой удаляется отзыв
+    await async_session.execute(product_feedback_aggregates_update(feedback, -1))
+
 async def get_product_feedback_by_id(async_session, feedback_id: int):
     feedback_from_db = await async_session.execute(
         select(ProductFeedback)
@@ -55,10 +402,12 @@ async def get_product_feedback_by_id(async_session, feedback_id: int):
     )
     return feedback_from_db.scalar()
 
-async def check_login_availability(credentials: RegistrationCredentials):
-    async with async_session_maker() as async_session:
-        users_from_db = await get_user_by_login_from_db(credentials.login, async_session)
-        if users_from_db:
-            raise UnavailableLogin()
-        else:
-            return True
+async def check_login_availability(
+        credentials: RegistrationCredentials,
+        async_session: AsyncSession = Depends(get_async_session)):
+    # Используем ту же сессию, что и обработчик регистрации
+    users_from_db = await get_user_by_login_from_db(credentials.login, async_session)
+    if users_from_db:
+        raise UnavailableLogin()
+    else:
+        return True
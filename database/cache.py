@@ -0,0 +1,136 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from config import settings
+
+# Признак отсутствия значения в кэше (None может быть сохраненным значением)
+MISSING = object()
+
+
+class CacheStats(BaseModel):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+
+def content_version(value: Any) -> str:
+    """
+    Функция вычисления версии значения по его содержимому (как версия лидеров продаж):
+    одинаковые данные, загруженные разными воркерами или заново после истечения TTL, имеют одинаковую версию
+    :param value: значение (DTO, списки DTO и другие значения, которые можно сериализовать в JSON);
+    :return: хэш содержимого.
+    """
+    return hashlib.blake2b(to_json(value), digest_size=8).hexdigest()
+
+
+class CacheEntry:
+    __slots__ = ("value", "expires_at", "table_versions", "version")
+
+    def __init__(self, value: Any, expires_at: float, table_versions: dict[str, int], version: str):
+        self.value = value
+        self.expires_at = expires_at
+        self.table_versions = table_versions
+        self.version = version
+
+
+class TTLLRUCache:
+    """
+    Кэш в памяти процесса с ограничением по времени жизни записи (TTL) и по количеству
+    записей (вытесняются давно не использованные - LRU). Каждая запись помнит версии
+    таблиц, из которых она построена: при изменении таблицы ее версия увеличивается
+    и все зависящие от нее записи перестают считаться актуальными.
+    Каждая запись хранит версию - хэш содержимого значения, по которой можно узнать,
+    что значение не изменилось, не сравнивая его содержимое
+    """
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self._table_versions: dict[str, int] = dict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def table_version(self, table_name: str) -> int:
+        return self._table_versions.get(table_name, 0)
+
+    def get(self, key: Hashable) -> Any:
+        return self.get_with_version(key)[0]
+
+    def get_with_version(self, key: Hashable) -> tuple[Any, str | None]:
+        """
+        Функция получения значения из кэша вместе с версией записи
+        :param key: ключ записи;
+        :return: значение и версия или (MISSING, None), если значения нет или оно устарело.
+        """
+        entry = self._entries.get(key)
+        if entry is None or not self._is_fresh(entry):
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return MISSING, None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value, entry.version
+
+    def set(self, key: Hashable, value: Any, table_versions: dict[str, int]) -> str:
+        """
+        Функция сохранения значения в кэш
+        :param key: ключ записи;
+        :param value: значение (не должно изменяться после сохранения);
+        :param table_versions: версии таблиц, из которых получено значение, снятые функцией
+        snapshot_versions до начала загрузки из БД. Если таблица изменилась во время загрузки,
+        значение сразу будет считаться устаревшим;
+        :return: версия записи (хэш содержимого значения).
+        """
+        version = content_version(value)
+        self._entries[key] = CacheEntry(value, time.monotonic() + self.ttl, table_versions, version)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return version
+
+    def snapshot_versions(self, tables: Iterable[str]) -> dict[str, int]:
+        return {table_name: self.table_version(table_name) for table_name in tables}
+
+    def invalidate_tables(self, *table_names: str):
+        for table_name in table_names:
+            self._table_versions[table_name] = self.table_version(table_name) + 1
+        self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            size=len(self._entries),
+            max_size=self.max_size,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            invalidations=self.invalidations
+        )
+
+    def _is_fresh(self, entry: CacheEntry) -> bool:
+        if entry.expires_at <= time.monotonic():
+            return False
+        return all(
+            self.table_version(table_name) == version
+            for table_name, version in entry.table_versions.items()
+        )
+
+
+# Кэш справочных данных: дерево каталога и изображения главной страницы
+reference_data_cache = TTLLRUCache(max_size=settings.REFERENCE_CACHE_MAX_SIZE, ttl=settings.REFERENCE_CACHE_TTL)
@@ -0,0 +1,100 @@
+from typing import Iterable
+
+from sqlalchemy import select, delete, func, bindparam, Integer
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from sqlalchemy.exc import IntegrityError
+
+from api.errors.cart.exceptions import CartProductNotFound
+from api.schemas.cart import CartItemQuantity, MAX_CART_ITEM_QUANTITY
+from database.models import CartItem, Product
+
+
+def merge_cart_items(items: Iterable[CartItemQuantity]) -> dict[int, int]:
+    # Один товар может встретиться в запросе несколько раз, а ON CONFLICT DO UPDATE
+    # не может изменить одну строку дважды в одной команде
+    quantities = dict()
+    for item in items:
+        quantities[item.product_id] = min(quantities.get(item.product_id, 0) + item.quantity, MAX_CART_ITEM_QUANTITY)
+    return quantities
+
+
+def cart_items_upsert(user_id: int, quantities: dict[int, int], add: bool = True):
+    """
+    Запрос добавления товаров в корзину одной командой INSERT ... ON CONFLICT DO UPDATE.
+    Товары передаются двумя массивами, поэтому текст запроса не зависит от их количества
+    и подготовленный запрос переиспользуется. Строки корзины принадлежат одному пользователю,
+    а проверка внешнего ключа блокирует товар в режиме KEY SHARE, который не конфликтует
+    ни с другими покупателями, ни с изменением количества продаж товара
+    :param user_id: id пользователя;
+    :param quantities: словарь {id товара: количество};
+    :param add: True - количество прибавляется к количеству в корзине, False - заменяет его;
+    :return: запрос, возвращающий id товаров и их количество в корзине.
+    """
+    items = func.unnest(
+        bindparam("product_ids", list(quantities), type_=ARRAY(Integer)),
+        bindparam("quantities", list(quantities.values()), type_=ARRAY(Integer))
+    ).table_valued("product_id", "quantity").render_derived()
+
+    insert_query = insert(CartItem).from_select(
+        ["user_id", "product_id", "quantity"],
+        select(bindparam("user_id", user_id, type_=Integer), items.c.product_id, items.c.quantity))
+    if add:
+        quantity = func.least(CartItem.quantity + insert_query.excluded.quantity, MAX_CART_ITEM_QUANTITY)
+    else:
+        quantity = insert_query.excluded.quantity
+    return (
+        insert_query
+        .on_conflict_do_update(index_elements=[CartItem.user_id, CartItem.product_id], set_={"quantity": quantity})
+        .returning(CartItem.product_id, CartItem.quantity)
+    )
+
+
+def cart_query(user_id: int):
+    # Корзина читается по первичному ключу (user_id, product_id), товары - по первичному ключу products
+    return (
+        select(CartItem.product_id, CartItem.quantity, Product.name, Product.image_link, Product.price,
+               Product.quantity_in_stock)
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.product_id)
+    )
+
+
+async def upsert_cart_items(
+        async_session,
+        user_id: int,
+        quantities: dict[int, int],
+        add: bool = True) -> list[CartItemQuantity]:
+    """
+    Функция добавления товаров в корзину (или замены их количества) за один сетевой обмен с БД
+    :param async_session: экземпляр асинхронной сессии основной БД;
+    :param user_id: id пользователя;
+    :param quantities: словарь {id товара: количество};
+    :param add: True - количество прибавляется к количеству в корзине, False - заменяет его;
+    :return: количество товаров в корзине после изменения.
+    """
+    try:
+        cart_items_from_db = await async_session.execute(cart_items_upsert(user_id, quantities, add))
+        cart_items = [CartItemQuantity.model_validate(cart_item) for cart_item in cart_items_from_db]
+        await async_session.commit()
+    except IntegrityError:
+        # Нарушен внешний ключ products: товара нет в каталоге, корзина не изменяется
+        await async_session.rollback()
+        raise CartProductNotFound()
+    return cart_items
+
+
+async def remove_cart_item(async_session, user_id: int, product_id: int) -> bool:
+    cart_items_from_db = await async_session.execute(
+        delete(CartItem)
+        .where(CartItem.user_id == user_id, CartItem.product_id == product_id)
+        .returning(CartItem.product_id)
+    )
+    removed = cart_items_from_db.first() is not None
+    await async_session.commit()
+    return removed
+
+
+async def get_cart_from_db(async_session, user_id: int) -> list:
+    cart_from_db = await async_session.execute(cart_query(user_id))
+    return cart_from_db.all()
@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+from typing import AsyncIterator
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api.schemas.catalog import ExportFormat
+from database.models import Product, ProductSubtype
+
+CATALOG_EXPORT_COLUMNS = ["id", "name", "price", "quantity_in_stock", "product_type_name", "product_subtype_name",
+                          "description", "additional_information", "image_link", "rating"]
+
+
+def catalog_export_query():
+    # Товары читаются по первичному ключу, тип товара - из подтипа
+    return (
+        select(Product.id, Product.name, Product.price, Product.quantity_in_stock,
+               ProductSubtype.type_name.label("product_type_name"), Product.product_subtype_name,
+               Product.description, Product.additional_information, Product.image_link, Product.rating)
+        .join(ProductSubtype, ProductSubtype.name == Product.product_subtype_name)
+        .order_by(Product.id)
+    )
+
+
+def ndjson_chunk(rows) -> bytes:
+    return "".join(
+        json.dumps({
+            **row._asdict(),
+            "price": float(row.price),
+            "rating": float(row.rating)
+        }, ensure_ascii=False) + "\n"
+        for row in rows
+    ).encode()
+
+
+def csv_chunk(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def stream_catalog_export(
+        session_maker: async_sessionmaker,
+        export_format: ExportFormat,
+        fetch_size: int) -> AsyncIterator[bytes]:
+    """
+    Функция выгрузки всех товаров каталога по частям. Товары читаются курсором на стороне сервера
+    по fetch_size строк, каждая часть сразу отправляется клиенту, поэтому расход памяти не зависит
+    от количества товаров, а первые байты отправляются, не дожидаясь чтения всего каталога.
+    Сессия открывается здесь, а не в зависимости запроса: зависимости завершаются до отправки тела ответа
+    :param session_maker: фабрика сессий БД, с которой читается каталог;
+    :param export_format: формат выгрузки (NDJSON или CSV с заголовком);
+    :param fetch_size: количество строк, читаемых из курсора за один раз;
+    :return: асинхронный итератор частей ответа.
+    """
+    encode_chunk = ndjson_chunk if export_format == ExportFormat.ndjson else csv_chunk
+    if export_format == ExportFormat.csv:
+        yield csv_chunk([CATALOG_EXPORT_COLUMNS])
+
+    async with session_maker() as async_session:
+        products_from_db = await async_session.stream(catalog_export_query().execution_options(yield_per=fetch_size))
+        async for rows in products_from_db.partitions():
+            yield encode_chunk(rows)
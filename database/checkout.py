@@ -0,0 +1,185 @@
+from decimal import Decimal
+
+from sqlalchemy import select, update, delete, bindparam, or_, true, String, Integer
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+
+from api.errors.cart.exceptions import EmptyCart, OutOfStock, CheckoutAddressNotFound, InvalidCheckoutOption
+from api.pricing.discounts import apply_discount_to_prices
+from api.schemas.cart import CheckoutRequest, CartItemQuantity, OrderDTO
+from database.models import Order, OrderItem, CartItem, Product, User, UserAddress, BonusCard, CustomerLevel
+
+# Статус, с которым оформляется заказ (добавляется миграцией)
+ORDER_STATUS_CREATED = "Оформлен"
+
+
+def order_insert(user_id: int, checkout: CheckoutRequest, idempotency_key: str | None):
+    """
+    Запрос создания заказа. Адрес выбирается среди адресов пользователя, поэтому чужой адрес
+    не вставляет строку. Если заказ с тем же ключом идемпотентности уже есть (или оформляется
+    параллельным запросом - тогда вставка ждет его завершения), строка тоже не вставляется
+    :return: запрос, возвращающий id нового заказа.
+    """
+    return (
+        insert(Order)
+        .from_select(
+            ["delivery_type_name", "user_id", "address_id", "status_name", "payment_method_name", "idempotency_key"],
+            select(
+                bindparam("delivery_type_name", checkout.delivery_type_name, type_=String),
+                UserAddress.user_id,
+                UserAddress.id,
+                bindparam("status_name", ORDER_STATUS_CREATED, type_=String),
+                bindparam("payment_method_name", checkout.payment_method_name, type_=String),
+                bindparam("idempotency_key", idempotency_key, type_=String))
+            .where(UserAddress.id == checkout.address_id, UserAddress.user_id == user_id))
+        .on_conflict_do_nothing(index_elements=[Order.user_id, Order.idempotency_key])
+        .returning(Order.id)
+    )
+
+
+def reserve_cart_query(user_id: int, order_id: int):
+    """
+    Запрос переноса корзины в заказ одной командой:
+    1. строки корзины удаляются (DELETE ... RETURNING);
+    2. товары корзины блокируются в порядке id, поэтому покупатели одних и тех же товаров
+       ждут друг друга, а не попадают во взаимную блокировку;
+    3. остаток уменьшается, а количество продаж увеличивается только у товаров, которых хватает
+       (UPDATE ... WHERE quantity_in_stock >= n). Если остаток изменил параллельный заказ, условие
+       проверяется заново по новой версии строки, поэтому остаток не уходит в минус.
+       Остаток NULL означает, что он не учитывается;
+    4. зарезервированные товары добавляются в заказ;
+    5. скидка читается из бонусной карты пользователя, а не из токена доступа, в котором уровень
+       может быть устаревшим. Карта блокируется до конца транзакции (FOR SHARE), поэтому пересчет
+       уровней не изменит ее, пока сумма заказа считается по этой скидке.
+    :return: запрос, возвращающий все товары корзины с ценой, признаком резервирования,
+    уровнем бонусной карты и скидкой пользователя (NULL, если бонусной карты нет).
+    """
+    cart = (
+        delete(CartItem)
+        .where(CartItem.user_id == bindparam("user_id", user_id, type_=Integer))
+        .returning(CartItem.product_id, CartItem.quantity)
+        .cte("cart")
+    )
+    locked_products = (
+        select(Product.id)
+        .where(Product.id.in_(select(cart.c.product_id)))
+        .order_by(Product.id)
+        .with_for_update()
+        .cte("locked_products")
+    )
+    reserved = (
+        update(Product)
+        .where(
+            Product.id == cart.c.product_id,
+            Product.id == locked_products.c.id,
+            or_(Product.quantity_in_stock.is_(None), Product.quantity_in_stock >= cart.c.quantity))
+        .values(
+            quantity_in_stock=Product.quantity_in_stock - cart.c.quantity,
+            number_of_sales=Product.number_of_sales + cart.c.quantity)
+        .returning(Product.id, Product.price, cart.c.quantity)
+        .cte("reserved")
+    )
+    customer_level = (
+        select(CustomerLevel.name.label("customer_level_name"), CustomerLevel.discount_amount_in_percent)
+        .join(BonusCard, BonusCard.customer_level_name == CustomerLevel.name)
+        .where(BonusCard.user_id == bindparam("user_id", user_id, type_=Integer))
+        .limit(1)
+        .with_for_update(read=True, of=BonusCard)
+        .cte("customer_level")
+    )
+    order_items = (
+        insert(OrderItem)
+        .from_select(
+            ["order_id", "product_id", "quantity"],
+            select(bindparam("order_id", order_id, type_=Integer), reserved.c.id, reserved.c.quantity))
+        .cte("order_items")
+    )
+    return (
+        select(cart.c.product_id, cart.c.quantity, reserved.c.price, reserved.c.id.is_not(None).label("reserved"),
+               customer_level.c.customer_level_name, customer_level.c.discount_amount_in_percent)
+        .select_from(
+            cart
+            .outerjoin(reserved, reserved.c.id == cart.c.product_id)
+            .outerjoin(customer_level, true()))
+        .order_by(cart.c.product_id)
+        .add_cte(order_items)
+    )
+
+
+async def get_order_by_idempotency_key(async_session, user_id: int, idempotency_key: str) -> OrderDTO | None:
+    order_from_db = await async_session.execute(
+        select(Order.id, Order.status_name, Order.total_price, OrderItem.product_id, OrderItem.quantity)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.user_id == user_id, Order.idempotency_key == idempotency_key)
+        .order_by(OrderItem.product_id)
+    )
+    order_items = order_from_db.all()
+    if not order_items:
+        return None
+    return OrderDTO(
+        order_id=order_items[0].id,
+        status_name=order_items[0].status_name,
+        total_price=float(order_items[0].total_price),
+        items=[CartItemQuantity(product_id=item.product_id, quantity=item.quantity) for item in order_items]
+    )
+
+
+async def checkout_cart(
+        async_session,
+        user_id: int,
+        checkout: CheckoutRequest,
+        idempotency_key: str | None = None) -> tuple[OrderDTO, bool, str | None]:
+    """
+    Функция оформления заказа из корзины в одной транзакции: создание заказа, резервирование товаров,
+    сумма заказа со скидкой по бонусной карте и сумма покупок пользователя. Если какого-то товара
+    не хватает, транзакция откатывается целиком - корзина и остатки не изменяются
+    :param async_session: экземпляр асинхронной сессии основной БД;
+    :param user_id: id пользователя;
+    :param checkout: способ доставки, способ оплаты и адрес;
+    :param idempotency_key: ключ идемпотентности (None - каждый запрос оформляет новый заказ);
+    :return: заказ, признак того, что он создан этим запросом (False - заказ с этим ключом уже был),
+    и уровень бонусной карты, по которому рассчитана скидка (None, если заказ уже был или карты нет).
+    """
+    try:
+        order_id = (await async_session.execute(order_insert(user_id, checkout, idempotency_key))).scalar()
+    except IntegrityError:
+        await async_session.rollback()
+        raise InvalidCheckoutOption()
+
+    if order_id is None:
+        await async_session.rollback()
+        if idempotency_key is not None:
+            order = await get_order_by_idempotency_key(async_session, user_id, idempotency_key)
+            if order is not None:
+                return order, False, None
+        raise CheckoutAddressNotFound()
+
+    cart_items = (await async_session.execute(reserve_cart_query(user_id, order_id))).all()
+    if not cart_items:
+        await async_session.rollback()
+        raise EmptyCart()
+    out_of_stock_product_ids = [cart_item.product_id for cart_item in cart_items if not cart_item.reserved]
+    if out_of_stock_product_ids:
+        await async_session.rollback()
+        raise OutOfStock(out_of_stock_product_ids)
+
+    discount_amount_in_percent = cart_items[0].discount_amount_in_percent or 0
+    discounted_prices = apply_discount_to_prices(
+        ((cart_item.product_id, cart_item.price) for cart_item in cart_items), discount_amount_in_percent)
+    total_price = sum(
+        (discounted_prices[cart_item.product_id] * cart_item.quantity for cart_item in cart_items), Decimal(0))
+
+    await async_session.execute(update(Order).where(Order.id == order_id).values(total_price=total_price))
+    await async_session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(total_amount_of_purchases=User.total_amount_of_purchases + total_price)
+    )
+    await async_session.commit()
+
+    return OrderDTO(
+        order_id=order_id,
+        status_name=ORDER_STATUS_CREATED,
+        total_price=float(total_price),
+        items=[CartItemQuantity(product_id=item.product_id, quantity=item.quantity) for item in cart_items]
+    ), True, cart_items[0].customer_level_name
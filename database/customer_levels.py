@@ -0,0 +1,144 @@
+import asyncio
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+from sqlalchemy.pool import NullPool
+
+from api.schemas.customer_level import CustomerLevelDTO
+from config import settings
+from database.models import CustomerLevel, BonusCard
+
+
+class CustomerLevelLadder:
+    """
+    Неизменяемая лестница уровней бонусной карты с доступом по названию и по номеру уровня.
+    При изменении таблицы customer_levels строится новая лестница, а не меняется текущая,
+    поэтому ссылку на лестницу можно безопасно использовать до конца запроса
+    """
+    __slots__ = ("levels", "by_name", "by_level_number")
+
+    def __init__(self, levels: Iterable[CustomerLevelDTO]):
+        levels = tuple(sorted(levels, key=lambda level: (level.level_number is None, level.level_number or 0)))
+        object.__setattr__(self, "levels", levels)
+        object.__setattr__(self, "by_name", MappingProxyType({level.name: level for level in levels}))
+        object.__setattr__(self, "by_level_number", MappingProxyType({
+            level.level_number: level
+            for level in levels
+            if level.level_number is not None
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Лестница уровней бонусной карты неизменяема")
+
+    def get(self, customer_level_name: str | None) -> CustomerLevelDTO | None:
+        return self.by_name.get(customer_level_name)
+
+    def get_next_level(self, customer_level_name: str | None) -> CustomerLevelDTO | None:
+        """
+        Функция поиска уровня, который на один выше чем переданный
+        :param customer_level_name: название текущего уровня;
+        :return: следующий уровень или None, если текущий уровень последний (или неизвестен).
+        """
+        customer_level = self.get(customer_level_name)
+        if customer_level is None or customer_level.level_number is None:
+            return None
+        return self.by_level_number.get(customer_level.level_number + 1)
+
+
+class CustomerLevelRegistry:
+    """
+    Хранит текущую лестницу уровней. Лестница загружается при запуске приложения,
+    а после уведомления об изменении таблицы customer_levels загружается заново при следующем обращении.
+    Также хранит время изменения уровней бонусных карт отдельных пользователей (по уведомлениям
+    об изменении строк bonus_cards): уровни в токенах доступа, выданных раньше, устарели
+    """
+    def __init__(self, session_maker: async_sessionmaker):
+        self.session_maker = session_maker
+        self._ladder: CustomerLevelLadder | None = None
+        self._stale = True
+        # Время последнего изменения лестницы (unix time), более ранние уровни в токенах доступа устарели
+        self.changed_at = 0.0
+        # Время последнего изменения уровня бонусной карты по id пользователя, в порядке уведомлений
+        self._user_levels_changed_at: OrderedDict[int, float] = OrderedDict()
+        self._load_lock = asyncio.Lock()
+
+    async def load(self) -> CustomerLevelLadder:
+        async with self.session_maker() as async_session:
+            customer_levels_from_db = await async_session.execute(select(CustomerLevel))
+            ladder = CustomerLevelLadder(
+                CustomerLevelDTO.model_validate(customer_level)
+                for customer_level in customer_levels_from_db.scalars().all()
+            )
+        self._ladder = ladder
+        return ladder
+
+    def invalidate(self, table_name: str = CustomerLevel.__tablename__):
+        self._stale = True
+        self.changed_at = time.time()
+
+    def invalidate_claims(self, table_name: str = BonusCard.__tablename__):
+        # Уровни изменились у многих пользователей (или уведомления могли быть пропущены) - устарели все токены
+        self.changed_at = time.time()
+
+    def bonus_card_changed(self, table_name: str, user_id: str):
+        """
+        Функция обработки уведомления об изменении уровня бонусной карты пользователя
+        :param table_name: имя таблицы (bonus_cards);
+        :param user_id: id пользователя (строкой).
+        """
+        now = time.time()
+        user_id = int(user_id)
+        # Пользователи хранятся в порядке уведомлений, поэтому первыми всегда идут самые старые изменения
+        self._user_levels_changed_at[user_id] = now
+        self._user_levels_changed_at.move_to_end(user_id)
+
+        # Удаляем пользователей, у которых все токены, выданные до изменения, уже устарели по времени
+        # (с учетом запаса для уровней, прочитанных с копии БД). Каждый пользователь удаляется один раз
+        expired_before = now - settings.CUSTOMER_LEVEL_CLAIM_TTL - settings.DB_REPLICA_MAX_LAG
+        while self._user_levels_changed_at:
+            oldest_user_id = next(iter(self._user_levels_changed_at))
+            if self._user_levels_changed_at[oldest_user_id] > expired_before:
+                break
+            del self._user_levels_changed_at[oldest_user_id]
+
+    def claims_changed_at(self, user_id: int) -> float:
+        # Время, раньше которого уровень в токене доступа пользователя устарел
+        return max(self.changed_at, self._user_levels_changed_at.get(user_id, 0.0))
+
+    async def get_ladder(self) -> CustomerLevelLadder:
+        if self._stale or self._ladder is None:
+            async with self._load_lock:
+                # Пока ждали блокировку, лестницу мог загрузить другой запрос
+                if self._stale or self._ladder is None:
+                    # Сбрасываем признак до загрузки, чтобы не потерять уведомление, пришедшее во время нее
+                    self._stale = False
+                    try:
+                        await self.load()
+                    except BaseException:
+                        self._stale = True
+                        raise
+        return self._ladder
+
+    async def get_customer_level(self, customer_level_name: str | None) -> CustomerLevelDTO | None:
+        """
+        Функция получения уровня бонусной карты по названию. Если уровня нет в лестнице
+        (например, уведомление об изменении еще не пришло), лестница загружается заново
+        :param customer_level_name: название уровня из бонусной карты пользователя;
+        :return: уровень или None.
+        """
+        ladder = await self.get_ladder()
+        customer_level = ladder.get(customer_level_name)
+        if customer_level is None and customer_level_name is not None:
+            self.invalidate()
+            customer_level = (await self.get_ladder()).get(customer_level_name)
+        return customer_level
+
+
+# Лестница загружается редко (при запуске и после изменения таблицы), поэтому для загрузки
+# открывается отдельное соединение, а не занимается соединение из пула запросов
+customer_levels = CustomerLevelRegistry(async_sessionmaker(
+    create_async_engine(settings.ASYNCPG_DATABASE_URL, poolclass=NullPool), class_=AsyncSession))
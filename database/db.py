@@ -1,9 +1,28 @@
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from config import settings
+from database.pool import InstrumentedAsyncQueuePool
 
-async_engine = create_async_engine(settings.ASYNCPG_DATABASE_URL)
+
+def create_pooled_async_engine(database_url: str):
+    return create_async_engine(
+        database_url,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    )
+
+
+async_engine = create_pooled_async_engine(settings.ASYNCPG_DATABASE_URL)
 async_session_maker = async_sessionmaker(async_engine, class_=AsyncSession)
 
+# Копия БД, на которую отправляются запросы только на чтение
+async_replica_engine = create_pooled_async_engine(settings.ASYNCPG_DATABASE_COPY_URL)
+async_replica_session_maker = async_sessionmaker(async_replica_engine, class_=AsyncSession)
+
 class Base(DeclarativeBase):
     pass
@@ -0,0 +1,58 @@
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from api.schemas.authentication import UserToken
+from api.security.authentication import check_jwt_access_token
+from database.db import async_session_maker
+from database.routing import get_read_session_maker, replica_router
+
+# Зависимости FastAPI, которые выдают одну сессию на весь запрос.
+# Сессия берет соединение из пула только при первом запросе к БД, поэтому
+# обработчики, которым БД не понадобилась, пул не занимают. Чтобы вернуть
+# соединение в пул до рендеринга шаблона, обработчик вызывает
+# "await async_session.close()" сразу после работы с БД - загруженные объекты
+# при этом остаются доступны, а сессию при необходимости можно использовать снова.
+
+
+async def get_async_session() -> AsyncSession:
+    """
+    Сессия основной БД (для запросов, изменяющих данные)
+    """
+    async with async_session_maker() as async_session:
+        yield async_session
+
+
+async def get_read_async_session(user: UserToken = Depends(check_jwt_access_token)) -> AsyncSession:
+    """
+    Сессия для запросов только на чтение, выбранная маршрутизатором копии БД
+    с учетом того, изменял ли пользователь данные недавно (время изменения хранится в токене доступа)
+    """
+    read_session_maker = await get_read_session_maker(user.last_write_at)
+    async with read_session_maker() as async_session:
+        yield async_session
+
+
+async def get_public_read_session_maker() -> async_sessionmaker:
+    """
+    Фабрика сессий для чтения, результат которого не зависит от пользователя, - для обработчиков,
+    которые работают с БД после возврата ответа (потоковая передача)
+    """
+    return await get_read_session_maker()
+
+
+async def get_cache_fill_async_session(
+        read_session_maker: async_sessionmaker = Depends(get_public_read_session_maker)) -> AsyncSession:
+    """
+    Сессия для чтения общих для всех пользователей данных, которые сохраняются в кэш (справочные данные,
+    страницы и фрагменты страниц). Сохранять прочитанное в кэш можно, только если can_fill_cache
+    """
+    async with read_session_maker() as async_session:
+        yield async_session
+
+
+async def can_fill_cache(read_session_maker: async_sessionmaker = Depends(get_public_read_session_maker)) -> bool:
+    """
+    Можно ли сохранять в кэш данные, прочитанные в этом запросе через get_public_read_session_maker. Кэш сбрасывается
+    по уведомлениям основной БД, поэтому данные отстающей копии отдаются пользователю без сохранения в кэш
+    """
+    return replica_router.is_up_to_date(read_session_maker)
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import heapq
+from types import MappingProxyType
+from typing import Iterable
+
+from sqlalchemy import select, desc, true
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+from sqlalchemy.pool import NullPool
+
+from api.schemas.main_page import ProductCardDTO
+from config import settings
+from database.models import Product, ProductSubtype
+
+
+def leaderboard_query(size: int):
+    """
+    Запрос лидеров продаж каждого подтипа: для каждого подтипа читаются первые size строк индекса
+    (подтип, количество продаж, id), поэтому запрос не просматривает всю таблицу товаров
+    :param size: количество лидеров продаж в подтипе;
+    :return: запрос строк (тип, подтип, товар, количество продаж). Подтип без товаров возвращается
+    одной строкой, в которой столбцы товара - NULL.
+    """
+    subtype_top_sellers = (
+        select(Product.id, Product.name, Product.price, Product.image_link, Product.rating, Product.number_of_sales)
+        .where(Product.product_subtype_name == ProductSubtype.name)
+        .order_by(desc(Product.number_of_sales), desc(Product.id))
+        .limit(size)
+        .lateral()
+    )
+    return (
+        select(ProductSubtype.type_name, ProductSubtype.name.label("subtype_name"), subtype_top_sellers)
+        .outerjoin(subtype_top_sellers, true())
+    )
+
+
+class Leaderboard:
+    """
+    Неизменяемые списки лидеров продаж: общий и по подтипам товаров. При обновлении строится
+    новый экземпляр, а не меняется текущий, поэтому ссылку на него можно использовать до конца запроса
+    """
+    __slots__ = ("top_sellers", "by_subtype", "version")
+
+    def __init__(self, rows: Iterable, size: int):
+        """
+        :param rows: строки запроса leaderboard_query, в каждом подтипе - по убыванию продаж
+        (подтип без товаров - строка с id товара NULL);
+        :param size: количество лидеров продаж в общем списке.
+        """
+        by_subtype = dict()
+        ranked_products = []
+        for row in rows:
+            subtype_top_sellers = by_subtype.setdefault((row.type_name, row.subtype_name), [])
+            if row.id is None:
+                continue
+            product = ProductCardDTO.model_validate(row)
+            subtype_top_sellers.append(product)
+            ranked_products.append((row.number_of_sales, row.id, product))
+        # Каждый товар из общих лидеров входит в лидеры своего подтипа, поэтому общий список
+        # выбирается из лидеров подтипов, а не из всех товаров
+        top_sellers = heapq.nlargest(size, ranked_products, key=lambda ranked_product: ranked_product[:2])
+        object.__setattr__(self, "top_sellers", tuple(product for _, _, product in top_sellers))
+        # Версия общего списка по его содержимому: списки, обновленные без изменений, имеют ту же версию
+        object.__setattr__(self, "version", hashlib.blake2b(
+            "\n".join(product.model_dump_json() for product in self.top_sellers).encode(), digest_size=8).hexdigest())
+        object.__setattr__(self, "by_subtype", MappingProxyType({
+            subtype_key: tuple(products)
+            for subtype_key, products in by_subtype.items()
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Списки лидеров продаж неизменяемы")
+
+    def get_subtype_top_sellers(self, product_type: str, product_subtype: str) -> tuple[ProductCardDTO, ...] | None:
+        return self.by_subtype.get((product_type, product_subtype))
+
+
+class LeaderboardRegistry:
+    """
+    Хранит текущие списки лидеров продаж. Списки загружаются при запуске приложения и обновляются
+    в фоне по расписанию (количество продаж меняется при каждой покупке) и после изменения категорий
+    или таблицы товаров целиком. До окончания обновления запросы получают текущие списки
+    """
+    def __init__(self, session_maker: async_sessionmaker, size: int, refresh_interval: float):
+        self.session_maker = session_maker
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self._leaderboard: Leaderboard | None = None
+        self._stale = True
+        self._load_lock = asyncio.Lock()
+        self._reload_task: asyncio.Task | None = None
+
+    async def load(self) -> Leaderboard:
+        async with self.session_maker() as async_session:
+            leaderboard_from_db = await async_session.execute(leaderboard_query(self.size))
+            return Leaderboard(leaderboard_from_db.all(), self.size)
+
+    def invalidate(self, table_name: str = Product.__tablename__):
+        self._stale = True
+
+    async def _reload(self):
+        # Сбрасываем признак до загрузки, чтобы не потерять уведомление, пришедшее во время нее
+        self._stale = False
+        try:
+            self._leaderboard = await self.load()
+        except BaseException:
+            self._stale = True
+            raise
+
+    async def _reload_in_background(self):
+        try:
+            await self._reload()
+        except (OSError, SQLAlchemyError) as e:
+            print(f"Не удалось обновить лидеров продаж: {e}")
+
+    async def refresh_periodically(self):
+        # Обновление по расписанию, запускается задачей на время работы приложения
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self._reload_in_background()
+
+    async def get_leaderboard(self) -> Leaderboard:
+        if self._leaderboard is None:
+            async with self._load_lock:
+                # Пока ждали блокировку, списки мог загрузить другой запрос
+                if self._leaderboard is None:
+                    await self._reload()
+        elif self._stale and (self._reload_task is None or self._reload_task.done()):
+            self._reload_task = asyncio.create_task(self._reload_in_background())
+        return self._leaderboard
+
+
+# Списки загружаются по расписанию, поэтому для загрузки открывается отдельное соединение,
+# а не занимается соединение из пула запросов
+top_sellers_leaderboard = LeaderboardRegistry(
+    async_sessionmaker(create_async_engine(settings.ASYNCPG_DATABASE_URL, poolclass=NullPool), class_=AsyncSession),
+    size=settings.LEADERBOARD_SIZE,
+    refresh_interval=settings.LEADERBOARD_REFRESH_INTERVAL
+)
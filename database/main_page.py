@@ -0,0 +1,140 @@
+from sqlalchemy import select, func, type_coerce, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.types import JSON
+
+from api.schemas.authentication import UserIdRole
+from api.schemas.main_page import ImageDTO, ProductTypeDTO
+from database.actions import images_cache_key, CATALOG_TREE_CACHE_KEY, CATALOG_TREE_TABLES
+from database.cache import reference_data_cache, content_version, MISSING
+from database.leaderboard import top_sellers_leaderboard
+from database.models import MainInfoImage, PromotionImage, ServiceImage, ProductType, ProductSubtype, BonusCard
+
+MAIN_PAGE_IMAGE_TABLES = {
+    "main_info_images": MainInfoImage,
+    "promotion_images": PromotionImage,
+    "service_images": ServiceImage
+}
+
+
+def json_array_subquery(json_element, from_clause, *criteria, order_by=None):
+    """
+    Скалярный подзапрос, собирающий строки в JSON-массив (пустой массив, если строк нет)
+    """
+    json_aggregate = func.json_agg(json_element if order_by is None else aggregate_order_by(json_element, order_by))
+    return type_coerce(
+        select(func.coalesce(json_aggregate, literal_column("'[]'::json")))
+        .select_from(from_clause)
+        .where(*criteria)
+        .scalar_subquery(),
+        JSON)
+
+
+def catalog_tree_subquery():
+    # Подтипы коррелируют с внешним запросом по типу продукта
+    product_subtypes = json_array_subquery(
+        func.json_build_object("name", ProductSubtype.name),
+        ProductSubtype,
+        ProductSubtype.type_name == ProductType.name)
+    return json_array_subquery(
+        func.json_build_object("name", ProductType.name, "product_subtypes", product_subtypes),
+        ProductType)
+
+
+def customer_level_name_subquery(user: UserIdRole):
+    return (
+        select(BonusCard.customer_level_name)
+        .where(BonusCard.user_id == user.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+async def load_main_page_data(
+        async_session,
+        user: UserIdRole,
+        load_customer_level: bool = True,
+        cache_fill_session=None,
+        store_in_cache: bool = True) -> dict:
+    """
+    Функция загрузки всех данных главной страницы за один запрос к БД: изображения,
+    каталог и уровень бонусной карты пользователя собираются в JSON скалярными
+    подзапросами, поэтому загрузка занимает один сетевой обмен с БД вместо пяти.
+    Изображения и каталог берутся из кэша справочных данных, если они там есть,
+    лидеры продаж - из списков, обновляемых по расписанию (запрос к БД не нужен)
+    :param async_session: экземпляр асинхронной сессии (можно сессию копии БД);
+    :param user: пользователь, запрашивающий страницу;
+    :param load_customer_level: загружать ли уровень бонусной карты (не нужно, если он актуален в токене доступа);
+    :param cache_fill_session: экземпляр асинхронной сессии для общих для всех пользователей данных (см.
+    get_cache_fill_async_session), через который выполняется запрос, если нужно заполнить кэш справочных данных
+    (по умолчанию async_session);
+    :param store_in_cache: сохранять ли загруженные справочные данные в кэш (нельзя, если сессия читает
+    с отстающей копии БД - см. can_fill_cache);
+    :return: словарь с DTO блоков страницы, названием уровня бонусной карты пользователя (None для гостя)
+    и версией данных страницы (version).
+    """
+    main_page_data = dict()
+    versions = dict()
+    table_versions = dict()
+    columns = []
+    for block_name, ImagesToFind in MAIN_PAGE_IMAGE_TABLES.items():
+        main_page_data[block_name], versions[block_name] = reference_data_cache.get_with_version(
+            images_cache_key(ImagesToFind, ImageDTO))
+        if main_page_data[block_name] is MISSING:
+            table_versions[block_name] = reference_data_cache.snapshot_versions([ImagesToFind.__tablename__])
+            columns.append(json_array_subquery(ImagesToFind.image_link, ImagesToFind).label(block_name))
+
+    main_page_data["product_types_subtypes"], versions["product_types_subtypes"] = (
+        reference_data_cache.get_with_version(CATALOG_TREE_CACHE_KEY))
+    if main_page_data["product_types_subtypes"] is MISSING:
+        table_versions["product_types_subtypes"] = reference_data_cache.snapshot_versions(CATALOG_TREE_TABLES)
+        columns.append(catalog_tree_subquery().label("product_types_subtypes"))
+
+    if user.role == "user" and load_customer_level:
+        columns.append(customer_level_name_subquery(user).label("customer_level_name"))
+
+    main_page_from_db = dict()
+    if columns:
+        if table_versions and cache_fill_session is not None:
+            async_session = cache_fill_session
+        main_page_from_db = await async_session.execute(select(*columns))
+        main_page_from_db = main_page_from_db.mappings().one()
+
+    for block_name, ImagesToFind in MAIN_PAGE_IMAGE_TABLES.items():
+        if block_name in table_versions:
+            main_page_data[block_name] = [
+                ImageDTO(image_link=image_link)
+                for image_link in main_page_from_db[block_name]
+            ]
+            versions[block_name] = reference_data_cache.set(
+                images_cache_key(ImagesToFind, ImageDTO), main_page_data[block_name], table_versions[block_name]
+            ) if store_in_cache else content_version(main_page_data[block_name])
+    if "product_types_subtypes" in table_versions:
+        main_page_data["product_types_subtypes"] = [
+            ProductTypeDTO.model_validate(product_type)
+            for product_type in main_page_from_db["product_types_subtypes"]
+        ]
+        versions["product_types_subtypes"] = reference_data_cache.set(
+            CATALOG_TREE_CACHE_KEY, main_page_data["product_types_subtypes"], table_versions["product_types_subtypes"]
+        ) if store_in_cache else content_version(main_page_data["product_types_subtypes"])
+
+    leaderboard = await top_sellers_leaderboard.get_leaderboard()
+    main_page_data["top_sellers"] = list(leaderboard.top_sellers)
+    main_page_data["customer_level_name"] = main_page_from_db.get("customer_level_name")
+    main_page_data["version"] = (*versions.values(), leaderboard.version)
+    return main_page_data
+
+
+async def get_main_page_version() -> tuple | None:
+    """
+    Функция получения версии общих для всех пользователей данных главной страницы без запросов к БД
+    :return: версии записей кэша и лидеров продаж (как в load_main_page_data) или None,
+    если какие-то данные нужно загрузить из БД.
+    """
+    versions = [
+        reference_data_cache.get_with_version(images_cache_key(ImagesToFind, ImageDTO))[1]
+        for ImagesToFind in MAIN_PAGE_IMAGE_TABLES.values()
+    ]
+    versions.append(reference_data_cache.get_with_version(CATALOG_TREE_CACHE_KEY)[1])
+    if None in versions:
+        return None
+    return (*versions, (await top_sellers_leaderboard.get_leaderboard()).version)
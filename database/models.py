@@ -2,8 +2,9 @@ import datetime
 
 from database.db import Base
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, text, ForeignKey, SmallInteger, Numeric, LargeBinary, Float, literal_column
+from sqlalchemy import String, text, ForeignKey, SmallInteger, Numeric, LargeBinary, literal_column, Index, Computed, UniqueConstraint
 from typing import Annotated
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 
 class CustomTypes:
@@ -30,7 +31,7 @@ class User(Base):
     login: Mapped[str | None] = mapped_column(String(30), unique=True)
     hashed_password: Mapped[bytes | None] = mapped_column(LargeBinary)
     role: Mapped[str] = mapped_column(String(15), server_default="user")
-    total_amount_of_purchases: Mapped[float] = mapped_column(Float, server_default=literal_column('0.0'))
+    total_amount_of_purchases: Mapped[float] = mapped_column(Numeric(12, 2), server_default=literal_column('0.0'))
     date_of_registration: Mapped[CustomTypes.created_at]
     date_of_update: Mapped[CustomTypes.updated_at]
 
@@ -41,11 +42,15 @@ class User(Base):
     items_in_cart: Mapped[list["Product"]] = relationship(back_populates="customers", secondary="cart_items", cascade="all, delete", passive_deletes=True)
 
 
+# Пересчет уровней бонусных карт в режиме --incremental выбирает пользователей, измененных после прошлого запуска
+Index("ix_users_date_of_update", User.date_of_update)
+
+
 class UserAddress(Base):
     __tablename__ = "users_addresses"
 
     id: Mapped[CustomTypes.int_pk]
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
     city: Mapped[str] = mapped_column(String(30))
     street: Mapped[str] = mapped_column(String(30))
     house_number: Mapped[str] = mapped_column(String(10))
@@ -85,10 +90,16 @@ class Order(Base):
 
     id: Mapped[CustomTypes.int_pk]
     delivery_type_name: Mapped[str] = mapped_column(ForeignKey("delivery_types.name"))
+    # Заказы пользователя ищутся по уникальному ограничению (user_id, idempotency_key)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     address_id: Mapped[int] = mapped_column(ForeignKey("users_addresses.id"))
     status_name: Mapped[str] = mapped_column(ForeignKey("order_statuses.name"))
     payment_method_name: Mapped[str] = mapped_column(ForeignKey("payment_methods.name"))
+    # Сумма заказа со скидкой пользователя на момент оформления
+    total_price: Mapped[float | None] = mapped_column(Numeric(12, 2))
+    # Ключ идемпотентности из заголовка Idempotency-Key: повторный запрос оформления с тем же ключом
+    # возвращает уже оформленный заказ, а не создает новый
+    idempotency_key: Mapped[str | None] = mapped_column(String(64))
     date_of_registration: Mapped[CustomTypes.created_at]
     date_of_update: Mapped[CustomTypes.updated_at]
 
@@ -99,6 +110,10 @@ class Order(Base):
     payment_method: Mapped["PaymentMethod"] = relationship(back_populates="orders")
     products: Mapped[list["Product"]] = relationship(back_populates="orders", secondary="order_items")
 
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key", name="uq_orders_user_id_idempotency_key"),
+    )
+
 
 class CustomerLevel(Base):
     __tablename__ = "customer_levels"
@@ -115,7 +130,7 @@ class BonusCard(Base):
     __tablename__ = "bonus_cards"
 
     id: Mapped[CustomTypes.int_pk]
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
     customer_level_name: Mapped[str] = mapped_column(ForeignKey("customer_levels.name"), server_default="Новичок")
     date_of_registration: Mapped[CustomTypes.created_at]
     date_of_update: Mapped[CustomTypes.updated_at]
@@ -144,6 +159,14 @@ class ProductSubtype(Base):
     products: Mapped[list["Product"]] = relationship(back_populates="product_subtype")
 
 
+# Название важнее описания, описание важнее дополнительной информации (веса A, B, C в ts_rank)
+PRODUCT_SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(additional_information, '')), 'C')"
+)
+
+
 class Product(Base):
     __tablename__ = "products"
 
@@ -156,13 +179,32 @@ class Product(Base):
     product_subtype_name: Mapped[str] = mapped_column(ForeignKey("product_subtypes.name"))
     additional_information: Mapped[str]
     rating: Mapped[float] = mapped_column(Numeric(1, 1))
-    number_of_sales: Mapped[int | None]
+    number_of_sales: Mapped[int] = mapped_column(server_default=text("0"))
+    # Сводные данные по отзывам: изменяются в одной транзакции с созданием и удалением отзыва,
+    # пересчитываются по всем отзывам задачей jobs.backfill_feedback_aggregates
+    feedbacks_count: Mapped[int] = mapped_column(server_default=text("0"))
+    feedback_likes_count: Mapped[int] = mapped_column(server_default=text("0"))
+    feedback_dislikes_count: Mapped[int] = mapped_column(server_default=text("0"))
+    feedback_ratings_sum: Mapped[int] = mapped_column(server_default=text("0"))
+    feedback_ratings_count: Mapped[int] = mapped_column(server_default=text("0"))
+    # Вектор полнотекстового поиска, вычисляется и хранится в БД. Отложенная загрузка -
+    # чтобы обычные запросы товаров не читали его
+    search_vector: Mapped[str] = mapped_column(TSVECTOR, Computed(PRODUCT_SEARCH_VECTOR, persisted=True), deferred=True)
 
     product_subtype: Mapped["ProductSubtype"] = relationship(back_populates="products")
     orders: Mapped[list["Order"]] = relationship(back_populates="products", secondary="order_items")
     feedbacks: Mapped[list["ProductFeedback"]] = relationship(back_populates="product")
     customers: Mapped[list["User"]] = relationship(back_populates="items_in_cart", secondary="cart_items")
 
+    # Индексы для постраничного вывода товаров подтипа с сортировкой (keyset pagination)
+    __table_args__ = (
+        Index("ix_products_subtype_price_id", "product_subtype_name", "price", "id"),
+        Index("ix_products_subtype_rating_id", "product_subtype_name", "rating", "id"),
+        Index("ix_products_subtype_number_of_sales_id", "product_subtype_name", "number_of_sales", "id"),
+        Index("ix_products_subtype_name_id", "product_subtype_name", "name", "id"),
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
@@ -176,13 +218,15 @@ class ProductFeedback(Base):
     __tablename__ = "product_feedbacks"
 
     id: Mapped[CustomTypes.int_pk]
-    author_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    author_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"))
     liked_text: Mapped[str]
     disliked_text: Mapped[str]
     admin_comment: Mapped[str | None]
     number_of_likes: Mapped[int] = mapped_column(SmallInteger, server_default=literal_column('0'))
     number_of_dislikes: Mapped[int] = mapped_column(SmallInteger, server_default=literal_column('0'))
+    # Оценка товара от 1 до 5 (необязательная)
+    rating: Mapped[int | None] = mapped_column(SmallInteger)
     date_of_registration: Mapped[CustomTypes.created_at]
     date_of_update: Mapped[CustomTypes.updated_at]
 
@@ -190,6 +234,15 @@ class ProductFeedback(Base):
     product: Mapped["Product"] = relationship(back_populates="feedbacks")
 
 
+# Индекс для вывода отзывов товара от новых к старым постранично (keyset pagination)
+Index(
+    "ix_product_feedbacks_product_date_of_update_id",
+    ProductFeedback.product_id,
+    ProductFeedback.date_of_update.desc(),
+    ProductFeedback.id.desc()
+)
+
+
 class CartItem(Base):
     __tablename__ = "cart_items"
 
@@ -213,3 +266,11 @@ class PromotionImage(Base, ImageTable):
 
 class ServiceImage(Base, ImageTable):
     __tablename__ = "service_images"
+
+
+class JobRun(Base):
+    # Время последнего запуска фоновых задач (jobs), от которого считаются изменения для следующего запуска
+    __tablename__ = "job_runs"
+
+    name: Mapped[CustomTypes.str50_pk]
+    last_started_at: Mapped[datetime.datetime]
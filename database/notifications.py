@@ -0,0 +1,105 @@
+import asyncio
+from collections import defaultdict
+from typing import Callable
+
+import asyncpg
+
+from config import settings
+
+# Канал, в который триггеры отправляют имя измененной таблицы (см. миграцию 4f7c2d9e8a61)
+TABLE_CHANGES_CHANNEL = "stroimarket_table_changes"
+# Канал, в который триггеры отправляют "имя таблицы:id" измененной строки (см. миграции e2b9d4c7a153 и 8b2e5c1d7f36)
+ROW_CHANGES_CHANNEL = "stroimarket_row_changes"
+
+
+class TableChangesListener:
+    """
+    Слушатель уведомлений PostgreSQL об изменении таблиц. Держит отдельное от пула
+    соединение с основной БД и вызывает обработчики, подписанные на измененную таблицу
+    (или на изменение отдельных строк таблицы).
+    После (пере)подключения вызываются все обработчики изменения таблиц, так как пока соединения не было,
+    уведомления могли быть пропущены
+    """
+    def __init__(self, dsn: str, channel: str, row_channel: str, reconnect_delay: float, ping_interval: float):
+        self.dsn = dsn
+        self.channel = channel
+        self.row_channel = row_channel
+        self.reconnect_delay = reconnect_delay
+        self.ping_interval = ping_interval
+        self._handlers: defaultdict[str, set[Callable[[str], None]]] = defaultdict(set)
+        self._row_handlers: defaultdict[str, set[Callable[[str, str], None]]] = defaultdict(set)
+
+    def subscribe(self, table_name: str, handler: Callable[[str], None]):
+        """
+        Функция подписки на изменения таблицы
+        :param table_name: имя таблицы в БД;
+        :param handler: функция, принимающая имя измененной таблицы. Вызывается в цикле событий,
+        поэтому должна быть быстрой и не блокирующей.
+        """
+        self._handlers[table_name].add(handler)
+
+    def subscribe_rows(self, table_name: str, handler: Callable[[str, str], None]):
+        """
+        Функция подписки на изменения строк таблицы. Пропущенные при переподключении изменения строк
+        не повторяются, поэтому вместе с ней нужна подписка на изменения всей таблицы (subscribe)
+        :param table_name: имя таблицы в БД;
+        :param handler: функция, принимающая имя таблицы и id измененной строки (строкой).
+        """
+        self._row_handlers[table_name].add(handler)
+
+    def _notify_handlers(self, table_name: str):
+        for handler in self._handlers.get(table_name, ()):
+            handler(table_name)
+
+    def _notify_all_handlers(self):
+        for table_name in list(self._handlers):
+            self._notify_handlers(table_name)
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        self._notify_handlers(payload)
+
+    def _on_row_notification(self, connection, pid: int, channel: str, payload: str):
+        table_name, _, row_id = payload.partition(":")
+        for handler in self._row_handlers.get(table_name, ()):
+            handler(table_name, row_id)
+
+    async def listen(self):
+        """
+        Функция получения уведомлений с переподключением при обрыве соединения.
+        Работает до отмены задачи, в которой запущена
+        """
+        while True:
+            try:
+                await self._listen_until_disconnect()
+            except asyncio.CancelledError:
+                raise
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as error:
+                print(f"Соединение для получения уведомлений об изменении таблиц недоступно: {error!r}")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen_until_disconnect(self):
+        connection = await asyncpg.connect(self.dsn)
+        connection_lost = asyncio.Event()
+        connection.add_termination_listener(lambda _: connection_lost.set())
+        try:
+            await connection.add_listener(self.channel, self._on_notification)
+            await connection.add_listener(self.row_channel, self._on_row_notification)
+            self._notify_all_handlers()
+            while not connection_lost.is_set():
+                try:
+                    await asyncio.wait_for(connection_lost.wait(), timeout=self.ping_interval)
+                except asyncio.TimeoutError:
+                    # Проверяем, что соединение не оборвалось незаметно для клиента
+                    await asyncio.wait_for(connection.execute("SELECT 1"), timeout=self.ping_interval)
+        finally:
+            if not connection.is_closed():
+                connection.terminate()
+
+
+table_changes_listener = TableChangesListener(
+    dsn=settings.POSTGRES_DSN,
+    channel=TABLE_CHANGES_CHANNEL,
+    row_channel=ROW_CHANGES_CHANNEL,
+    reconnect_delay=settings.DB_NOTIFICATIONS_RECONNECT_DELAY,
+    ping_interval=settings.DB_NOTIFICATIONS_PING_INTERVAL
+)
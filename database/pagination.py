@@ -0,0 +1,54 @@
+import base64
+import binascii
+import json
+from typing import Sequence
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Select, tuple_, literal
+
+from api.errors.catalog.exceptions import InvalidCursor
+
+
+def encode_cursor(cursor: BaseModel) -> str:
+    """
+    Функция кодирования курсора страницы в непрозрачную для клиента строку (base64url без "=")
+    """
+    return base64.urlsafe_b64encode(cursor.model_dump_json().encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, CursorModel: type[BaseModel]) -> BaseModel:
+    try:
+        cursor_json = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return CursorModel.model_validate(json.loads(cursor_json))
+    except (binascii.Error, UnicodeDecodeError, ValueError, ValidationError):
+        raise InvalidCursor()
+
+
+def keyset_page_query(
+        query: Select,
+        order_columns: Sequence,
+        descending: bool,
+        after_values: Sequence | None,
+        limit: int) -> Select:
+    """
+    Функция построения запроса страницы по ключу (keyset): вместо OFFSET запрос начинается
+    сразу после последней строки предыдущей страницы, поэтому по индексу
+    (..., *order_columns) читается только limit + 1 строк на любой странице
+    :param query: запрос без сортировки и ограничения количества строк;
+    :param order_columns: столбцы сортировки, последний должен быть уникальным (обычно id);
+    :param descending: сортировка по убыванию (по всем столбцам, чтобы использовать один индекс);
+    :param after_values: значения order_columns последней строки предыдущей страницы (None - первая страница);
+    :param limit: размер страницы. Запрашивается на одну строку больше, чтобы узнать, есть ли следующая страница.
+    """
+    if after_values is not None:
+        row = tuple_(*order_columns)
+        after_row = tuple_(*(
+            literal(value, column.type)
+            for column, value in zip(order_columns, after_values)
+        ))
+        query = query.where(row < after_row if descending else row > after_row)
+    return (
+        query
+        .order_by(*(column.desc() if descending else column.asc() for column in order_columns))
+        .limit(limit + 1)
+    )
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+
+from pydantic import BaseModel
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolWaitStatistics:
+    """
+    Накопительная статистика ожидания свободного соединения в пуле
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def add_wait(self, wait_seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений asyncpg, который дополнительно замеряет время ожидания
+    свободного соединения (время, которое запрос провел в очереди пула)
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_statistics = PoolWaitStatistics()
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.wait_statistics.add_wait(time.perf_counter() - started_at, timed_out=True)
+            raise
+        self.wait_statistics.add_wait(time.perf_counter() - started_at)
+        return connection
+
+
+class PoolStats(BaseModel):
+    pid: int
+    pool_size: int
+    max_overflow: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    timeouts: int
+    average_wait_ms: float
+    max_wait_ms: float
+
+
+def get_pool_stats(engine: AsyncEngine) -> PoolStats:
+    """
+    Функция получения текущего состояния пула соединений движка
+    :param engine: асинхронный движок SQLAlchemy;
+    :return: статистика пула для текущего процесса (воркера uvicorn).
+    """
+    pool = engine.sync_engine.pool
+    wait_statistics = getattr(pool, "wait_statistics", PoolWaitStatistics())
+    checkouts = wait_statistics.checkouts + wait_statistics.timeouts
+    return PoolStats(
+        pid=os.getpid(),
+        pool_size=pool.size(),
+        max_overflow=pool._max_overflow,
+        checked_in=pool.checkedin(),
+        checked_out=pool.checkedout(),
+        # До заполнения пула overflow отрицательный, поэтому приводим к нулю
+        overflow=max(pool.overflow(), 0),
+        checkouts=wait_statistics.checkouts,
+        timeouts=wait_statistics.timeouts,
+        average_wait_ms=wait_statistics.total_wait_seconds / checkouts * 1000 if checkouts else 0.0,
+        max_wait_ms=wait_statistics.max_wait_seconds * 1000
+    )
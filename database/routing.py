@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from config import settings
+from database.db import async_session_maker, async_replica_session_maker, async_replica_engine
+
+# Отставание копии в секундах (0, если все полученные изменения уже применены). Отставание можно определить
+# только у резервного сервера потоковой репликации: для копии, которая не находится в режиме восстановления
+# (обычная БД), запрос возвращает NULL, и копия не используется
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaRouter:
+    """
+    Маршрутизатор сессий: запросы только на чтение отправляются на копию БД,
+    все остальные - на основную. Пользователи, недавно изменявшие данные,
+    читают с основной БД (read-your-writes), пока не истечет окно DB_READ_YOUR_WRITES_WINDOW.
+    Время изменения данных приходит из токена доступа пользователя (mark_user_write),
+    поэтому маршрутизация одинакова во всех воркерах uvicorn
+    """
+    def __init__(
+            self,
+            primary_session_maker: async_sessionmaker,
+            replica_session_maker: async_sessionmaker,
+            replica_engine: AsyncEngine):
+        self.primary_session_maker = primary_session_maker
+        self.replica_session_maker = replica_session_maker
+        self.replica_engine = replica_engine
+        self.replica_available = False
+        # Отставание копии при последней проверке (None - неизвестно)
+        self.replica_lag: float | None = None
+        self._checked_at = float("-inf")
+        self._check_lock = asyncio.Lock()
+
+    @staticmethod
+    def is_recent_write(last_write_at: float | None) -> bool:
+        return last_write_at is not None and time.time() - last_write_at < settings.DB_READ_YOUR_WRITES_WINDOW
+
+    async def get_replica_lag(self) -> float | None:
+        async with self.replica_engine.connect() as connection:
+            replica_lag = await connection.scalar(REPLICA_LAG_QUERY)
+            return None if replica_lag is None else float(replica_lag)
+
+    async def check_replica(self) -> bool:
+        try:
+            # Ограничиваем время проверки, включая установку соединения,
+            # чтобы недоступная копия не задерживала запросы пользователей
+            replica_lag = await asyncio.wait_for(self.get_replica_lag(), timeout=settings.DB_REPLICA_CHECK_TIMEOUT)
+            if replica_lag is None:
+                print("Копия БД не является резервным сервером (не в режиме восстановления), ее отставание неизвестно")
+            self.replica_lag = replica_lag
+            self.replica_available = replica_lag is not None and replica_lag <= settings.DB_REPLICA_MAX_LAG
+        except Exception as e:
+            print(f"Копия БД недоступна: {e}")
+            self.replica_lag = None
+            self.replica_available = False
+        self._checked_at = time.monotonic()
+        return self.replica_available
+
+    async def get_read_session_maker(self, last_write_at: float | None = None) -> async_sessionmaker:
+        """
+        Функция выбора фабрики сессий для запросов только на чтение
+        :param last_write_at: время последнего изменения данных пользователем из токена доступа
+        (None - не изменял или запрос не зависит от пользователя);
+        :return: фабрика сессий копии БД или, если копия недоступна, отстает, не является резервным сервером
+        или пользователь недавно изменял данные, фабрика сессий основной БД.
+        """
+        if not settings.DB_REPLICA_ENABLED or self.is_recent_write(last_write_at):
+            return self.primary_session_maker
+
+        if time.monotonic() - self._checked_at > settings.DB_REPLICA_CHECK_INTERVAL:
+            async with self._check_lock:
+                # Пока ждали блокировку, проверку мог выполнить другой запрос
+                if time.monotonic() - self._checked_at > settings.DB_REPLICA_CHECK_INTERVAL:
+                    await self.check_replica()
+
+        return self.replica_session_maker if self.replica_available else self.primary_session_maker
+
+    def is_up_to_date(self, session_maker: async_sessionmaker) -> bool:
+        """
+        Функция проверки, что данные, прочитанные через фабрику сессий, можно сохранять в кэши, которые
+        сбрасываются по уведомлениям основной БД: иначе отставшие данные копии остались бы в кэше до истечения TTL
+        :param session_maker: фабрика сессий, выбранная get_read_session_maker;
+        :return: True для основной БД и для копии, у которой при последней проверке не было отставания.
+        """
+        if session_maker is self.primary_session_maker:
+            return True
+        return session_maker is self.replica_session_maker and self.replica_lag == 0
+
+    def is_replica_session(self, async_session: AsyncSession) -> bool:
+        """
+        Функция проверки, что сессия выполняет запросы на копии БД
+        :param async_session: экземпляр асинхронной сессии;
+        :return: True, если сессия создана фабрикой сессий копии БД.
+        """
+        return async_session.bind is self.replica_engine
+
+
+replica_router = ReplicaRouter(async_session_maker, async_replica_session_maker, async_replica_engine)
+get_read_session_maker = replica_router.get_read_session_maker
@@ -0,0 +1,495 @@
+import asyncio
+import heapq
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from itertools import chain, groupby, islice
+from typing import Iterable, Iterator
+from urllib.parse import quote
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+from sqlalchemy.pool import NullPool
+
+from api.schemas.catalog import SuggestionDTO
+from config import settings
+from database.models import Product, ProductSubtype
+
+# Клавиши раскладок QWERTY и ЙЦУКЕН в одном порядке: "ljcrf" -> "доска"
+LATIN_KEYS = "`qwertyuiop[]asdfghjkl;'zxcvbnm,."
+CYRILLIC_KEYS = "ёйцукенгшщзхъфывапролджэячсмитьбю"
+LATIN_TO_CYRILLIC = str.maketrans(LATIN_KEYS, CYRILLIC_KEYS)
+CYRILLIC_TO_LATIN = str.maketrans(CYRILLIC_KEYS, LATIN_KEYS)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Максимальное количество подсказок в ответе. Для префиксов длиной до PREFIX_CACHE_LENGTH
+# лучшие MAX_SUGGESTIONS товаров вычисляются заранее
+MAX_SUGGESTIONS = 20
+PREFIX_CACHE_LENGTH = 3
+# Исправление опечаток выполняется для слов из букв не короче этой длины
+MIN_TYPO_WORD_LENGTH = 4
+# Количество слов словаря (с наибольшим числом общих триграмм), с которыми сравнивается слово с опечаткой
+MAX_TYPO_CANDIDATES = 50
+# Ограничение количества товаров, проверяемых по запросу из нескольких слов. Диапазоны слов
+# не больше этого размера объединяются сразу, большие - постепенно
+MAX_SCANNED_PRODUCTS = 20_000
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower().replace("ё", "е"))
+
+
+def word_trigrams(word: str) -> set[str]:
+    # Начало слова дополняется пробелами: пользователь набирает слово с начала
+    padded_word = f"  {word}"
+    return {padded_word[i:i + 3] for i in range(len(padded_word) - 2)}
+
+
+def typo_distance(first: str, second: str, max_distance: int) -> int:
+    """
+    Функция расчета количества опечаток между словами (расстояние Дамерау-Левенштейна:
+    пропуск, лишняя, замененная буква или перестановка соседних букв - одна опечатка)
+    :param first: первое слово;
+    :param second: второе слово;
+    :param max_distance: расстояние, после которого расчет прекращается;
+    :return: количество опечаток или max_distance + 1, если их больше max_distance.
+    """
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+
+    before_previous_row = None
+    previous_row = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        current_row = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            current_row[j] = min(
+                previous_row[j] + 1,
+                current_row[j - 1] + 1,
+                previous_row[j - 1] + (first[i - 1] != second[j - 1]))
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                current_row[j] = min(current_row[j], before_previous_row[j - 2] + 1)
+        if min(current_row) > max_distance:
+            return max_distance + 1
+        before_previous_row, previous_row = previous_row, current_row
+    return min(previous_row[-1], max_distance + 1)
+
+
+class TypoCorrector:
+    """
+    Исправление опечаток в словах запроса по словарю из названий товаров и категорий.
+    Кандидаты подбираются по общим триграммам, затем сравниваются с началом слова
+    словаря той же длины (запрос может быть набран не до конца)
+    """
+    def __init__(self, words: Iterable[str]):
+        self.words = sorted({word for word in words if len(word) >= MIN_TYPO_WORD_LENGTH and word.isalpha()})
+        words_by_trigram = defaultdict(list)
+        for word_index, word in enumerate(self.words):
+            for trigram in word_trigrams(word):
+                words_by_trigram[trigram].append(word_index)
+        self.words_by_trigram = {trigram: array("I", word_indexes) for trigram, word_indexes in words_by_trigram.items()}
+
+    def correct(self, token: str) -> str | None:
+        if len(token) < MIN_TYPO_WORD_LENGTH or not token.isalpha():
+            return None
+        max_typos = 1 if len(token) <= 6 else 2
+
+        token_trigrams = word_trigrams(token)
+        shared_trigrams = Counter()
+        for trigram in token_trigrams:
+            shared_trigrams.update(self.words_by_trigram.get(trigram, ()))
+        # Одна опечатка меняет не больше трех триграмм
+        min_shared_trigrams = len(token_trigrams) - 3 * max_typos
+
+        best_distance, best_word = max_typos + 1, None
+        for word_index, number_of_shared_trigrams in shared_trigrams.most_common(MAX_TYPO_CANDIDATES):
+            if number_of_shared_trigrams < min_shared_trigrams:
+                break
+            word = self.words[word_index]
+            distance = min((
+                typo_distance(token, word[:length], max_typos)
+                for length in (len(token) - 1, len(token), len(token) + 1)
+                if length <= len(word)
+            ), default=max_typos + 1)
+            if distance < best_distance:
+                best_distance, best_word = distance, word
+        return best_word
+
+
+class CategoryIndex:
+    """
+    Подсказки категорий: подтип находится и по своему названию, и по названию типа.
+    Категорий немного, поэтому они просматриваются целиком
+    """
+    def __init__(self, subtypes: Iterable[tuple[str, str]]):
+        self.categories = [
+            (subtype_name, f"/catalog/{quote(type_name)}/{quote(subtype_name)}",
+             tuple(tokenize(f"{subtype_name} {type_name}")))
+            for subtype_name, type_name in sorted(subtypes)
+        ]
+
+    def tokens(self) -> Iterator[str]:
+        return chain.from_iterable(category_tokens for _, _, category_tokens in self.categories)
+
+    def has_prefix(self, prefix: str) -> bool:
+        return any(token.startswith(prefix) for token in self.tokens())
+
+    def search(self, tokens: list[str]) -> list[tuple[str, str]]:
+        return [
+            (subtype_name, url)
+            for subtype_name, url, category_tokens in self.categories
+            if all(any(word.startswith(token) for word in category_tokens) for token in tokens)
+        ]
+
+
+class ProductNameIndex:
+    """
+    Индекс начал слов в названиях товаров. Товары упорядочены по количеству продаж, номер записи -
+    место товара в этом порядке. Для каждого слова хранится возрастающий список записей с этим словом:
+    все списки лежат подряд в одном массиве postings, список слова tokens[i] -
+    postings[offsets[i]:offsets[i + 1]]. Слова отсортированы, поэтому слова с общим началом
+    находятся двоичным поиском и образуют непрерывный диапазон. Также для каждой записи хранятся
+    номера ее слов (entry_tokens, entry_offsets) - для проверки остальных слов запроса.
+    Изменения товаров после построения не перестраивают массивы: старая запись товара
+    исключается, а новое название хранится отдельно (changed_products) и просматривается целиком
+    """
+    def __init__(self, products: Iterable[tuple[int, str, int]]):
+        products = sorted(products, key=lambda product: (-product[2], product[0]))
+        self.product_ids = array("q", (product_id for product_id, _, _ in products))
+        self.names = [name for _, name, _ in products]
+        self.numbers_of_sales = array("q", (number_of_sales for _, _, number_of_sales in products))
+        # Номера записей в порядке id товара - для поиска записи измененного товара
+        self.entries_by_product_id = array("I", sorted(range(len(products)), key=self.product_ids.__getitem__))
+
+        tokens_by_entry = [tuple(set(tokenize(name))) for name in self.names]
+        self.tokens = sorted(set().union(*tokens_by_entry))
+        token_indexes = {token: i for i, token in enumerate(self.tokens)}
+        entries_by_token = [[] for _ in self.tokens]
+        self.entry_offsets = array("I", [0])
+        self.entry_tokens = array("I")
+        for entry, entry_tokens in enumerate(tokens_by_entry):
+            for i in sorted(token_indexes[token] for token in entry_tokens):
+                self.entry_tokens.append(i)
+                entries_by_token[i].append(entry)
+            self.entry_offsets.append(len(self.entry_tokens))
+        del tokens_by_entry, token_indexes
+
+        self.offsets = array("I", [0])
+        self.postings = array("I")
+        for token_entries in entries_by_token:
+            self.postings.extend(token_entries)
+            self.offsets.append(len(self.postings))
+        del entries_by_token
+
+        self.top_entries_by_prefix = self._build_top_entries_by_prefix()
+        self.removed_entries: set[int] = set()
+        # id товара -> (название, количество продаж, слова названия через пробел с пробелом в начале)
+        self.changed_products: dict[int, tuple[str, int, str]] = dict()
+
+    def _build_top_entries_by_prefix(self) -> dict[str, array]:
+        # Лучшие записи для начала длиной PREFIX_CACHE_LENGTH вычисляются по спискам слов,
+        # для более коротких начал - по уже вычисленным спискам более длинных и по словам, равным началу
+        top_entries_by_prefix = defaultdict(set)
+        for i, token in enumerate(self.tokens):
+            top_entries_by_prefix[token[:PREFIX_CACHE_LENGTH]].update(
+                self.postings[self.offsets[i]:min(self.offsets[i] + MAX_SUGGESTIONS, self.offsets[i + 1])])
+        for length in range(PREFIX_CACHE_LENGTH, 1, -1):
+            for prefix in [prefix for prefix in top_entries_by_prefix if len(prefix) == length]:
+                top_entries_by_prefix[prefix[:-1]].update(
+                    sorted(top_entries_by_prefix[prefix])[:MAX_SUGGESTIONS])
+        return {
+            prefix: array("I", sorted(top_entries)[:MAX_SUGGESTIONS])
+            for prefix, top_entries in top_entries_by_prefix.items()
+        }
+
+    @property
+    def number_of_changes(self) -> int:
+        return len(self.removed_entries) + len(self.changed_products)
+
+    def _token_range(self, prefix: str) -> tuple[int, int]:
+        return bisect_left(self.tokens, prefix), bisect_left(self.tokens, prefix + "\U0010ffff")
+
+    def _count_entries(self, token_range: tuple[int, int]) -> int:
+        # Верхняя оценка количества записей (товар с несколькими подходящими словами учитывается несколько раз)
+        return self.offsets[token_range[1]] - self.offsets[token_range[0]]
+
+    def has_prefix(self, prefix: str) -> bool:
+        lower, upper = self._token_range(prefix)
+        return lower < upper or any(f" {prefix}" in tokens for _, _, tokens in self.changed_products.values())
+
+    def _iter_token_entries(self, token_index: int) -> Iterator[int]:
+        for position in range(self.offsets[token_index], self.offsets[token_index + 1]):
+            yield self.postings[position]
+
+    def _iter_range_entries(self, token_range: tuple[int, int]) -> Iterator[int]:
+        lower, upper = token_range
+        if upper - lower == 1:
+            return self._iter_token_entries(lower)
+        if self._count_entries(token_range) <= MAX_SCANNED_PRODUCTS:
+            # Списки слов диапазона лежат в postings подряд
+            return iter(sorted(set(self.postings[self.offsets[lower]:self.offsets[upper]])))
+        return (entry for entry, _ in groupby(heapq.merge(*(self._iter_token_entries(i) for i in range(lower, upper)))))
+
+    def _has_tokens(self, entry: int, token_ranges: list[tuple[int, int]]) -> bool:
+        # Номера слов записи возрастают: двоичным поиском находим первое слово не меньше начала диапазона
+        first, last = self.entry_offsets[entry], self.entry_offsets[entry + 1]
+        for lower, upper in token_ranges:
+            position = bisect_left(self.entry_tokens, lower, first, last)
+            if position == last or self.entry_tokens[position] >= upper:
+                return False
+        return True
+
+    def _iter_matching_entries(self, tokens: list[str]) -> Iterator[int]:
+        token_ranges = [self._token_range(token) for token in tokens]
+        if any(lower == upper for lower, upper in token_ranges):
+            return
+
+        if len(tokens) == 1:
+            top_entries = self.top_entries_by_prefix.get(tokens[0])
+            if top_entries is None:
+                yield from self._iter_range_entries(token_ranges[0])
+                return
+            yield from top_entries
+            # Заранее вычисленных записей не хватило (часть товаров изменена) - продолжаем по диапазону слов
+            if len(top_entries) == MAX_SUGGESTIONS:
+                yield from (
+                    entry for entry in self._iter_range_entries(token_ranges[0]) if entry > top_entries[-1])
+            return
+
+        # Перебираем записи самого редкого слова и проверяем в них остальные слова
+        token_ranges.sort(key=self._count_entries)
+        for entry in islice(self._iter_range_entries(token_ranges[0]), MAX_SCANNED_PRODUCTS):
+            if self._has_tokens(entry, token_ranges[1:]):
+                yield entry
+
+    def search(self, tokens: list[str], limit: int) -> list[tuple[int, str]]:
+        """
+        Функция поиска товаров, в названии которых для каждого слова запроса есть слово, начинающееся с него
+        :param tokens: слова запроса;
+        :param limit: максимальное количество товаров;
+        :return: пары (id товара, название) в порядке убывания количества продаж.
+        """
+        found_products = []
+        for entry in self._iter_matching_entries(tokens):
+            if entry in self.removed_entries:
+                continue
+            found_products.append((-self.numbers_of_sales[entry], self.product_ids[entry], self.names[entry]))
+            if len(found_products) == limit:
+                break
+
+        # Начало слова в названии ищется как подстрока " начало" в словах названия через пробел
+        token_prefixes = [f" {token}" for token in tokens]
+        for product_id, (name, number_of_sales, name_tokens) in self.changed_products.items():
+            if all(token_prefix in name_tokens for token_prefix in token_prefixes):
+                found_products.append((-number_of_sales, product_id, name))
+
+        return [(product_id, name) for _, product_id, name in sorted(found_products)[:limit]]
+
+    def _find_entry(self, product_id: int) -> int | None:
+        position = bisect_left(self.entries_by_product_id, product_id, key=self.product_ids.__getitem__)
+        if position < len(self.entries_by_product_id):
+            entry = self.entries_by_product_id[position]
+            if self.product_ids[entry] == product_id:
+                return entry
+        return None
+
+    def apply_product_change(self, product_id: int, name: str | None, number_of_sales: int = 0):
+        """
+        Функция изменения товара в индексе
+        :param product_id: id товара;
+        :param name: новое название или None, если товар удален;
+        :param number_of_sales: новое количество продаж.
+        """
+        entry = self._find_entry(product_id)
+        if entry is not None:
+            self.removed_entries.add(entry)
+        if name is None:
+            self.changed_products.pop(product_id, None)
+        else:
+            self.changed_products[product_id] = (name, number_of_sales, " " + " ".join(tokenize(name)))
+
+
+class SuggestionIndex:
+    """
+    Подсказки при наборе запроса: сначала категории, затем товары. Если по запросу найдено
+    меньше подсказок, чем нужно, запрос повторяется в другой раскладке клавиатуры
+    и с исправленными опечатками
+    """
+    def __init__(self, categories: CategoryIndex, products: ProductNameIndex):
+        self.categories = categories
+        self.products = products
+        self.typo_corrector = TypoCorrector(chain(self.categories.tokens(), self.products.tokens))
+
+    @classmethod
+    def build(cls, subtypes: Iterable[tuple[str, str]], products: Iterable[tuple[int, str, int]]) -> "SuggestionIndex":
+        """
+        Функция построения индекса
+        :param subtypes: пары (название подтипа, название типа);
+        :param products: тройки (id товара, название, количество продаж).
+        """
+        return cls(CategoryIndex(subtypes), ProductNameIndex(products))
+
+    def _has_prefix(self, token: str) -> bool:
+        return self.products.has_prefix(token) or self.categories.has_prefix(token)
+
+    def _correct_typos(self, tokens: list[str]) -> list[str]:
+        # Исправляются только слова, с которых не начинается ни одно слово индекса
+        return [
+            token if self._has_prefix(token) else self.typo_corrector.correct(token) or token
+            for token in tokens
+        ]
+
+    def _iter_query_variants(self, query: str) -> Iterator[list[str]]:
+        query = query.lower()
+        layout_variants = [tokenize(query)] + [
+            tokenize(query.translate(layout))
+            for layout in (LATIN_TO_CYRILLIC, CYRILLIC_TO_LATIN)
+            if query.translate(layout) != query
+        ]
+        yield from layout_variants
+        for tokens in layout_variants:
+            yield self._correct_typos(tokens)
+
+    def suggest(self, query: str, limit: int = 10) -> list[SuggestionDTO]:
+        """
+        Функция получения подсказок по началу запроса
+        :param query: набранный пользователем текст;
+        :param limit: максимальное количество подсказок (не больше MAX_SUGGESTIONS);
+        :return: подсказки категорий и товаров.
+        """
+        limit = min(limit, MAX_SUGGESTIONS)
+        suggestions = []
+        found_urls = set()
+        checked_variants = set()
+        for tokens in self._iter_query_variants(query):
+            if not tokens or tuple(tokens) in checked_variants:
+                continue
+            checked_variants.add(tuple(tokens))
+
+            found_categories = [
+                SuggestionDTO(kind="category", name=name, url=url)
+                for name, url in self.categories.search(tokens)
+            ]
+            found_products = [
+                SuggestionDTO(kind="product", name=name, url=f"/catalog/product/{product_id}")
+                for product_id, name in self.products.search(tokens, limit)
+            ]
+            for suggestion in chain(found_categories, found_products):
+                if suggestion.url not in found_urls:
+                    found_urls.add(suggestion.url)
+                    suggestions.append(suggestion)
+            if len(suggestions) >= limit:
+                break
+        return suggestions[:limit]
+
+    def apply_product_change(self, product_id: int, name: str | None, number_of_sales: int = 0):
+        self.products.apply_product_change(product_id, name, number_of_sales)
+
+
+class SuggestionIndexRegistry:
+    """
+    Хранит индекс подсказок. Индекс строится при запуске приложения; изменения отдельных товаров
+    (уведомления по строкам таблицы products) применяются к нему при следующем обращении,
+    а после изменения категорий, массовой загрузки товаров или накопления max_changes изменений
+    индекс перестраивается в фоне - до окончания перестройки подсказки выдаются по текущему индексу
+    """
+    def __init__(self, session_maker: async_sessionmaker, max_products: int, max_changes: int):
+        self.session_maker = session_maker
+        self.max_products = max_products
+        self.max_changes = max_changes
+        self._index: SuggestionIndex | None = None
+        self._stale = True
+        self._changed_product_ids: set[int] = set()
+        # Товары, измененные во время перестройки индекса (None - перестройка не идет)
+        self._changed_during_load: set[int] | None = None
+        self._load_lock = asyncio.Lock()
+        self._reload_task: asyncio.Task | None = None
+
+    async def load(self) -> SuggestionIndex:
+        async with self.session_maker() as async_session:
+            subtypes_from_db = await async_session.execute(select(ProductSubtype.name, ProductSubtype.type_name))
+            subtypes = [tuple(subtype) for subtype in subtypes_from_db]
+            products_from_db = await async_session.execute(
+                select(Product.id, Product.name, Product.number_of_sales)
+                .order_by(Product.number_of_sales.desc(), Product.id)
+                .limit(self.max_products)
+            )
+            products = [tuple(product) for product in products_from_db]
+        # Построение индекса большого каталога занимает секунды, поэтому выполняется не в цикле событий
+        return await asyncio.to_thread(SuggestionIndex.build, subtypes, products)
+
+    def invalidate(self, table_name: str = Product.__tablename__):
+        self._stale = True
+
+    def product_changed(self, table_name: str, product_id: str):
+        self._changed_product_ids.add(int(product_id))
+        if self._changed_during_load is not None:
+            self._changed_during_load.add(int(product_id))
+
+    async def _reload(self):
+        self._stale = False
+        self._changed_during_load = set()
+        try:
+            self._index = await self.load()
+        except BaseException:
+            self._stale = True
+            raise
+        finally:
+            # Изменения, пришедшие во время загрузки, могли не попасть в выборку - применяем их к новому индексу
+            self._changed_product_ids |= self._changed_during_load
+            self._changed_during_load = None
+
+    async def _reload_in_background(self):
+        try:
+            await self._reload()
+        except (OSError, SQLAlchemyError) as e:
+            print(f"Не удалось перестроить индекс подсказок: {e}")
+
+    async def _apply_product_changes(self):
+        product_ids, self._changed_product_ids = self._changed_product_ids, set()
+        try:
+            async with self.session_maker() as async_session:
+                products_from_db = await async_session.execute(
+                    select(Product.id, Product.name, Product.number_of_sales)
+                    .where(Product.id.in_(product_ids))
+                )
+                products = {product.id: product for product in products_from_db}
+        except BaseException:
+            self._changed_product_ids |= product_ids
+            raise
+
+        for product_id in product_ids:
+            product = products.get(product_id)
+            if product is None:
+                self._index.apply_product_change(product_id, None)
+            else:
+                self._index.apply_product_change(product_id, product.name, product.number_of_sales)
+        if self._index.products.number_of_changes > self.max_changes:
+            self._stale = True
+
+    async def get_index(self) -> SuggestionIndex:
+        if self._index is None:
+            async with self._load_lock:
+                # Пока ждали блокировку, индекс мог построить другой запрос
+                if self._index is None:
+                    await self._reload()
+        elif self._stale and (self._reload_task is None or self._reload_task.done()):
+            self._reload_task = asyncio.create_task(self._reload_in_background())
+
+        if self._changed_product_ids:
+            try:
+                await self._apply_product_changes()
+            except (OSError, SQLAlchemyError) as e:
+                print(f"Не удалось применить изменения товаров к индексу подсказок: {e}")
+        return self._index
+
+
+# Индекс загружается редко (при запуске и при перестройке), поэтому для загрузки
+# открывается отдельное соединение, а не занимается соединение из пула запросов
+product_suggestions = SuggestionIndexRegistry(
+    async_sessionmaker(create_async_engine(settings.ASYNCPG_DATABASE_URL, poolclass=NullPool), class_=AsyncSession),
+    max_products=settings.SUGGEST_INDEX_MAX_PRODUCTS,
+    max_changes=settings.SUGGEST_INDEX_MAX_CHANGES
+)
@@ -0,0 +1,75 @@
+# jobs.backfill_feedback_aggregates.py
+# Пересчет сводных данных по отзывам в products (количество отзывов, лайков, дизлайков, сумма и количество оценок)
+# по всем отзывам. Запускается один раз после добавления столбцов и при расхождениях (например, после каскадного
+# удаления отзывов вместе с пользователем). Товары обрабатываются диапазонами id, каждый диапазон - одной
+# транзакцией из двух запросов на множестве строк, без чтения отзывов в приложение.
+# Запуск: python -m jobs.backfill_feedback_aggregates
+import argparse
+import asyncio
+
+from sqlalchemy import update, select, func, text
+
+from database.db import async_engine
+from database.models import Product, ProductFeedback
+
+
+def reset_feedback_aggregates_query(first_id: int, last_id: int):
+    # Товары без отзывов не попадают в группировку, поэтому сначала значения диапазона обнуляются
+    return (
+        update(Product)
+        .where(Product.id.between(first_id, last_id))
+        .values(feedbacks_count=0, feedback_likes_count=0, feedback_dislikes_count=0,
+                feedback_ratings_sum=0, feedback_ratings_count=0)
+    )
+
+
+def backfill_feedback_aggregates_query(first_id: int, last_id: int):
+    aggregates = (
+        select(
+            ProductFeedback.product_id,
+            func.count().label("feedbacks_count"),
+            func.coalesce(func.sum(ProductFeedback.number_of_likes), 0).label("likes_count"),
+            func.coalesce(func.sum(ProductFeedback.number_of_dislikes), 0).label("dislikes_count"),
+            func.coalesce(func.sum(ProductFeedback.rating), 0).label("ratings_sum"),
+            func.count(ProductFeedback.rating).label("ratings_count")
+        )
+        .where(ProductFeedback.product_id.between(first_id, last_id))
+        .group_by(ProductFeedback.product_id)
+        .subquery()
+    )
+    return (
+        update(Product)
+        .where(Product.id == aggregates.c.product_id)
+        .values(
+            feedbacks_count=aggregates.c.feedbacks_count,
+            feedback_likes_count=aggregates.c.likes_count,
+            feedback_dislikes_count=aggregates.c.dislikes_count,
+            feedback_ratings_sum=aggregates.c.ratings_sum,
+            feedback_ratings_count=aggregates.c.ratings_count
+        )
+    )
+
+
+async def main(batch_size: int):
+    async with async_engine.connect() as connection:
+        max_product_id = (await connection.execute(select(func.max(Product.id)))).scalar() or 0
+        await connection.rollback()
+
+        for first_id in range(1, max_product_id + 1, batch_size):
+            last_id = first_id + batch_size - 1
+            async with connection.begin():
+                # Отзывы не создаются и не удаляются, пока пересчитывается диапазон - иначе изменение,
+                # сделанное приложением между обнулением и пересчетом, было бы потеряно
+                await connection.execute(text("LOCK TABLE product_feedbacks IN SHARE MODE"))
+                await connection.execute(reset_feedback_aggregates_query(first_id, last_id))
+                await connection.execute(backfill_feedback_aggregates_query(first_id, last_id))
+            print(f"Товары {first_id}-{min(last_id, max_product_id)} из {max_product_id}")
+
+    await async_engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
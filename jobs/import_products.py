@@ -0,0 +1,247 @@
+# jobs.import_products.py
+# Загрузка товаров (новых и изменений цен, остатков, описаний) из CSV или NDJSON файла.
+# Файл читается частями по --chunk-size строк, поэтому расход памяти не зависит от размера файла.
+# Каждая часть передается в БД протоколом COPY во временную таблицу и одним запросом
+# INSERT ... ON CONFLICT (name) DO UPDATE переносится в products. Вся загрузка - одна транзакция.
+# Первая строка CSV - названия столбцов; в NDJSON каждая строка - объект с теми же ключами.
+# Столбцы: name (обязательный), price, description, image_link, quantity_in_stock, product_subtype_name,
+# additional_information - изменяются только переданные столбцы. Товары добавляются, только если переданы
+# все обязательные столбцы, иначе (например, в прайс-листе из названий и цен) изменяются только существующие.
+# Если передан product_type_name, недостающие типы и подтипы товаров создаются (без изображений).
+# Запуск: python -m jobs.import_products products.csv [--format csv|ndjson] [--chunk-size 10000]
+import argparse
+import asyncio
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from sqlalchemy import (Table, MetaData, Column, BigInteger, Text, Identity, select, update, cast, func,
+                        tuple_, text)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from database.db import async_engine
+from database.models import Product, ProductType, ProductSubtype
+from database.notifications import TABLE_CHANGES_CHANNEL
+
+PRODUCT_COLUMNS = ["name", "price", "description", "image_link", "quantity_in_stock", "product_subtype_name",
+                   "additional_information"]
+IMPORT_COLUMNS = PRODUCT_COLUMNS + ["product_type_name"]
+REQUIRED_PRODUCT_COLUMNS = {column for column in PRODUCT_COLUMNS if not Product.__table__.c[column].nullable}
+
+
+class ProductImportError(ValueError):
+    pass
+
+
+def read_csv_rows(path: Path) -> tuple[list[str], Iterator[tuple]]:
+    with path.open(newline="", encoding="utf-8") as file:
+        columns = next(csv.reader(file), [])
+
+    def rows():
+        with path.open(newline="", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            for row in reader:
+                yield tuple(row)
+    return columns, rows()
+
+
+def read_ndjson_rows(path: Path) -> tuple[list[str], Iterator[tuple]]:
+    # Столбцы определяются по первому объекту, отсутствующие в остальных объектах ключи - NULL.
+    # Ключи, которых нет в первом объекте, не отбрасываются молча: файл с ними не загружается
+    with path.open(encoding="utf-8") as file:
+        first_line = next((line for line in file if line.strip()), "{}")
+        columns = list(json.loads(first_line))
+
+    def rows():
+        with path.open(encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    product = json.loads(line)
+                    unknown_keys = product.keys() - set(columns)
+                    if unknown_keys:
+                        raise ProductImportError(
+                            f"Строка {line_number}: ключи, которых нет в первом объекте: "
+                            f"{', '.join(sorted(unknown_keys))}")
+                    yield ndjson_row(product, columns)
+    return columns, rows()
+
+
+def ndjson_row(product: dict, columns: list[str]) -> tuple:
+    # Во временной таблице все столбцы текстовые, значения приводятся к типам столбцов products в БД
+    return tuple(None if product.get(column) is None else str(product[column]) for column in columns)
+
+
+def chunked(rows: Iterable[tuple], chunk_size: int) -> Iterator[list[tuple]]:
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+
+def staging_table(columns: list[str]) -> Table:
+    # Номер строки нужен, чтобы из повторяющихся в файле товаров загружался последний
+    return Table(
+        "products_import",
+        MetaData(),
+        Column("row_number", BigInteger, Identity(always=True)),
+        *(Column(column, Text) for column in columns),
+        prefixes=["TEMPORARY"],
+        postgresql_on_commit="DROP"
+    )
+
+
+def staging_value(staging: Table, column: str):
+    value = staging.c[column]
+    product_column = Product.__table__.c[column]
+    if product_column.nullable:
+        # В CSV нет NULL, пустое значение необязательного столбца означает его отсутствие
+        value = func.nullif(value, "")
+    return cast(value, product_column.type)
+
+
+def product_types_insert(staging: Table):
+    return (
+        insert(ProductType)
+        .from_select(["name", "image_link"], select(staging.c.product_type_name, text("''")).distinct())
+        .on_conflict_do_nothing(index_elements=[ProductType.name])
+    )
+
+
+def product_subtypes_insert(staging: Table):
+    return (
+        insert(ProductSubtype)
+        .from_select(
+            ["name", "type_name", "image_link"],
+            select(staging.c.product_subtype_name, staging.c.product_type_name, text("''")).distinct())
+        .on_conflict_do_nothing(index_elements=[ProductSubtype.name])
+    )
+
+
+def staging_products(staging: Table, columns: list[str]):
+    # Если название встречается в части файла несколько раз, загружается последняя строка:
+    # одна команда не может изменить строку products дважды
+    return (
+        select(*(staging_value(staging, column).label(column) for column in columns))
+        .distinct(staging.c.name)
+        .order_by(staging.c.name, staging.c.row_number.desc())
+        .subquery()
+    )
+
+
+def products_changed(new_values, columns: list[str]):
+    # Неизмененные строки не перезаписываются
+    updated_columns = [column for column in columns if column != "name"]
+    return tuple_(*(Product.__table__.c[column] for column in updated_columns)).is_distinct_from(
+        tuple_(*(new_values[column] for column in updated_columns)))
+
+
+def products_upsert(staging: Table, columns: list[str]):
+    """
+    Запрос переноса товаров из временной таблицы в products: новые товары добавляются, существующие
+    (с тем же названием) изменяются, если переданные значения отличаются от текущих
+    :param staging: временная таблица загружаемой части файла;
+    :param columns: загружаемые столбцы products, среди них все обязательные;
+    :return: запрос INSERT ... ON CONFLICT (name) DO UPDATE.
+    """
+    # Рейтинг новых товаров рассчитывается по отзывам, при загрузке он нулевой
+    upsert_query = insert(Product).from_select(
+        [*columns, "rating"], select(staging_products(staging, columns), text("0")))
+    return upsert_query.on_conflict_do_update(
+        index_elements=[Product.name],
+        set_={column: upsert_query.excluded[column] for column in columns if column != "name"},
+        where=products_changed(upsert_query.excluded, columns)
+    )
+
+
+def products_update(staging: Table, columns: list[str]):
+    """
+    Запрос изменения существующих товаров, если в файле переданы не все обязательные столбцы
+    (например, прайс-лист из названий и цен). Товары, которых нет в products, пропускаются
+    :param staging: временная таблица загружаемой части файла;
+    :param columns: загружаемые столбцы products;
+    :return: запрос UPDATE ... FROM.
+    """
+    products = staging_products(staging, columns)
+    return (
+        update(Product)
+        .where(Product.name == products.c.name, products_changed(products.c, columns))
+        .values({column: products.c[column] for column in columns if column != "name"})
+    )
+
+
+async def import_products(
+        connection: AsyncConnection,
+        columns: list[str],
+        rows: Iterable[tuple],
+        chunk_size: int) -> tuple[int, int]:
+    """
+    Функция загрузки товаров в открытой транзакции. Уведомления об изменении отдельных товаров
+    не отправляются, загрузка завершается одним уведомлением об изменении таблицы products
+    (индекс подсказок и лидеры продаж загружаются заново после фиксации транзакции)
+    :param connection: соединение с основной БД с начатой транзакцией;
+    :param columns: столбцы файла;
+    :param rows: строки файла (кортежи строковых значений в порядке columns);
+    :param chunk_size: количество строк, передаваемых в БД за один раз;
+    :return: количество прочитанных строк и количество добавленных или измененных товаров.
+    """
+    unknown_columns = set(columns) - set(IMPORT_COLUMNS)
+    if unknown_columns:
+        raise ProductImportError(f"Неизвестные столбцы: {', '.join(sorted(unknown_columns))}")
+    if "name" not in columns:
+        raise ProductImportError("Нет обязательного столбца name")
+    if "product_type_name" in columns and "product_subtype_name" not in columns:
+        raise ProductImportError("Столбец product_type_name передается вместе с product_subtype_name")
+    product_columns = [column for column in PRODUCT_COLUMNS if column in columns]
+    if len(product_columns) == 1:
+        raise ProductImportError("Кроме name нужен хотя бы один изменяемый столбец")
+    # Новые товары добавляются, только если в файле есть все обязательные столбцы products
+    merge_query = products_upsert if REQUIRED_PRODUCT_COLUMNS <= set(product_columns) else products_update
+
+    await connection.execute(text("SET LOCAL stroimarket.bulk_import = 'on'"))
+    staging = staging_table(columns)
+    await connection.run_sync(staging.create)
+    # COPY выполняется соединением asyncpg в той же транзакции
+    driver_connection = (await connection.get_raw_connection()).driver_connection
+
+    number_of_rows = 0
+    number_of_products = 0
+    for chunk in chunked(rows, chunk_size):
+        await driver_connection.copy_records_to_table(staging.name, records=chunk, columns=columns)
+        if "product_type_name" in columns:
+            await connection.execute(product_types_insert(staging))
+            await connection.execute(product_subtypes_insert(staging))
+        merge_result = await connection.execute(merge_query(staging, product_columns))
+        await connection.execute(text(f"TRUNCATE {staging.name}"))
+        number_of_rows += len(chunk)
+        number_of_products += merge_result.rowcount
+
+    await connection.execute(select(func.pg_notify(TABLE_CHANGES_CHANNEL, Product.__tablename__)))
+    return number_of_rows, number_of_products
+
+
+async def main(path: Path, file_format: str, chunk_size: int):
+    read_rows = read_ndjson_rows if file_format == "ndjson" else read_csv_rows
+    columns, rows = read_rows(path)
+
+    started_at = time.perf_counter()
+    async with async_engine.begin() as connection:
+        number_of_rows, number_of_products = await import_products(connection, columns, rows, chunk_size)
+    elapsed = time.perf_counter() - started_at
+    print(f"Загружено строк: {number_of_rows}, добавлено или изменено товаров: {number_of_products}, "
+          f"время: {elapsed:.1f} с, {number_of_rows / max(elapsed, 1e-9):.0f} строк/с")
+
+    await async_engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.path, args.format or ("ndjson" if args.path.suffix in (".ndjson", ".jsonl") else "csv"),
+                     args.chunk_size))
@@ -0,0 +1,155 @@
+# jobs.recalculate_customer_levels.py
+# Пересчет уровней бонусных карт по сумме покупок пользователей (users.total_amount_of_purchases)
+# и порогам уровней (customer_levels.lower_threshold) одним запросом UPDATE ... FROM на множестве строк,
+# без чтения пользователей в приложение. Изменяются только карты, уровень которых стал другим.
+# В режиме --incremental пересчитываются только пользователи, измененные после прошлого запуска
+# (после изменения порогов уровней нужен полный пересчет).
+# Запуск: python -m jobs.recalculate_customer_levels [--incremental]
+# или в фоне приложения, если задан CUSTOMER_LEVELS_RECALCULATION_INTERVAL
+import argparse
+import asyncio
+import datetime
+import time
+
+from sqlalchemy import select, update, func, desc, true, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from config import settings
+from database.models import User, BonusCard, CustomerLevel, JobRun
+from database.notifications import TABLE_CHANGES_CHANNEL
+
+JOB_NAME = "recalculate_customer_levels"
+
+
+def customer_levels_recalculation_query(changed_since: datetime.datetime | None = None):
+    """
+    Запрос пересчета уровней бонусных карт: каждому пользователю назначается уровень с наибольшим
+    порогом, не превышающим сумму его покупок. Пользователь, сумма покупок которого меньше всех порогов,
+    сохраняет текущий уровень
+    :param changed_since: пересчитываются только пользователи, измененные начиная с этого времени
+    (None - все пользователи);
+    :return: запрос UPDATE, количество измененных строк которого - количество карт с новым уровнем.
+    """
+    customer_level = (
+        select(CustomerLevel.name)
+        .where(CustomerLevel.lower_threshold <= User.total_amount_of_purchases)
+        .order_by(desc(CustomerLevel.lower_threshold))
+        .limit(1)
+        .lateral()
+    )
+    new_customer_levels = select(User.id.label("user_id"), customer_level.c.name).join(customer_level, true())
+    if changed_since is not None:
+        new_customer_levels = new_customer_levels.where(User.date_of_update >= changed_since)
+    new_customer_levels = new_customer_levels.subquery()
+    return (
+        update(BonusCard)
+        .where(
+            BonusCard.user_id == new_customer_levels.c.user_id,
+            BonusCard.customer_level_name.is_distinct_from(new_customer_levels.c.name))
+        .values(customer_level_name=new_customer_levels.c.name)
+    )
+
+
+async def recalculate_customer_levels(async_engine: AsyncEngine, incremental: bool) -> int | None:
+    """
+    Функция пересчета уровней бонусных карт в одной транзакции вместе с записью времени запуска.
+    Одновременно пересчет выполняется только одним процессом (рекомендательная блокировка).
+    При пересчете изменившихся пользователей приложение получает уведомление о каждой карте с новым уровнем,
+    при полном пересчете - одно уведомление об изменении таблицы bonus_cards (уровни в токенах доступа
+    устаревают у всех пользователей)
+    :param async_engine: движок основной БД;
+    :param incremental: True - пересчитываются только пользователи, измененные после прошлого запуска
+    (с запасом CUSTOMER_LEVELS_RECALCULATION_OVERLAP), False - все пользователи;
+    :return: количество карт с новым уровнем или None, если пересчет уже выполняется другим процессом.
+    """
+    async with async_engine.begin() as connection:
+        if not await connection.scalar(select(func.pg_try_advisory_xact_lock(func.hashtext(JOB_NAME)))):
+            return None
+        started_at = await connection.scalar(select(func.timezone("utc", func.now())))
+
+        changed_since = None
+        if incremental:
+            last_started_at = await connection.scalar(select(JobRun.last_started_at).where(JobRun.name == JOB_NAME))
+            # Первый запуск в режиме --incremental пересчитывает всех пользователей
+            if last_started_at is not None:
+                changed_since = last_started_at - datetime.timedelta(
+                    seconds=settings.CUSTOMER_LEVELS_RECALCULATION_OVERLAP)
+
+        if changed_since is None:
+            await connection.execute(text("SET LOCAL stroimarket.bulk_import = 'on'"))
+        recalculation_result = await connection.execute(customer_levels_recalculation_query(changed_since))
+        if changed_since is None and recalculation_result.rowcount:
+            await connection.execute(select(func.pg_notify(TABLE_CHANGES_CHANNEL, BonusCard.__tablename__)))
+
+        job_run_upsert = insert(JobRun).values(name=JOB_NAME, last_started_at=started_at)
+        await connection.execute(job_run_upsert.on_conflict_do_update(
+            index_elements=[JobRun.name], set_={"last_started_at": job_run_upsert.excluded.last_started_at}))
+    return recalculation_result.rowcount
+
+
+async def run_recalculation(async_engine: AsyncEngine, incremental: bool) -> int | None:
+    # Пересчет с выводом количества измененных карт и времени выполнения
+    started_at = time.perf_counter()
+    updated_bonus_cards = await recalculate_customer_levels(async_engine, incremental)
+    elapsed = time.perf_counter() - started_at
+    if updated_bonus_cards is None:
+        print("Уровни бонусных карт уже пересчитываются другим процессом")
+    else:
+        mode = "изменившихся пользователей" if incremental else "всех пользователей"
+        print(f"Пересчет уровней бонусных карт ({mode}): изменено карт: {updated_bonus_cards}, "
+              f"время: {elapsed * 1000:.1f} мс")
+    return updated_bonus_cards
+
+
+class CustomerLevelsRecalculationScheduler:
+    """
+    Пересчет уровней бонусных карт в фоне приложения: по расписанию пересчитываются пользователи,
+    измененные после прошлого запуска, а после изменения таблицы customer_levels - все пользователи
+    """
+    def __init__(self, async_engine: AsyncEngine, interval: float):
+        self.async_engine = async_engine
+        self.interval = interval
+        self._full_recalculation_needed = True
+
+    def invalidate(self, table_name: str = CustomerLevel.__tablename__):
+        self._full_recalculation_needed = True
+
+    async def _recalculate_in_background(self):
+        full_recalculation_needed = self._full_recalculation_needed
+        # Сбрасываем признак до пересчета, чтобы не потерять уведомление, пришедшее во время него
+        self._full_recalculation_needed = False
+        try:
+            if await run_recalculation(self.async_engine, incremental=not full_recalculation_needed) is None:
+                self._full_recalculation_needed |= full_recalculation_needed
+        except (OSError, SQLAlchemyError) as e:
+            self._full_recalculation_needed |= full_recalculation_needed
+            print(f"Не удалось пересчитать уровни бонусных карт: {e}")
+
+    async def recalculate_periodically(self):
+        # Пересчет по расписанию, запускается задачей на время работы приложения
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._recalculate_in_background()
+
+
+# Пересчет выполняется редко, поэтому для него открывается отдельное соединение,
+# а не занимается соединение из пула запросов
+customer_levels_recalculation = CustomerLevelsRecalculationScheduler(
+    create_async_engine(settings.ASYNCPG_DATABASE_URL, poolclass=NullPool),
+    interval=settings.CUSTOMER_LEVELS_RECALCULATION_INTERVAL
+)
+
+
+async def main(incremental: bool):
+    await run_recalculation(customer_levels_recalculation.async_engine, incremental)
+    await customer_levels_recalculation.async_engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--incremental", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.incremental))
@@ -1,4 +1,8 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
+from sqlalchemy.exc import SQLAlchemyError
 from api.endpoints.main_screen import main_screen_router
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,14 +11,104 @@ from api.endpoints.base_auth import base_auth
 from api.endpoints.cookie_auth import cookie_auth
 from api.endpoints.jwt_auth import jwt_auth
 from api.endpoints.catalog import catalog_router
+from api.endpoints.search import search_router
 from api.endpoints.product import product_page_router
 from api.endpoints.user_profile import user_profile_router
+from api.endpoints.service import service_router
+from api.endpoints.cart import cart_router
+from api.caching.fragment_cache import fragment_cache
+from api.caching.page_cache import page_cache, PRODUCT_PAGE_TABLES
+from api.templating.templates import templates_preloader
+from config import settings
+from database.actions import CATALOG_TREE_TABLES
+from database.cache import reference_data_cache
+from database.customer_levels import customer_levels
+from database.leaderboard import top_sellers_leaderboard
+from database.main_page import MAIN_PAGE_IMAGE_TABLES
+from database.models import CustomerLevel, BonusCard, Product, ProductSubtype, ProductType, ProductFeedback
+from database.notifications import table_changes_listener
+from database.suggestions import product_suggestions
+from jobs.recalculate_customer_levels import customer_levels_recalculation
 
 origins = [
     "http://127.0.0.1:5500"
 ]
 
-market_app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Кэш справочных данных сбрасывается по уведомлениям об изменении таблиц
+    for table_name in CATALOG_TREE_TABLES:
+        table_changes_listener.subscribe(table_name, reference_data_cache.invalidate_tables)
+    for ImagesToFind in MAIN_PAGE_IMAGE_TABLES.values():
+        table_changes_listener.subscribe(ImagesToFind.__tablename__, reference_data_cache.invalidate_tables)
+    table_changes_listener.subscribe(CustomerLevel.__tablename__, customer_levels.invalidate)
+    # Уровень бонусной карты в токенах доступа устаревает при изменении уровня пользователя
+    # (или уровней многих пользователей при полном пересчете)
+    table_changes_listener.subscribe(BonusCard.__tablename__, customer_levels.invalidate_claims)
+    table_changes_listener.subscribe_rows(BonusCard.__tablename__, customer_levels.bonus_card_changed)
+    # После изменения порогов уровней бонусных карт уровни пересчитываются у всех пользователей
+    table_changes_listener.subscribe(CustomerLevel.__tablename__, customer_levels_recalculation.invalidate)
+    # Индекс подсказок перестраивается при изменении категорий и таблицы товаров целиком,
+    # а изменения отдельных товаров применяются к нему без перестройки
+    for Model in (Product, ProductSubtype, ProductType):
+        table_changes_listener.subscribe(Model.__tablename__, product_suggestions.invalidate)
+    table_changes_listener.subscribe_rows(Product.__tablename__, product_suggestions.product_changed)
+    # Кэш страниц каталога и товаров и их фрагментов сбрасывается при изменении товаров, категорий и отзывов.
+    # Изменение товара сбрасывает его страницу, страницы его подтипа и его карточку,
+    # изменение отзыва - страницу товара и фрагменты отзывов этого товара
+    for table_name in PRODUCT_PAGE_TABLES:
+        table_changes_listener.subscribe(table_name, page_cache.invalidate_tables)
+        table_changes_listener.subscribe(table_name, fragment_cache.invalidate_tables)
+    for Model in (Product, ProductSubtype, ProductFeedback):
+        table_changes_listener.subscribe_rows(Model.__tablename__, page_cache.row_changed)
+    for Model in (Product, ProductFeedback):
+        table_changes_listener.subscribe_rows(Model.__tablename__, fragment_cache.row_changed)
+    # Лидеры продаж обновляются по расписанию, а после изменения категорий или таблицы товаров целиком - сразу
+    for Model in (Product, ProductSubtype, ProductType):
+        table_changes_listener.subscribe(Model.__tablename__, top_sellers_leaderboard.invalidate)
+
+    # Шаблоны страниц компилируются до первого запроса (или загружаются из файлов скомпилированных шаблонов)
+    templates_stats = templates_preloader.preload()
+    print(f"Шаблоны загружены: {templates_stats.number_of_templates}, время: {templates_stats.preload_time_in_ms} мс")
+
+    # Лестница уровней бонусной карты, индекс подсказок и лидеры продаж загружаются заранее, чтобы первые запросы
+    # не ждали БД. Если БД недоступна, они будут загружены при первом обращении
+    try:
+        await customer_levels.get_ladder()
+    except (OSError, SQLAlchemyError) as e:
+        print(f"Не удалось загрузить уровни бонусной карты: {e}")
+    try:
+        await product_suggestions.get_index()
+    except (OSError, SQLAlchemyError) as e:
+        print(f"Не удалось построить индекс подсказок: {e}")
+    try:
+        await top_sellers_leaderboard.get_leaderboard()
+    except (OSError, SQLAlchemyError) as e:
+        print(f"Не удалось загрузить лидеров продаж: {e}")
+
+    listener_task = None
+    if settings.DB_NOTIFICATIONS_ENABLED:
+        listener_task = asyncio.create_task(table_changes_listener.listen())
+    leaderboard_task = asyncio.create_task(top_sellers_leaderboard.refresh_periodically())
+    recalculation_task = None
+    if settings.CUSTOMER_LEVELS_RECALCULATION_INTERVAL > 0:
+        recalculation_task = asyncio.create_task(customer_levels_recalculation.recalculate_periodically())
+    yield
+    if recalculation_task is not None:
+        recalculation_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await recalculation_task
+    leaderboard_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await leaderboard_task
+    if listener_task is not None:
+        listener_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener_task
+
+
+market_app = FastAPI(lifespan=lifespan)
 market_app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -28,8 +122,11 @@ market_app.include_router(main_screen_router)
 market_app.include_router(base_auth)
 market_app.include_router(cookie_auth)
 market_app.include_router(jwt_auth)
+market_app.include_router(search_router)
 market_app.include_router(catalog_router)
 market_app.include_router(user_profile_router)
+market_app.include_router(service_router)
+market_app.include_router(cart_router)
 register_exception_handlers(market_app)
 
 if __name__ == '__main__':
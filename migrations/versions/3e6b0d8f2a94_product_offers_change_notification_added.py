@@ -0,0 +1,47 @@
+"""product_offers_change_notification_added
+
+Revision ID: 3e6b0d8f2a94
+Revises: 7a3f1c9e5b42
+Create Date: 2026-10-17 21:32:48.617209
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e6b0d8f2a94'
+down_revision: Union[str, None] = '7a3f1c9e5b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Уведомление "product_offers" отправляется один раз на оператор, изменивший цены или остатки товаров
+    # (например, на каждое оформление заказа): по нему устаревают готовые страницы каталога и товаров,
+    # но не индекс подсказок и не фрагменты страниц. При массовой загрузке
+    # (SET LOCAL stroimarket.bulk_import = 'on') не отправляется - загрузка завершается
+    # одним уведомлением об изменении всей таблицы товаров
+    op.execute("""
+        CREATE FUNCTION notify_product_offers_change() RETURNS trigger AS $$
+        BEGIN
+            IF current_setting('stroimarket.bulk_import', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify('stroimarket_table_changes', 'product_offers');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER products_notify_offers_change
+        AFTER UPDATE OF price, quantity_in_stock ON products
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_product_offers_change()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER products_notify_offers_change ON products")
+    op.execute("DROP FUNCTION notify_product_offers_change()")
@@ -0,0 +1,46 @@
+"""table_change_notifications_added
+
+Revision ID: 4f7c2d9e8a61
+Revises: 10aba2d95554
+Create Date: 2026-10-17 12:10:41.215304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f7c2d9e8a61'
+down_revision: Union[str, None] = '10aba2d95554'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблицы справочных данных, изменения которых сбрасывают кэш приложения
+NOTIFYING_TABLES = ['product_types', 'product_subtypes', 'main_info_images', 'promotion_images', 'service_images']
+
+
+def upgrade() -> None:
+    # Уведомление с именем таблицы отправляется один раз на оператор и доставляется
+    # слушателям только после фиксации транзакции
+    op.execute("""
+        CREATE FUNCTION notify_table_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('stroimarket_table_changes', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table_name in NOTIFYING_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table_name}_notify_change
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table_name}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()
+        """)
+
+
+def downgrade() -> None:
+    for table_name in NOTIFYING_TABLES:
+        op.execute(f"DROP TRIGGER {table_name}_notify_change ON {table_name}")
+    op.execute("DROP FUNCTION notify_table_change()")
@@ -0,0 +1,36 @@
+"""users total amount of purchases numeric
+
+Revision ID: 5d0e8a4c7b19
+Revises: 9c41e7b2d0fa
+Create Date: 2026-10-17 18:05:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0e8a4c7b19'
+down_revision: Union[str, None] = '9c41e7b2d0fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Сумма покупок складывается из сумм заказов (numeric), в float она накапливала ошибку округления
+    op.alter_column('users', 'total_amount_of_purchases',
+               existing_type=sa.Float(),
+               type_=sa.Numeric(precision=12, scale=2),
+               existing_nullable=False,
+               existing_server_default=sa.text('0.0'),
+               postgresql_using='round(total_amount_of_purchases::numeric, 2)')
+
+
+def downgrade() -> None:
+    op.alter_column('users', 'total_amount_of_purchases',
+               existing_type=sa.Numeric(precision=12, scale=2),
+               type_=sa.Float(),
+               existing_nullable=False,
+               existing_server_default=sa.text('0.0'))
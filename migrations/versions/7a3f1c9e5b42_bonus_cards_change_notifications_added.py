@@ -0,0 +1,48 @@
+"""bonus_cards_change_notifications_added
+
+Revision ID: 7a3f1c9e5b42
+Revises: 5d0e8a4c7b19
+Create Date: 2026-10-17 19:10:37.205114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3f1c9e5b42'
+down_revision: Union[str, None] = '5d0e8a4c7b19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Уведомление "bonus_cards:<id пользователя>" отправляется при изменении уровня бонусной карты:
+    # уровень в токене доступа этого пользователя устаревает. При массовом изменении
+    # (SET LOCAL stroimarket.bulk_import = 'on') уведомления по строкам не отправляются -
+    # изменение завершается одним уведомлением об изменении всей таблицы
+    op.execute("""
+        CREATE FUNCTION notify_bonus_card_change() RETURNS trigger AS $$
+        BEGIN
+            IF current_setting('stroimarket.bulk_import', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify('stroimarket_row_changes', TG_TABLE_NAME || ':' || NEW.user_id);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER bonus_cards_notify_row_change
+        AFTER UPDATE OF customer_level_name ON bonus_cards
+        FOR EACH ROW
+        WHEN (OLD.customer_level_name IS DISTINCT FROM NEW.customer_level_name)
+        EXECUTE FUNCTION notify_bonus_card_change()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER bonus_cards_notify_row_change ON bonus_cards")
+    op.execute("DROP FUNCTION notify_bonus_card_change()")
@@ -0,0 +1,114 @@
+"""product_row_change_notifications_extended
+
+Revision ID: 8b2e5c1d7f36
+Revises: 3e6b0d8f2a94
+Create Date: 2026-10-17 23:14:05.731820
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e5c1d7f36'
+down_revision: Union[str, None] = '3e6b0d8f2a94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Изменения цен и остатков отправляются по строкам, как и изменения названий, вместо
+    # одного уведомления на оператор: по нему устаревали все страницы каталога и товаров
+    op.execute("DROP TRIGGER products_notify_offers_change ON products")
+    op.execute("DROP FUNCTION notify_product_offers_change()")
+    op.execute("DROP TRIGGER products_notify_row_change ON products")
+
+    # Вместе с "products:<id>" отправляется "product_subtypes:<подтип>" (прежний и новый подтип товара):
+    # по нему устаревают страницы каталога подтипа, в том числе без этого товара (его место в сортировке
+    # могло измениться). Одинаковые уведомления одной транзакции PostgreSQL доставляет один раз
+    op.execute("""
+        CREATE FUNCTION notify_product_change() RETURNS trigger AS $$
+        BEGIN
+            IF current_setting('stroimarket.bulk_import', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                PERFORM pg_notify('stroimarket_row_changes', TG_TABLE_NAME || ':' || OLD.id);
+                PERFORM pg_notify('stroimarket_row_changes', 'product_subtypes:' || OLD.product_subtype_name);
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                PERFORM pg_notify('stroimarket_row_changes', TG_TABLE_NAME || ':' || NEW.id);
+                PERFORM pg_notify('stroimarket_row_changes', 'product_subtypes:' || NEW.product_subtype_name);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER products_notify_row_change
+        AFTER INSERT OR DELETE OR UPDATE OF name, price, quantity_in_stock, product_subtype_name ON products
+        FOR EACH ROW EXECUTE FUNCTION notify_product_change()
+    """)
+
+    # Отзывы: "product_feedbacks:<id товара>" - устаревает страница только этого товара
+    op.execute("""
+        CREATE FUNCTION notify_product_feedback_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                PERFORM pg_notify('stroimarket_row_changes', TG_TABLE_NAME || ':' || OLD.product_id);
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                PERFORM pg_notify('stroimarket_row_changes', TG_TABLE_NAME || ':' || NEW.product_id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER product_feedbacks_notify_change ON product_feedbacks")
+    op.execute("""
+        CREATE TRIGGER product_feedbacks_notify_row_change
+        AFTER INSERT OR UPDATE OR DELETE ON product_feedbacks
+        FOR EACH ROW EXECUTE FUNCTION notify_product_feedback_change()
+    """)
+    op.execute("""
+        CREATE TRIGGER product_feedbacks_notify_change
+        AFTER TRUNCATE ON product_feedbacks
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER product_feedbacks_notify_change ON product_feedbacks")
+    op.execute("DROP TRIGGER product_feedbacks_notify_row_change ON product_feedbacks")
+    op.execute("DROP FUNCTION notify_product_feedback_change()")
+    op.execute("""
+        CREATE TRIGGER product_feedbacks_notify_change
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON product_feedbacks
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()
+    """)
+
+    op.execute("DROP TRIGGER products_notify_row_change ON products")
+    op.execute("DROP FUNCTION notify_product_change()")
+    op.execute("""
+        CREATE TRIGGER products_notify_row_change
+        AFTER INSERT OR DELETE OR UPDATE OF name ON products
+        FOR EACH ROW EXECUTE FUNCTION notify_row_change()
+    """)
+    op.execute("""
+        CREATE FUNCTION notify_product_offers_change() RETURNS trigger AS $$
+        BEGIN
+            IF current_setting('stroimarket.bulk_import', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify('stroimarket_table_changes', 'product_offers');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER products_notify_offers_change
+        AFTER UPDATE OF price, quantity_in_stock ON products
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_product_offers_change()
+    """)
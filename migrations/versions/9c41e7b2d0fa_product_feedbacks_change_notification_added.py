@@ -0,0 +1,31 @@
+"""product_feedbacks_change_notification_added
+
+Revision ID: 9c41e7b2d0fa
+Revises: 2f7ccd36cb53
+Create Date: 2026-10-17 15:21:08.214367
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c41e7b2d0fa'
+down_revision: Union[str, None] = '2f7ccd36cb53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Отзывы выводятся на закэшированных страницах товаров, кэш сбрасывается по уведомлению
+    op.execute("""
+        CREATE TRIGGER product_feedbacks_notify_change
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON product_feedbacks
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER product_feedbacks_notify_change ON product_feedbacks")
@@ -0,0 +1,31 @@
+"""customer_levels_change_notification_added
+
+Revision ID: b83e51f0c7d2
+Revises: 4f7c2d9e8a61
+Create Date: 2026-10-17 14:02:17.583910
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b83e51f0c7d2'
+down_revision: Union[str, None] = '4f7c2d9e8a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Лестница уровней бонусной карты хранится в памяти приложения и загружается заново по уведомлению
+    op.execute("""
+        CREATE TRIGGER customer_levels_notify_change
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON customer_levels
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER customer_levels_notify_change ON customer_levels")
@@ -0,0 +1,57 @@
+"""products_change_notifications_added
+
+Revision ID: e2b9d4c7a153
+Revises: d7f3b6a25c90
+Create Date: 2026-10-17 20:05:12.408611
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b9d4c7a153'
+down_revision: Union[str, None] = 'd7f3b6a25c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Уведомление "products:<id>" отправляется на каждую вставленную, удаленную строку и на изменение
+    # названия (индекс подсказок приложения). Количество продаж меняется при каждой покупке, поэтому
+    # его изменения не отправляются - порядок подсказок обновляется при перестройке индекса.
+    # При массовой загрузке (SET LOCAL stroimarket.bulk_import = 'on') уведомления по строкам
+    # не отправляются - загрузка завершается одним уведомлением об изменении всей таблицы
+    op.execute("""
+        CREATE FUNCTION notify_row_change() RETURNS trigger AS $$
+        BEGIN
+            IF current_setting('stroimarket.bulk_import', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('stroimarket_row_changes', TG_TABLE_NAME || ':' || OLD.id);
+            ELSE
+                PERFORM pg_notify('stroimarket_row_changes', TG_TABLE_NAME || ':' || NEW.id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER products_notify_row_change
+        AFTER INSERT OR DELETE OR UPDATE OF name ON products
+        FOR EACH ROW EXECUTE FUNCTION notify_row_change()
+    """)
+    op.execute("""
+        CREATE TRIGGER products_notify_change
+        AFTER TRUNCATE ON products
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER products_notify_change ON products")
+    op.execute("DROP TRIGGER products_notify_row_change ON products")
+    op.execute("DROP FUNCTION notify_row_change()")
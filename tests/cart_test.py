@@ -0,0 +1,40 @@
+# tests.cart_test.py
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.dialects import postgresql
+
+from api.schemas.cart import CartItemQuantity, MAX_CART_ITEM_QUANTITY
+from database.cart import cart_items_upsert, merge_cart_items
+from main import market_app
+
+
+# Несколько товаров добавляются одной командой с массивами, текст запроса не зависит от количества товаров
+def test_cart_items_upsert():
+    sql = str(cart_items_upsert(1, {5: 2, 6: 1}).compile(dialect=postgresql.dialect()))
+
+    assert "FROM unnest(%(product_ids)s::INTEGER[], %(quantities)s::INTEGER[])" in sql
+    assert "ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = least(cart_items.quantity + excluded.quantity" in sql
+    assert sql == str(cart_items_upsert(1, {7: 3}).compile(dialect=postgresql.dialect()))
+    assert "DO UPDATE SET quantity = excluded.quantity" in str(
+        cart_items_upsert(1, {7: 3}, add=False).compile(dialect=postgresql.dialect()))
+
+
+# Повторяющиеся товары объединяются, количество не превышает максимальное
+def test_merge_cart_items():
+    items = [
+        CartItemQuantity(product_id=5, quantity=2),
+        CartItemQuantity(product_id=6, quantity=1),
+        CartItemQuantity(product_id=5, quantity=MAX_CART_ITEM_QUANTITY)
+    ]
+
+    assert merge_cart_items(items) == {5: MAX_CART_ITEM_QUANTITY, 6: 1}
+
+
+# Гость не может добавить товар в корзину
+@pytest.mark.asyncio
+async def test_add_to_cart_as_guest():
+    async with AsyncClient(transport=ASGITransport(app=market_app)) as client:
+        response = await client.post(
+            "http://127.0.0.1:8000/cart/items", json={"items": [{"product_id": 1, "quantity": 1}]})
+
+    assert response.status_code == 403
@@ -0,0 +1,80 @@
+# tests.catalog_export_test.py
+# Потоковая выгрузка каталога на тестовой БД (TEST_DB_NAME, пересоздается)
+import csv
+import io
+import json
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from config import settings
+from database.db import Base
+from database.dependencies import get_public_read_session_maker
+from database.models import ProductType, ProductSubtype, Product
+from main import market_app
+
+NUMBER_OF_PRODUCTS = 250
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def async_session_maker():
+    async_engine = create_async_engine(settings.ASYNCPG_TEST_DATABASE_URL)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(ProductType.__table__.insert(), [{"name": "Пиломатериалы", "image_link": ""}])
+        await conn.execute(ProductSubtype.__table__.insert(), [
+            {"name": "Брус", "image_link": "", "type_name": "Пиломатериалы"}])
+        await conn.execute(Product.__table__.insert(), [
+            {"id": product_id, "name": f"Брус {product_id}", "price": 1000.5, "description": "Сосна, сухой",
+             "image_link": "", "quantity_in_stock": product_id, "product_subtype_name": "Брус",
+             "additional_information": "", "rating": 0.5}
+            for product_id in range(1, NUMBER_OF_PRODUCTS + 1)
+        ])
+    yield async_sessionmaker(async_engine, class_=AsyncSession)
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await async_engine.dispose()
+
+
+async def export_catalog(async_session_maker, monkeypatch, export_format: str) -> tuple[int, str]:
+    # Курсор читает товары частями меньше каталога, каждая часть отправляется отдельно
+    monkeypatch.setattr(settings, "CATALOG_EXPORT_FETCH_SIZE", 100)
+    market_app.dependency_overrides[get_public_read_session_maker] = lambda: async_session_maker
+    try:
+        async with AsyncClient(transport=ASGITransport(app=market_app)) as client:
+            async with client.stream("GET", f"http://127.0.0.1:8000/catalog/export?format={export_format}") as response:
+                chunks = [chunk async for chunk in response.aiter_bytes()]
+                return response.status_code, b"".join(chunks).decode()
+    finally:
+        market_app.dependency_overrides.pop(get_public_read_session_maker, None)
+
+
+# Выгрузка в NDJSON: по строке на товар в порядке id, с типом товара из подтипа
+@pytest.mark.asyncio(loop_scope="module")
+async def test_export_catalog_as_ndjson(async_session_maker, monkeypatch):
+    status_code, body = await export_catalog(async_session_maker, monkeypatch, "ndjson")
+
+    assert status_code == 200
+    products = [json.loads(line) for line in body.splitlines()]
+    assert [product["id"] for product in products] == list(range(1, NUMBER_OF_PRODUCTS + 1))
+    assert products[0] == {
+        "id": 1, "name": "Брус 1", "price": 1000.5, "quantity_in_stock": 1, "product_type_name": "Пиломатериалы",
+        "product_subtype_name": "Брус", "description": "Сосна, сухой", "additional_information": "",
+        "image_link": "", "rating": 0.5
+    }
+
+
+# Выгрузка в CSV: заголовок и по строке на товар
+@pytest.mark.asyncio(loop_scope="module")
+async def test_export_catalog_as_csv(async_session_maker, monkeypatch):
+    status_code, body = await export_catalog(async_session_maker, monkeypatch, "csv")
+
+    assert status_code == 200
+    products = list(csv.DictReader(io.StringIO(body)))
+    assert len(products) == NUMBER_OF_PRODUCTS
+    assert (products[-1]["id"], products[-1]["description"], products[-1]["product_type_name"]) == (
+        str(NUMBER_OF_PRODUCTS), "Сосна, сухой", "Пиломатериалы")
@@ -0,0 +1,39 @@
+# tests.catalog_pagination_test.py
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from api.errors.catalog.exceptions import InvalidCursor
+from api.schemas.catalog import ProductsCursor, ProductSortKey, SortOrder
+from database.models import Product
+from database.pagination import encode_cursor, decode_cursor, keyset_page_query
+
+
+# Курсор страницы восстанавливается из строки без потери точности цены
+def test_products_cursor_round_trip():
+    cursor = ProductsCursor(sort=ProductSortKey.price, order=SortOrder.asc, key="3958.50", id=15)
+
+    assert decode_cursor(encode_cursor(cursor), ProductsCursor) == cursor
+
+
+# Поврежденный курсор
+@pytest.mark.parametrize("cursor", ["garbage", "e30", encode_cursor(ProductsCursor(
+    sort=ProductSortKey.name, order=SortOrder.asc, key="Брус", id=1))[:-3]])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, ProductsCursor)
+
+
+# Следующая страница начинается после последней строки предыдущей, а не со смещения
+def test_keyset_page_query():
+    query = keyset_page_query(
+        select(Product.id),
+        order_columns=(Product.number_of_sales, Product.id),
+        descending=True,
+        after_values=(10, 5),
+        limit=16)
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    assert "(products.number_of_sales, products.id) < (" in sql
+    assert "ORDER BY products.number_of_sales DESC, products.id DESC" in sql
+    assert "OFFSET" not in sql
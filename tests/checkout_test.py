@@ -0,0 +1,154 @@
+# tests.checkout_test.py
+# Оформление заказов на тестовой БД (TEST_DB_NAME, пересоздается): сотни покупателей одновременно
+# покупают один товар, которого хватает не всем
+import asyncio
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from api.errors.cart.exceptions import OutOfStock, CheckoutAddressNotFound
+from api.schemas.cart import CheckoutRequest
+from config import settings
+from database.checkout import checkout_cart, ORDER_STATUS_CREATED
+from database.db import Base
+from database.models import (User, UserAddress, ProductType, ProductSubtype, Product, CartItem, Order, OrderItem,
+                             DeliveryType, PaymentMethod, OrderStatus, CustomerLevel, BonusCard)
+
+NUMBER_OF_BUYERS = 200
+QUANTITY_IN_STOCK = 50
+CHECKOUT = CheckoutRequest(delivery_type_name="Самовывоз", payment_method_name="Картой", address_id=0)
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def async_session_maker():
+    # Соединений меньше, чем покупателей: остальные ждут свободное соединение, как в пуле приложения
+    async_engine = create_async_engine(settings.ASYNCPG_TEST_DATABASE_URL, pool_size=40, max_overflow=0)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(DeliveryType.__table__.insert(), [{"name": CHECKOUT.delivery_type_name}])
+        await conn.execute(PaymentMethod.__table__.insert(), [{"name": CHECKOUT.payment_method_name}])
+        await conn.execute(OrderStatus.__table__.insert(), [{"name": ORDER_STATUS_CREATED}])
+        await conn.execute(ProductType.__table__.insert(), [{"name": "Пиломатериалы", "image_link": ""}])
+        await conn.execute(ProductSubtype.__table__.insert(), [
+            {"name": "Брус", "image_link": "", "type_name": "Пиломатериалы"}])
+        await conn.execute(Product.__table__.insert(), [
+            {"id": product_id, "name": f"Брус {product_id}", "price": 1000, "description": "", "image_link": "",
+             "quantity_in_stock": QUANTITY_IN_STOCK, "product_subtype_name": "Брус", "additional_information": "",
+             "rating": 0.5}
+            for product_id in (1, 2)
+        ])
+        await conn.execute(User.__table__.insert(), [
+            {"id": user_id, "login": f"buyer{user_id}"}
+            for user_id in range(1, NUMBER_OF_BUYERS + 1)
+        ])
+        # Бонусная карта со скидкой есть только у последнего покупателя
+        await conn.execute(CustomerLevel.__table__.insert(), [
+            {"name": "Мастер", "discount_amount_in_percent": 10, "lower_threshold": 0, "level_number": 1}])
+        await conn.execute(BonusCard.__table__.insert(), [
+            {"user_id": NUMBER_OF_BUYERS, "customer_level_name": "Мастер"}])
+        await conn.execute(UserAddress.__table__.insert(), [
+            {"id": user_id, "user_id": user_id, "city": "Москва", "street": "Ленина", "house_number": "1",
+             "entrance": "1", "delivery_point": "Дверь"}
+            for user_id in range(1, NUMBER_OF_BUYERS + 1)
+        ])
+    yield async_sessionmaker(async_engine, class_=AsyncSession)
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await async_engine.dispose()
+
+
+async def checkout_as(async_session_maker, user_id: int, idempotency_key: str | None = None):
+    async with async_session_maker() as async_session:
+        try:
+            return await checkout_cart(
+                async_session, user_id, CHECKOUT.model_copy(update={"address_id": user_id}), idempotency_key)
+        except OutOfStock as e:
+            return e
+
+
+async def count_rows(async_session_maker, *criteria, select_from):
+    async with async_session_maker() as async_session:
+        return await async_session.scalar(select(func.count()).select_from(select_from).where(*criteria))
+
+
+# Товар покупают 200 человек одновременно, а на складе 50 штук: оформляется ровно 50 заказов,
+# остаток не уходит в минус, у остальных покупателей корзина не изменяется
+@pytest.mark.asyncio(loop_scope="module")
+async def test_concurrent_checkout_of_one_product(async_session_maker):
+    async with async_session_maker() as async_session:
+        async_session.add_all([
+            CartItem(user_id=user_id, product_id=1, quantity=1)
+            for user_id in range(1, NUMBER_OF_BUYERS + 1)
+        ])
+        await async_session.commit()
+
+    results = await asyncio.gather(*(
+        checkout_as(async_session_maker, user_id)
+        for user_id in range(1, NUMBER_OF_BUYERS + 1)
+    ))
+
+    orders = [result[0] for result in results if not isinstance(result, OutOfStock)]
+    assert len(orders) == QUANTITY_IN_STOCK
+    assert all(result.product_ids == [1] for result in results if isinstance(result, OutOfStock))
+    async with async_session_maker() as async_session:
+        product = await async_session.get(Product, 1)
+        assert (product.quantity_in_stock, product.number_of_sales) == (0, QUANTITY_IN_STOCK)
+    assert await count_rows(async_session_maker, OrderItem.product_id == 1, select_from=OrderItem) == QUANTITY_IN_STOCK
+    assert await count_rows(
+        async_session_maker, CartItem.product_id == 1, select_from=CartItem) == NUMBER_OF_BUYERS - QUANTITY_IN_STOCK
+
+
+# Повторные запросы с одним ключом идемпотентности, в том числе одновременные, оформляют один заказ
+@pytest.mark.asyncio(loop_scope="module")
+async def test_checkout_with_idempotency_key(async_session_maker):
+    async with async_session_maker() as async_session:
+        async_session.add(CartItem(user_id=1, product_id=2, quantity=3))
+        await async_session.commit()
+        # Пользователь мог купить товар в предыдущем тесте
+        total_amount_of_purchases = (await async_session.get(User, 1)).total_amount_of_purchases
+
+    results = await asyncio.gather(*(checkout_as(async_session_maker, 1, "order-1") for _ in range(5)))
+
+    assert sorted(created for _, created, _ in results) == [False, False, False, False, True]
+    assert len({order.order_id for order, _, _ in results}) == 1
+    assert all(order.total_price == 3000 for order, _, _ in results)
+    async with async_session_maker() as async_session:
+        product = await async_session.get(Product, 2)
+        assert product.quantity_in_stock == QUANTITY_IN_STOCK - 3
+        user = await async_session.get(User, 1)
+        assert user.total_amount_of_purchases == total_amount_of_purchases + 3000
+    assert await count_rows(async_session_maker, Order.idempotency_key == "order-1", select_from=Order) == 1
+
+
+# Заказ нельзя оформить на адрес другого пользователя
+@pytest.mark.asyncio(loop_scope="module")
+async def test_checkout_to_another_users_address(async_session_maker):
+    async with async_session_maker() as async_session:
+        with pytest.raises(CheckoutAddressNotFound):
+            await checkout_cart(async_session, 1, CHECKOUT.model_copy(update={"address_id": 2}))
+
+
+# Скидка заказа берется из бонусной карты в транзакции оформления, сумма покупок накапливается без округления float
+@pytest.mark.asyncio(loop_scope="module")
+async def test_checkout_discount_from_bonus_card(async_session_maker):
+    async with async_session_maker() as async_session:
+        # Покупатель мог не получить товар в первом тесте, и тот остался в его корзине
+        await async_session.execute(CartItem.__table__.delete().where(CartItem.user_id == NUMBER_OF_BUYERS))
+        await async_session.execute(Product.__table__.update().where(Product.id == 2).values(price=1000.15))
+        async_session.add(CartItem(user_id=NUMBER_OF_BUYERS, product_id=2, quantity=7))
+        await async_session.commit()
+        total_amount_of_purchases = (await async_session.get(User, NUMBER_OF_BUYERS)).total_amount_of_purchases
+
+    order, created, customer_level_name = await checkout_as(async_session_maker, NUMBER_OF_BUYERS)
+
+    assert (created, customer_level_name) == (True, "Мастер")
+    async with async_session_maker() as async_session:
+        order_from_db = await async_session.get(Order, order.order_id)
+        user = await async_session.get(User, NUMBER_OF_BUYERS)
+    assert order_from_db.total_price == Decimal("6300.98")
+    assert user.total_amount_of_purchases == total_amount_of_purchases + Decimal("6300.98")
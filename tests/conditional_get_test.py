@@ -0,0 +1,68 @@
+# tests.conditional_get_test.py
+# Условные запросы (If-None-Match) дерева каталога и главной страницы. Данные страниц заранее
+# помещаются в кэш справочных данных и в лидеры продаж, поэтому запросы к БД не нужны
+import pytest
+from fastapi.testclient import TestClient
+
+from api.schemas.main_page import ImageDTO, ProductTypeDTO
+from database.actions import CATALOG_TREE_CACHE_KEY, images_cache_key
+from database.cache import reference_data_cache
+from database.leaderboard import Leaderboard, top_sellers_leaderboard
+from database.main_page import MAIN_PAGE_IMAGE_TABLES
+from main import market_app
+
+client = TestClient(market_app)
+
+CATALOG_TREE = [ProductTypeDTO(name="Пиломатериалы", product_subtypes=[{"name": "Брус"}])]
+
+
+@pytest.fixture
+def cached_reference_data(monkeypatch, unused_session):
+    reference_data_cache.set(CATALOG_TREE_CACHE_KEY, CATALOG_TREE, {})
+    for ImagesToFind in MAIN_PAGE_IMAGE_TABLES.values():
+        reference_data_cache.set(
+            images_cache_key(ImagesToFind, ImageDTO), [ImageDTO(image_link="images/1.jpg")], {})
+    monkeypatch.setattr(top_sellers_leaderboard, "_leaderboard", Leaderboard([], size=10))
+    yield
+    reference_data_cache.clear()
+
+
+# Повторный запрос дерева каталога с полученным ETag получает пустой ответ 304,
+# после изменения дерева в кэше - новое дерево и новый ETag
+def test_catalog_data_not_modified(cached_reference_data):
+    response = client.get("/catalog/catalog_data")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, max-age=60"
+    etag = response.headers["ETag"]
+
+    response = client.get("/catalog/catalog_data", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    # Дерево, загруженное заново (другим воркером или после истечения TTL), имеет тот же ETag
+    reference_data_cache.clear()
+    reference_data_cache.set(CATALOG_TREE_CACHE_KEY, [tree.model_copy() for tree in CATALOG_TREE], {})
+    assert client.get("/catalog/catalog_data", headers={"If-None-Match": etag}).status_code == 304
+
+    reference_data_cache.set(CATALOG_TREE_CACHE_KEY, CATALOG_TREE + CATALOG_TREE, {})
+    response = client.get("/catalog/catalog_data", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+# ETag главной страницы гостя меняется при изменении любого блока страницы
+def test_main_page_not_modified(cached_reference_data):
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    etag = response.headers["ETag"]
+
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+
+    reference_data_cache.set(
+        images_cache_key(MAIN_PAGE_IMAGE_TABLES["promotion_images"], ImageDTO), [], {})
+    response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["promotion_images"] == []
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,28 @@
+# tests.conftest.py
+import pytest
+
+from database.dependencies import get_cache_fill_async_session, get_read_async_session
+from main import market_app
+
+
+class UnusedSession:
+    # Сессия, через которую нельзя выполнить запрос: данные берутся из кэша
+    async def execute(self, *args, **kwargs):
+        raise AssertionError("Запрос к БД при данных в кэше")
+
+    async def close(self):
+        pass
+
+
+async def get_unused_session():
+    yield UnusedSession()
+
+
+@pytest.fixture
+def unused_session():
+    # Сессии для чтения и для заполнения кэшей заменяются сессией, через которую нельзя выполнить запрос
+    market_app.dependency_overrides[get_cache_fill_async_session] = get_unused_session
+    market_app.dependency_overrides[get_read_async_session] = get_unused_session
+    yield
+    market_app.dependency_overrides.pop(get_cache_fill_async_session, None)
+    market_app.dependency_overrides.pop(get_read_async_session, None)
@@ -0,0 +1,104 @@
+# tests.customer_level_claim_test.py
+import time
+from collections import OrderedDict
+
+from fastapi import Response
+from jose import jwt
+from starlette.requests import Request
+
+from api.schemas.authentication import CustomerLevelClaim
+from api.security.authentication import create_jwt_token, check_jwt_access_token
+from api.security.customer_level import get_fresh_customer_level_claim
+from config import settings
+from database.customer_levels import customer_levels
+
+
+def make_request(jwt_access_token: str) -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(b"cookie", f"jwt_access_token={jwt_access_token}".encode())]
+    })
+
+
+# Уровень бонусной карты сохраняется в токене при его повторной выдаче
+def test_customer_level_claim_kept_on_token_reissue():
+    customer_level = CustomerLevelClaim(name="Новичок", discount_amount_in_percent=3, issued_at=time.time())
+    response = Response()
+
+    user = check_jwt_access_token(
+        make_request(create_jwt_token(user_id=7, user_role="user", customer_level=customer_level)), response)
+    new_jwt_access_token = response.headers["set-cookie"].split(";")[0].removeprefix("jwt_access_token=")
+    payload = jwt.decode(new_jwt_access_token, key=settings.SECRET_KEY, algorithms=settings.JWT_ALGORITHM)
+
+    assert get_fresh_customer_level_claim(user) == customer_level
+    assert payload["customer_level"]["discount_amount_in_percent"] == 3
+
+
+# Уровень из токена устаревает по времени и после изменения лестницы уровней
+def test_customer_level_claim_expires(mocker):
+    mocker.patch.object(customer_levels, "changed_at", 0.0)
+    expired_customer_level = CustomerLevelClaim(
+        name="Новичок", discount_amount_in_percent=3, issued_at=time.time() - settings.CUSTOMER_LEVEL_CLAIM_TTL - 1)
+    customer_level = CustomerLevelClaim(name="Новичок", discount_amount_in_percent=3, issued_at=time.time())
+
+    expired_user = check_jwt_access_token(
+        make_request(create_jwt_token(user_id=7, user_role="user", customer_level=expired_customer_level)), Response())
+    user = check_jwt_access_token(
+        make_request(create_jwt_token(user_id=7, user_role="user", customer_level=customer_level)), Response())
+
+    assert get_fresh_customer_level_claim(expired_user) is None
+    assert get_fresh_customer_level_claim(user) == customer_level
+
+    customer_levels.changed_at = time.time() + 1
+
+    assert get_fresh_customer_level_claim(user) is None
+
+
+# После уведомления об изменении уровня бонусной карты пользователя устаревает только его уровень в токене
+def test_customer_level_claim_invalidated_by_bonus_card_change(mocker):
+    mocker.patch.object(customer_levels, "changed_at", 0.0)
+    mocker.patch.object(customer_levels, "_user_levels_changed_at", OrderedDict())
+    customer_level = CustomerLevelClaim(name="Новичок", discount_amount_in_percent=3, issued_at=time.time())
+    user = check_jwt_access_token(
+        make_request(create_jwt_token(user_id=7, user_role="user", customer_level=customer_level)), Response())
+    other_user = check_jwt_access_token(
+        make_request(create_jwt_token(user_id=8, user_role="user", customer_level=customer_level)), Response())
+
+    customer_levels.bonus_card_changed("bonus_cards", "7")
+
+    assert get_fresh_customer_level_claim(user) is None
+    assert get_fresh_customer_level_claim(other_user) == customer_level
+
+    # Полный пересчет уровней завершается уведомлением об изменении всей таблицы
+    customer_levels.invalidate_claims("bonus_cards")
+
+    assert get_fresh_customer_level_claim(other_user) is None
+
+
+# Уровень, выданный после уведомления, актуален, если прочитан с основной БД,
+# а прочитанный с копии устаревает, пока копия может отставать
+def test_customer_level_claim_after_bonus_card_change(mocker):
+    mocker.patch.object(customer_levels, "changed_at", 0.0)
+    mocker.patch.object(customer_levels, "_user_levels_changed_at", OrderedDict())
+    customer_levels.bonus_card_changed("bonus_cards", "7")
+
+    customer_level = CustomerLevelClaim(name="Новичок", discount_amount_in_percent=3, issued_at=time.time())
+    replica_customer_level = CustomerLevelClaim(
+        name="Новичок", discount_amount_in_percent=3, issued_at=time.time(), from_replica=True)
+    user = check_jwt_access_token(
+        make_request(create_jwt_token(user_id=7, user_role="user", customer_level=customer_level)), Response())
+    replica_user = check_jwt_access_token(
+        make_request(create_jwt_token(user_id=7, user_role="user", customer_level=replica_customer_level)), Response())
+
+    assert get_fresh_customer_level_claim(user) == customer_level
+    assert get_fresh_customer_level_claim(replica_user) is None
+
+
+# Пользователи, у которых все токены со старым уровнем устарели по времени, удаляются при следующем уведомлении
+def test_bonus_card_changes_pruned(mocker):
+    expired_at = time.time() - settings.CUSTOMER_LEVEL_CLAIM_TTL - settings.DB_REPLICA_MAX_LAG - 1
+    mocker.patch.object(customer_levels, "_user_levels_changed_at", OrderedDict([(7, expired_at), (8, time.time())]))
+
+    customer_levels.bonus_card_changed("bonus_cards", "9")
+
+    assert list(customer_levels._user_levels_changed_at) == [8, 9]
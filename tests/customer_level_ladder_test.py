@@ -0,0 +1,34 @@
+# tests.customer_level_ladder_test.py
+import pytest
+
+from api.schemas.customer_level import CustomerLevelDTO
+from database.customer_levels import CustomerLevelLadder
+
+CUSTOMER_LEVELS = [
+    CustomerLevelDTO(name="Профессионал", discount_amount_in_percent=7, lower_threshold=200_000, level_number=3),
+    CustomerLevelDTO(name="Новичок", discount_amount_in_percent=3, lower_threshold=0, level_number=1),
+    CustomerLevelDTO(name="Постоянный покупатель", discount_amount_in_percent=5, lower_threshold=50_000, level_number=2)
+]
+
+
+# Поиск уровня по названию и следующего за ним уровня
+def test_customer_level_ladder_next_level():
+    ladder = CustomerLevelLadder(CUSTOMER_LEVELS)
+
+    assert ladder.get("Новичок").discount_amount_in_percent == 3
+    assert ladder.get_next_level("Новичок").name == "Постоянный покупатель"
+    assert ladder.get_next_level("Профессионал") is None
+    assert ladder.get("Неизвестный уровень") is None
+    assert [level.level_number for level in ladder.levels] == [1, 2, 3]
+
+
+# Лестница и уровни в ней не изменяются после создания
+def test_customer_level_ladder_is_immutable():
+    ladder = CustomerLevelLadder(CUSTOMER_LEVELS)
+
+    with pytest.raises(AttributeError):
+        ladder.levels = ()
+    with pytest.raises(TypeError):
+        ladder.by_name["Партнер"] = CUSTOMER_LEVELS[0]
+    with pytest.raises(Exception):
+        ladder.get("Новичок").discount_amount_in_percent = 50
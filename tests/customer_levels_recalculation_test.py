@@ -0,0 +1,81 @@
+# tests.customer_levels_recalculation_test.py
+# Пересчет уровней бонусных карт на тестовой БД (TEST_DB_NAME, пересоздается)
+import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config import settings
+from database.db import Base
+from database.models import User, BonusCard, CustomerLevel
+from jobs.recalculate_customer_levels import recalculate_customer_levels
+
+CUSTOMER_LEVELS = [
+    {"name": "Новичок", "discount_amount_in_percent": 3, "lower_threshold": 0, "level_number": 1},
+    {"name": "Постоянный покупатель", "discount_amount_in_percent": 5, "lower_threshold": 50_000, "level_number": 2},
+    {"name": "Профессионал", "discount_amount_in_percent": 7, "lower_threshold": 200_000, "level_number": 3},
+]
+TOTAL_AMOUNTS_OF_PURCHASES = {1: 0, 2: 49_999.99, 3: 50_000, 4: 1_000_000}
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def async_engine():
+    async_engine = create_async_engine(settings.ASYNCPG_TEST_DATABASE_URL)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(CustomerLevel.__table__.insert(), CUSTOMER_LEVELS)
+        await conn.execute(User.__table__.insert(), [
+            {"id": user_id, "login": f"user{user_id}", "total_amount_of_purchases": total_amount_of_purchases}
+            for user_id, total_amount_of_purchases in TOTAL_AMOUNTS_OF_PURCHASES.items()
+        ])
+        await conn.execute(BonusCard.__table__.insert(), [
+            {"id": user_id, "user_id": user_id} for user_id in TOTAL_AMOUNTS_OF_PURCHASES
+        ])
+    yield async_engine
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await async_engine.dispose()
+
+
+async def get_customer_level_names(async_engine) -> dict[int, str]:
+    async with async_engine.connect() as conn:
+        bonus_cards = await conn.execute(select(BonusCard.user_id, BonusCard.customer_level_name))
+        return dict(bonus_cards.all())
+
+
+# Каждой карте назначается уровень с наибольшим порогом, не превышающим сумму покупок,
+# повторный пересчет ничего не изменяет
+@pytest.mark.asyncio(loop_scope="module")
+async def test_full_customer_levels_recalculation(async_engine):
+    assert await recalculate_customer_levels(async_engine, incremental=False) == 2
+    assert await get_customer_level_names(async_engine) == {
+        1: "Новичок", 2: "Новичок", 3: "Постоянный покупатель", 4: "Профессионал"}
+
+    assert await recalculate_customer_levels(async_engine, incremental=False) == 0
+
+
+# В режиме --incremental пересчитываются только пользователи, измененные после прошлого запуска
+@pytest.mark.asyncio(loop_scope="module")
+async def test_incremental_customer_levels_recalculation(async_engine, monkeypatch):
+    monkeypatch.setattr(settings, "CUSTOMER_LEVELS_RECALCULATION_OVERLAP", 0.0)
+    assert await recalculate_customer_levels(async_engine, incremental=True) == 0
+
+    async with async_engine.begin() as conn:
+        # Сумма покупок пользователя 1 изменена после прошлого запуска (date_of_update обновляется)
+        await conn.execute(update(User).where(User.id == 1).values(total_amount_of_purchases=60_000))
+        # Пользователь 2 изменен задолго до прошлого запуска
+        await conn.execute(
+            update(User)
+            .where(User.id == 2)
+            .values(total_amount_of_purchases=60_000, date_of_update=datetime.datetime(2020, 1, 1)))
+
+    assert await recalculate_customer_levels(async_engine, incremental=True) == 1
+    customer_level_names = await get_customer_level_names(async_engine)
+    assert (customer_level_names[1], customer_level_names[2]) == ("Постоянный покупатель", "Новичок")
+
+    assert await recalculate_customer_levels(async_engine, incremental=False) == 1
+    assert (await get_customer_level_names(async_engine))[2] == "Постоянный покупатель"
@@ -1,12 +1,35 @@
 import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import NullPool
 
+from config import settings
+from database.cache import reference_data_cache
+from database.dependencies import get_cache_fill_async_session, can_fill_cache
 from main import market_app
 from fastapi.testclient import TestClient
 
 client = TestClient(market_app)
 
+
+async def get_unpooled_async_session():
+    # TestClient выполняет каждый запрос в своем цикле событий, поэтому соединение не должно оставаться в пуле
+    async_engine = create_async_engine(settings.ASYNCPG_DATABASE_URL, poolclass=NullPool)
+    async with async_sessionmaker(async_engine, class_=AsyncSession)() as async_session:
+        yield async_session
+    await async_engine.dispose()
+
+
+@pytest.fixture
+def unpooled_async_session():
+    market_app.dependency_overrides[get_cache_fill_async_session] = get_unpooled_async_session
+    reference_data_cache.clear()
+    yield
+    market_app.dependency_overrides.pop(get_cache_fill_async_session, None)
+    reference_data_cache.clear()
+
+
 @pytest.mark.asyncio
-async def test_get_catalog_data():
+async def test_get_catalog_data(unpooled_async_session):
     response = client.get("/catalog/catalog_data")
     assert response.status_code == 200
     assert response.json() == {
@@ -43,3 +66,17 @@ async def test_get_catalog_data():
                 }
             ]
     }
+
+
+# Дерево каталога, прочитанное с отстающей копии БД, отдается без сохранения в кэш справочных данных
+@pytest.mark.asyncio
+async def test_get_catalog_data_from_lagging_replica_not_cached(unpooled_async_session):
+    market_app.dependency_overrides[can_fill_cache] = lambda: False
+    try:
+        response = client.get("/catalog/catalog_data")
+    finally:
+        market_app.dependency_overrides.pop(can_fill_cache, None)
+    assert response.status_code == 200
+    assert len(response.json()["catalog_data"]) == 3
+    assert "etag" in response.headers
+    assert reference_data_cache.stats().size == 0
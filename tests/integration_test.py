@@ -3,13 +3,13 @@ import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from unittest.mock import MagicMock
 from sqlalchemy import select
 
 from config import settings
 from main import market_app
 from database.db import Base, async_session_maker as asm
 from database.models import CustomerLevel
+from database.dependencies import get_async_session
 
 
 @pytest.mark.asyncio
@@ -66,16 +66,15 @@ class TestScenarios:
             yield async_session_
 
     @pytest.fixture(autouse=True)
-    def mock_async_session_maker_(self, mocker, async_session):
-        mock_async_session_maker = MagicMock()
-        mock_async_session_maker.return_value.__aenter__.return_value = async_session
-        mock_async_session_maker.return_value.__aexit__.return_value = None
-
-        mocker.patch("database.actions.async_session_maker", new=mock_async_session_maker)
-        mocker.patch("api.endpoints.jwt_auth.async_session_maker", new=mock_async_session_maker)
-        mocker.patch("api.endpoints.user_profile.async_session_maker", new=mock_async_session_maker)
-
-        return mock_async_session_maker
+    def mock_get_async_session_(self, async_session):
+        # Все конечные точки получают сессию через зависимость get_async_session,
+        # поэтому подменяем ее на сессию тестовой БД
+        async def mock_get_async_session():
+            yield async_session
+
+        market_app.dependency_overrides[get_async_session] = mock_get_async_session
+        yield mock_get_async_session
+        market_app.dependency_overrides.pop(get_async_session, None)
 
     @pytest.mark.asyncio
     async def test_first_scenario(self):
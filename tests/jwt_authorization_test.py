@@ -6,6 +6,7 @@ from fastapi.testclient import TestClient
 
 from api.security.authentication import create_hashed_password, create_jwt_token
 from database.actions import check_login_availability
+from database.dependencies import get_async_session
 from database.models import User
 from api.errors.authentication.exceptions import UnavailableLogin
 from api.schemas.authentication import RegistrationCredentials
@@ -53,7 +54,7 @@ class TestAuthorization:
         market_app.dependency_overrides[check_login_availability] = mock_check_login_availability
 
     @pytest.fixture(autouse=True)
-    def mock_async_session_maker_(self, mocker):
+    def mock_async_session_(self):
         self.mock_async_session = MagicMock()
         # "async_session.add(new_user)", async_session.add(new_user) - ничего не возвращает
         self.mock_async_session.add.return_value = None
@@ -63,17 +64,15 @@ class TestAuthorization:
         # и изменяет объект new_user
         self.mock_async_session.refresh = AsyncMock(side_effect=mock_refresh)
 
-        mock_async_session_maker = mocker.patch("api.endpoints.jwt_auth.async_session_maker")
-        # "async with async_session_maker() as async_session:"
-        # async_session_maker() возвращает объект класса AsyncSession - асинхронный контекстный менеджер,
-        # который вызывает метод __aenter__, который создает объект асинхронной сессии с БД,
-        # который присваивается в async_session
-        # Соответствующий мок:
-        mock_async_session_maker.return_value.__aenter__.return_value = self.mock_async_session
-        # Вызывается при закрытии асинхронного контекста
-        mock_async_session_maker.return_value.__aexit__.return_value = None
-
-        return mock_async_session_maker
+        # "async_session: AsyncSession = Depends(get_async_session)"
+        # Зависимость get_async_session выдает одну сессию на запрос, подменяем ее на мок
+        async def mock_get_async_session():
+            yield self.mock_async_session
+
+        market_app.dependency_overrides[get_async_session] = mock_get_async_session
+        yield self.mock_async_session
+        # Возвращаем настоящую зависимость, чтобы не затронуть другие тесты
+        market_app.dependency_overrides.pop(get_async_session, None)
 
     @pytest.fixture(autouse=True)
     def mock_get_user_by_login_from_db_(self, mocker):
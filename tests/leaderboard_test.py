@@ -0,0 +1,58 @@
+# tests.leaderboard_test.py
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from api.schemas.main_page import ProductTypeDTO
+from database.actions import CATALOG_TREE_CACHE_KEY
+from database.cache import reference_data_cache
+from database.leaderboard import Leaderboard, leaderboard_query, top_sellers_leaderboard
+from main import market_app
+
+client = TestClient(market_app)
+
+
+def leaderboard_row(type_name: str, subtype_name: str, product_id: int, number_of_sales: int):
+    return SimpleNamespace(type_name=type_name, subtype_name=subtype_name, id=product_id, name=f"Товар {product_id}",
+                           price=100.0, image_link="", rating=0.5, number_of_sales=number_of_sales)
+
+
+# Лидеры каждого подтипа читаются по индексу подтипа (LATERAL ... LIMIT), а не сортировкой всей таблицы
+def test_leaderboard_query():
+    sql = str(leaderboard_query(10).compile(dialect=postgresql.dialect()))
+
+    # Подтипы без товаров тоже попадают в списки (пустыми)
+    assert "LEFT OUTER JOIN LATERAL" in sql
+    assert "ON true" in sql
+    assert "WHERE products.product_subtype_name = product_subtypes.name" in sql
+    assert "ORDER BY products.number_of_sales DESC, products.id DESC" in sql
+
+
+# Общий список выбирается из лидеров подтипов, списки подтипов различаются по типу товара
+def test_leaderboard_top_sellers():
+    leaderboard = Leaderboard([
+        leaderboard_row("Пиломатериалы", "Брус", 1, 50),
+        leaderboard_row("Пиломатериалы", "Брус", 2, 10),
+        leaderboard_row("Металлопрокат", "Сетка", 3, 30),
+        leaderboard_row("Металлопрокат", "Сетка", 4, 30),
+        leaderboard_row("Металлопрокат", "Швеллеры и уголки", None, None)
+    ], size=3)
+
+    assert [product.id for product in leaderboard.top_sellers] == [1, 4, 3]
+    assert [product.id for product in leaderboard.get_subtype_top_sellers("Пиломатериалы", "Брус")] == [1, 2]
+    assert leaderboard.get_subtype_top_sellers("Металлопрокат", "Швеллеры и уголки") == ()
+    assert leaderboard.get_subtype_top_sellers("Металлопрокат", "Брус") is None
+
+
+# Подтип, созданный после обновления лидеров продаж, есть в дереве каталога - его список пуст, а не 404
+def test_bestsellers_of_subtype_missing_in_leaderboard(monkeypatch, unused_session):
+    monkeypatch.setattr(top_sellers_leaderboard, "_leaderboard", Leaderboard([], size=10))
+    reference_data_cache.set(CATALOG_TREE_CACHE_KEY, [
+        ProductTypeDTO(name="Пиломатериалы", product_subtypes=[{"name": "Брус"}])], {})
+    try:
+        response = client.get("/catalog/Пиломатериалы/Брус/bestsellers")
+        assert (response.status_code, response.json()) == (200, [])
+        assert client.get("/catalog/Пиломатериалы/Фанера/bestsellers").status_code == 404
+    finally:
+        reference_data_cache.clear()
@@ -0,0 +1,184 @@
+# tests.page_cache_test.py
+# Кэш готовых HTML-страниц: вытеснение по размеру, устаревание при изменении таблиц и по времени жизни,
+# ответ страницы товара гостю из кэша без обращения к БД, кэш фрагментов страниц (тег {% cache %})
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.caching.fragment_cache import FRAGMENT_TABLE_VERSIONS, FRAGMENT_CHANGE_NUMBER
+from api.caching.page_cache import (PageCache, page_cache, page_cache_key, catalog_page_version_keys,
+                                    product_page_version_keys, CATALOG_PAGE_TABLES)
+from api.endpoints.catalog import templates as catalog_templates, PRODUCTS_PAGE_SIZE
+from api.pricing.discounts import GUEST_BONUS_DISCOUNT_IN_PERCENT
+from main import market_app
+
+client = TestClient(market_app)
+
+TABLE_VERSIONS = {"products": 0}
+
+
+@pytest.fixture
+def unused_session(unused_session):
+    # Дополняет общую фикстуру: сохраненные в тесте страницы удаляются из кэша
+    yield
+    page_cache.clear()
+
+
+# При превышении размера кэша вытесняется давно не использованная страница,
+# страница больше всего кэша не сохраняется
+def test_page_cache_evicts_least_recently_used_pages():
+    cache = PageCache(max_size_in_bytes=10, ttl=60)
+    cache.set("a", b"aaaa", TABLE_VERSIONS)
+    cache.set("b", b"bbbb", TABLE_VERSIONS)
+    assert cache.get("a") == b"aaaa"
+
+    cache.set("c", b"cccc", TABLE_VERSIONS)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (b"aaaa", b"cccc")
+    assert cache.size_in_bytes == 8
+
+    cache.set("d", b"d" * 11, TABLE_VERSIONS)
+    assert cache.get("d") is None
+    assert cache.stats().evictions == 1
+
+
+# Страница устаревает при изменении таблицы, из которой построена, и по истечении времени жизни
+def test_page_cache_invalidation(monkeypatch):
+    cache = PageCache(max_size_in_bytes=100, ttl=60)
+    cache.set("product", b"product", cache.snapshot_versions(["products", "product_feedbacks"]))
+    cache.set("catalog", b"catalog", cache.snapshot_versions(["products"]))
+
+    cache.invalidate_tables("product_feedbacks")
+    assert cache.get("product") is None
+    assert cache.get("catalog") == b"catalog"
+
+    # Версия, снятая до изменения таблицы, не дает сохранить устаревшую страницу
+    table_versions = cache.snapshot_versions(["products"])
+    cache.invalidate_tables("products")
+    cache.set("catalog", b"old catalog", table_versions)
+    assert cache.get("catalog") is None
+
+    cache.set("catalog", b"catalog", cache.snapshot_versions(["products"]))
+    monkeypatch.setattr(time, "monotonic", lambda: float("inf"))
+    assert cache.get("catalog") is None
+    assert cache.size_in_bytes == 0
+
+
+# Изменение товара или отзыва сбрасывает только страницы его подтипа и страницу самого товара,
+# а изменение таблицы целиком - все страницы, построенные из нее
+def test_page_cache_row_invalidation():
+    cache = PageCache(max_size_in_bytes=1000, ttl=60)
+    pages = {
+        "Брус": catalog_page_version_keys("Брус"),
+        "Доски": catalog_page_version_keys("Доски"),
+        "product 1": product_page_version_keys(1),
+        "product 2": product_page_version_keys(2)
+    }
+
+    def store_pages():
+        for key, version_keys in pages.items():
+            cache.set(key, key.encode(), cache.snapshot_versions(version_keys))
+
+    def cached_pages() -> set:
+        return {key for key in pages if cache.get(key) is not None}
+
+    store_pages()
+    # Триггер products отправляет "products:<id>" и "product_subtypes:<подтип товара>"
+    cache.row_changed("products", "1")
+    cache.row_changed("product_subtypes", "Брус")
+    assert cached_pages() == {"Доски", "product 2"}
+
+    store_pages()
+    cache.row_changed("product_feedbacks", "2")
+    assert cached_pages() == {"Брус", "Доски", "product 1"}
+
+    # Версии строк удаляются вместе с изменением таблицы, страницы с ними при этом устаревают
+    store_pages()
+    cache.invalidate_tables("products")
+    assert cached_pages() == set()
+    assert cache.version(("products", "1")) == 0
+
+
+# Страница товара, сохраненная для гостя, возвращается гостю без обращения к БД
+def test_guest_product_page_from_cache(unused_session):
+    page_cache.set(
+        page_cache_key("product.html", (1,), "guest", GUEST_BONUS_DISCOUNT_IN_PERCENT),
+        b"<html>cached</html>", page_cache.snapshot_versions(product_page_version_keys(1)))
+
+    response = client.get("/catalog/product/1")
+    assert response.status_code == 200
+    assert response.text == "<html>cached</html>"
+    assert response.headers["content-type"].startswith("text/html")
+
+
+# Ключ страницы каталога строится из проверенных параметров: лишние, переставленные
+# и равные значениям по умолчанию параметры запроса не создают новых записей в кэше
+def test_catalog_page_cache_key_ignores_query_string(unused_session):
+    page_cache.set(
+        page_cache_key(
+            "catalog.html", ("Пиломатериалы", "Брус", "number_of_sales", "desc", None, PRODUCTS_PAGE_SIZE), "guest", 0),
+        b"<html>cached</html>", page_cache.snapshot_versions(catalog_page_version_keys("Брус")))
+
+    for query in ("", f"?order=desc&sort=number_of_sales&limit={PRODUCTS_PAGE_SIZE}", "?utm_source=ad&x=1"):
+        response = client.get(f"/catalog/Пиломатериалы/Брус{query}")
+        assert response.status_code == 200
+        assert response.text == "<html>cached</html>"
+    assert page_cache.stats().size == 1
+
+
+# Карточки товаров каталога берутся из кэша фрагментов для пользователей с разными скидками,
+# а цены рендерятся для каждого пользователя
+def test_catalog_product_cards_from_fragment_cache(monkeypatch):
+    cache = PageCache(max_size_in_bytes=1024 * 1024, ttl=60)
+    monkeypatch.setattr(catalog_templates.env, "fragment_cache", cache)
+    template = catalog_templates.get_template("catalog.html")
+    products = [
+        SimpleNamespace(id=product_id, name=f"Брус {product_id}", image_link="", quantity_in_stock=product_id - 1)
+        for product_id in (1, 2)
+    ]
+
+    def render(product_prices: dict, name_suffix: str = "") -> str:
+        for product in products:
+            product.name = f"Брус {product.id}{name_suffix}"
+        return template.render(
+            request=None, products_from_db=products, product_prices=product_prices,
+            pagination=SimpleNamespace(is_first_page=True, next_page_query=None),
+            **{FRAGMENT_TABLE_VERSIONS: cache.snapshot_versions(CATALOG_PAGE_TABLES),
+               FRAGMENT_CHANGE_NUMBER: cache.change_number})
+
+    assert "1000 ₽" in render({1: 1000, 2: 2000})
+    assert (cache.stats().size, cache.stats().hits) == (2, 0)
+    html = render({1: 900, 2: 1800}, name_suffix=" (новый)")
+    assert "900 ₽" in html and "Брус 1<" in html
+    assert cache.stats().hits == 2
+
+    # Изменение товара сбрасывает только его карточку
+    cache.row_changed("products", "1")
+    html = render({1: 900, 2: 1800}, name_suffix=" (новый)")
+    assert "Брус 1 (новый)<" in html and "Брус 2<" in html
+    assert cache.stats().hits == 3
+
+    cache.invalidate_tables("products")
+    assert "Брус 2 (новый)" in render({1: 900, 2: 1800}, name_suffix=" (новый)")
+    assert "Товара нет в наличии" in html and "Товар в наличии" in html
+
+
+# Карточка товара, измененного после снятия версий (данные страницы могли быть прочитаны до изменения),
+# рендерится без сохранения в кэш
+def test_fragment_of_row_changed_during_load_not_cached(monkeypatch):
+    cache = PageCache(max_size_in_bytes=1024 * 1024, ttl=60)
+    monkeypatch.setattr(catalog_templates.env, "fragment_cache", cache)
+    template = catalog_templates.get_template("catalog.html")
+    products = [SimpleNamespace(id=1, name="Брус 1", image_link="", quantity_in_stock=1)]
+    fragment_context = {
+        FRAGMENT_TABLE_VERSIONS: cache.snapshot_versions(CATALOG_PAGE_TABLES),
+        FRAGMENT_CHANGE_NUMBER: cache.change_number
+    }
+    cache.row_changed("products", "1")
+
+    template.render(
+        request=None, products_from_db=products, product_prices={1: 1000},
+        pagination=SimpleNamespace(is_first_page=True, next_page_query=None), **fragment_context)
+    assert cache.stats().size == 0
@@ -0,0 +1,29 @@
+# tests.pricing_test.py
+from decimal import Decimal
+
+import pytest
+
+from api.pricing.discounts import apply_discount, apply_discount_to_prices
+
+
+# Цены со скидкой точные и округлены до копеек
+def test_apply_discount_to_prices():
+    product_prices = apply_discount_to_prices(
+        [(1, Decimal("3958.54")), (2, Decimal("0.10")), (3, 100), (4, 19.99)], 3)
+
+    assert product_prices == {
+        1: Decimal("3839.78"),
+        2: Decimal("0.10"),
+        3: Decimal("97.00"),
+        4: Decimal("19.39")
+    }
+    assert apply_discount(Decimal("99999.99"), 10) == Decimal("89999.99")
+    assert apply_discount(Decimal("500.00"), 0) == Decimal("500.00")
+
+
+# Скидка вне диапазона от 0 до 100 процентов
+def test_apply_discount_invalid_discount():
+    with pytest.raises(ValueError):
+        apply_discount_to_prices([(1, Decimal("10.00"))], 101)
+    with pytest.raises(ValueError):
+        apply_discount(Decimal("10.00"), -1)
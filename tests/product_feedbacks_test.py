@@ -0,0 +1,57 @@
+# tests.product_feedbacks_test.py
+import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from api.errors.catalog.exceptions import InvalidCursor
+from api.schemas.feedback import FeedbackCursor
+from database.actions import product_feedbacks_query, get_product_feedbacks_page_from_db, \
+    product_feedback_aggregates_update
+from database.models import ProductFeedback
+from database.pagination import encode_cursor
+from jobs.backfill_feedback_aggregates import backfill_feedback_aggregates_query
+
+
+# Отзывы читаются от новых к старым по ключу (дата изменения, id), из users - только имя и фамилия
+def test_product_feedbacks_query():
+    sql = str(product_feedbacks_query(1, (datetime.datetime(2026, 10, 17, 12, 0), 10), 10)
+              .compile(dialect=postgresql.dialect()))
+
+    assert "(product_feedbacks.date_of_update, product_feedbacks.id) < (" in sql
+    assert "ORDER BY product_feedbacks.date_of_update DESC, product_feedbacks.id DESC" in sql
+    assert "users.first_name, users.last_name" in sql
+    assert "users.hashed_password" not in sql
+    assert "OFFSET" not in sql
+
+
+# Курсор отзывов другого товара не принимается (до обращения к БД)
+@pytest.mark.asyncio
+async def test_feedback_cursor_from_another_product():
+    cursor = encode_cursor(FeedbackCursor(product_id=1, date_of_update=datetime.datetime(2026, 10, 17), id=10))
+
+    with pytest.raises(InvalidCursor):
+        await get_product_feedbacks_page_from_db(None, 2, cursor, 10)
+
+
+# Удаление отзыва уменьшает сводные данные товара на значения отзыва, отзыв без оценки не меняет оценки
+def test_feedback_aggregates_update():
+    feedback = ProductFeedback(product_id=7, number_of_likes=3, number_of_dislikes=1)
+    statement = product_feedback_aggregates_update(feedback, -1).compile(dialect=postgresql.dialect())
+    sql = str(statement)
+
+    assert "SET feedbacks_count=(products.feedbacks_count + %(feedbacks_count_1)s)" in sql
+    assert "WHERE products.id = %(id_1)s" in sql
+    assert statement.params["feedbacks_count_1"] == -1
+    assert statement.params["feedback_likes_count_1"] == -3
+    assert statement.params["feedback_dislikes_count_1"] == -1
+    assert statement.params["feedback_ratings_count_1"] == 0
+
+
+# Пересчет сводных данных - один запрос на диапазон товаров с группировкой отзывов в БД
+def test_backfill_feedback_aggregates_query():
+    sql = str(backfill_feedback_aggregates_query(1, 10_000).compile(dialect=postgresql.dialect()))
+
+    assert sql.startswith("UPDATE products SET")
+    assert "GROUP BY product_feedbacks.product_id" in sql
+    assert "count(product_feedbacks.rating)" in sql
@@ -0,0 +1,104 @@
+# tests.product_import_test.py
+# Загрузка товаров из CSV и NDJSON на тестовой БД (TEST_DB_NAME, пересоздается)
+import json
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config import settings
+from database.db import Base
+from database.models import Product, ProductSubtype
+from jobs.import_products import import_products, read_csv_rows, read_ndjson_rows, ProductImportError
+
+CSV_PRODUCTS = """name,price,description,image_link,quantity_in_stock,product_subtype_name,product_type_name,additional_information
+Брус 100x100,1500.50,Сосна,images/1.jpg,10,Брус,Пиломатериалы,
+Доска 50x150,700,Сосна,images/2.jpg,,Доски строительные,Пиломатериалы,"Длина 6 м, ГОСТ"
+Брус 100x100,1600,Сосна сухая,images/1.jpg,12,Брус,Пиломатериалы,
+"""
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def async_engine():
+    async_engine = create_async_engine(settings.ASYNCPG_TEST_DATABASE_URL)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_engine
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await async_engine.dispose()
+
+
+async def get_products(async_engine) -> dict[str, tuple]:
+    async with async_engine.connect() as conn:
+        products = await conn.execute(
+            select(Product.name, Product.price, Product.description, Product.quantity_in_stock,
+                   Product.product_subtype_name))
+        return {product.name: tuple(product[1:]) for product in products}
+
+
+# Новые товары и подтипы создаются, из повторяющихся строк загружается последняя,
+# пустой остаток загружается как NULL
+@pytest.mark.asyncio(loop_scope="module")
+async def test_import_products_from_csv(async_engine, tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_text(CSV_PRODUCTS, encoding="utf-8")
+
+    columns, rows = read_csv_rows(path)
+    async with async_engine.begin() as conn:
+        assert await import_products(conn, columns, rows, chunk_size=2) == (3, 3)
+
+    assert await get_products(async_engine) == {
+        "Брус 100x100": (1600, "Сосна сухая", 12, "Брус"),
+        "Доска 50x150": (700, "Сосна", None, "Доски строительные")
+    }
+    async with async_engine.connect() as conn:
+        subtypes = await conn.execute(select(ProductSubtype.name, ProductSubtype.type_name))
+        assert set(subtypes.all()) == {("Брус", "Пиломатериалы"), ("Доски строительные", "Пиломатериалы")}
+
+
+# Прайс-лист из названий и цен изменяет только цены, товары с прежней ценой не перезаписываются
+@pytest.mark.asyncio(loop_scope="module")
+async def test_import_price_list_from_ndjson(async_engine, tmp_path):
+    path = tmp_path / "prices.ndjson"
+    path.write_text("\n".join(json.dumps(product, ensure_ascii=False) for product in [
+        {"name": "Брус 100x100", "price": 1600},
+        {"name": "Доска 50x150", "price": 750.5}
+    ]), encoding="utf-8")
+
+    columns, rows = read_ndjson_rows(path)
+    async with async_engine.begin() as conn:
+        assert await import_products(conn, columns, rows, chunk_size=10) == (2, 1)
+
+    products = await get_products(async_engine)
+    assert products["Брус 100x100"] == (1600, "Сосна сухая", 12, "Брус")
+    assert products["Доска 50x150"][:2] == (750.5, "Сосна")
+
+
+# Файл, объект которого содержит ключи, которых нет в первом объекте, не загружается целиком
+@pytest.mark.asyncio(loop_scope="module")
+async def test_import_ndjson_with_extra_keys(async_engine, tmp_path):
+    path = tmp_path / "prices.ndjson"
+    path.write_text("\n".join(json.dumps(product, ensure_ascii=False) for product in [
+        {"name": "Брус 100x100", "price": 1700},
+        {"name": "Доска 50x150", "price": 800, "quantity_in_stock": 5}
+    ]), encoding="utf-8")
+
+    columns, rows = read_ndjson_rows(path)
+    with pytest.raises(ProductImportError, match="Строка 2: .*quantity_in_stock"):
+        async with async_engine.begin() as conn:
+            await import_products(conn, columns, rows, chunk_size=1)
+
+    products = await get_products(async_engine)
+    assert products["Брус 100x100"][0] == 1600
+
+
+# Файл с неизвестным столбцом не загружается
+@pytest.mark.asyncio(loop_scope="module")
+async def test_import_products_with_unknown_column(async_engine):
+    async with async_engine.begin() as conn:
+        with pytest.raises(ProductImportError):
+            await import_products(conn, ["name", "rating"], iter([("Брус 100x100", "0.5")]), chunk_size=10)
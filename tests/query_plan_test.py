@@ -0,0 +1,174 @@
+# tests.query_plan_test.py
+# Планы запросов, которые выполняют database.actions и обработчики, на заполненной тестовой БД (TEST_DB_NAME,
+# пересоздается). Каждый сценарий выполняет запросы как приложение, выполненные запросы записываются
+# и для каждого строится EXPLAIN (FORMAT JSON): последовательное чтение большой таблицы считается ошибкой.
+# Полное чтение товаров для индекса подсказок (database.suggestions) намеренное и здесь не проверяется
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from api.errors.cart.exceptions import OutOfStock
+from api.schemas.authentication import UserIdRole
+from api.schemas.cart import CheckoutRequest
+from api.schemas.catalog import ProductSortKey, SortOrder
+from api.schemas.main_page import ImageDTO
+from benchmarks.seed import seed_database, DELIVERY_TYPE, PAYMENT_METHOD
+from config import settings
+from database import main_page
+from database.actions import (get_images_from_db, get_catalog_tree_from_db, get_subtype_products_page_from_db,
+                              search_products_page_from_db, get_user_by_login_from_db, get_user_by_id_from_db,
+                              get_user_with_bonus_card_from_db, get_customer_level_name_from_db,
+                              get_product_feedbacks_page_from_db, get_product_feedback_by_id,
+                              add_feedback_to_product_aggregates)
+from database.cache import reference_data_cache
+from database.cart import upsert_cart_items, get_cart_from_db, remove_cart_item
+from database.checkout import checkout_cart
+from database.db import create_pooled_async_engine
+from database.dependencies import get_cache_fill_async_session
+from database.leaderboard import LeaderboardRegistry
+from database.main_page import load_main_page_data, MAIN_PAGE_IMAGE_TABLES
+from main import market_app
+
+# Таблицы, которые растут вместе с каталогом и количеством пользователей
+LARGE_TABLES = {"products", "product_feedbacks", "users", "bonus_cards", "users_addresses", "orders", "order_items",
+                "cart_items"}
+USER = UserIdRole(id=42, role="user")
+
+
+async def read_reference_data(async_session_maker):
+    async with async_session_maker() as async_session:
+        for ImagesToFind in MAIN_PAGE_IMAGE_TABLES.values():
+            await get_images_from_db(ImagesToFind, ImageDTO, async_session)
+        await get_catalog_tree_from_db(async_session)
+
+
+async def read_main_page(async_session_maker):
+    async with async_session_maker() as async_session:
+        await load_main_page_data(async_session, USER)
+
+
+async def read_catalog_pages(async_session_maker):
+    async with async_session_maker() as async_session:
+        for sort in ProductSortKey:
+            for order in SortOrder:
+                _, next_cursor = await get_subtype_products_page_from_db(
+                    async_session, "Пиломатериалы", "Брус", sort, order, None, 16)
+                await get_subtype_products_page_from_db(
+                    async_session, "Пиломатериалы", "Брус", sort, order, next_cursor, 16)
+
+
+async def search_products(async_session_maker):
+    async with async_session_maker() as async_session:
+        _, next_cursor = await search_products_page_from_db(async_session, "доска строганая", None, 20)
+        await search_products_page_from_db(async_session, "доска строганая", next_cursor, 20)
+
+
+async def read_users(async_session_maker):
+    async with async_session_maker() as async_session:
+        await get_user_by_login_from_db("benchmarkUser42", async_session)
+        await get_user_by_id_from_db(async_session, USER)
+        await get_user_with_bonus_card_from_db(async_session, USER)
+        await get_customer_level_name_from_db(async_session, USER)
+
+
+async def read_and_change_feedbacks(async_session_maker):
+    async with async_session_maker() as async_session:
+        feedbacks, next_cursor = await get_product_feedbacks_page_from_db(async_session, 5, None, 10)
+        await get_product_feedbacks_page_from_db(async_session, 5, next_cursor, 10)
+        feedback = await get_product_feedback_by_id(async_session, feedbacks[0].id)
+        await add_feedback_to_product_aggregates(async_session, feedback)
+        await async_session.rollback()
+
+
+async def change_and_read_cart(async_session_maker):
+    async with async_session_maker() as async_session:
+        await upsert_cart_items(async_session, USER.id, {5: 2, 6: 1})
+        await upsert_cart_items(async_session, USER.id, {6: 3}, add=False)
+        await get_cart_from_db(async_session, USER.id)
+        await remove_cart_item(async_session, USER.id, 5)
+
+
+async def checkout(async_session_maker):
+    checkout_request = CheckoutRequest(
+        delivery_type_name=DELIVERY_TYPE, payment_method_name=PAYMENT_METHOD, address_id=USER.id)
+    async with async_session_maker() as async_session:
+        try:
+            await checkout_cart(async_session, USER.id, checkout_request, "query-plan-test")
+        except OutOfStock:
+            pass
+        # Повторный запрос с тем же ключом находит оформленный заказ
+        await checkout_cart(async_session, USER.id, checkout_request, "query-plan-test")
+
+
+async def open_product_page(async_session_maker):
+    # Запрос товара выполняет сам обработчик, поэтому страница открывается через приложение
+    async def mock_get_cache_fill_async_session():
+        async with async_session_maker() as async_session:
+            yield async_session
+
+    market_app.dependency_overrides[get_cache_fill_async_session] = mock_get_cache_fill_async_session
+    try:
+        async with AsyncClient(transport=ASGITransport(app=market_app)) as client:
+            response = await client.get("http://127.0.0.1:8000/catalog/product/5")
+            assert response.status_code == 200
+    finally:
+        market_app.dependency_overrides.pop(get_cache_fill_async_session, None)
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def seeded_engine():
+    async_engine = create_pooled_async_engine(settings.ASYNCPG_TEST_DATABASE_URL)
+    await seed_database(async_engine, number_of_products=20_000, number_of_feedbacks=20_000, number_of_users=5_000,
+                        number_of_cart_items=15_000, number_of_orders=10_000)
+    yield async_engine
+    await async_engine.dispose()
+
+
+def get_seq_scans(plan: dict) -> list[str]:
+    seq_scans = []
+    if plan["Node Type"] == "Seq Scan" and plan["Relation Name"] in LARGE_TABLES:
+        seq_scans.append(plan["Relation Name"])
+    for subplan in plan.get("Plans", ()):
+        seq_scans.extend(get_seq_scans(subplan))
+    return seq_scans
+
+
+# Ни один запрос сценария не читает большую таблицу целиком
+@pytest.mark.asyncio(loop_scope="module")
+@pytest.mark.parametrize("scenario", [
+    read_reference_data, read_main_page, read_catalog_pages, search_products, read_users,
+    read_and_change_feedbacks, change_and_read_cart, checkout, open_product_page
+], ids=lambda scenario: scenario.__name__)
+async def test_no_seq_scans_on_large_tables(scenario, seeded_engine, monkeypatch):
+    async_session_maker = async_sessionmaker(seeded_engine, class_=AsyncSession)
+    # Справочные данные не берутся из кэша, а лидеры продаж загружаются из тестовой БД,
+    # чтобы их запросы тоже выполнялись
+    monkeypatch.setattr(reference_data_cache, "ttl", 0)
+    monkeypatch.setattr(main_page, "top_sellers_leaderboard",
+                        LeaderboardRegistry(async_session_maker, size=10, refresh_interval=60))
+
+    statements = []
+
+    def record_statement(connection, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(seeded_engine.sync_engine, "before_cursor_execute", record_statement)
+    try:
+        await scenario(async_session_maker)
+    finally:
+        event.remove(seeded_engine.sync_engine, "before_cursor_execute", record_statement)
+
+    statements = [
+        (statement, parameters)
+        for statement, parameters in statements
+        if statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE", "INSERT"))
+    ]
+    assert statements
+
+    async with seeded_engine.connect() as connection:
+        for statement, parameters in statements:
+            plan = await connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            seq_scans = get_seq_scans(plan.scalar()[0]["Plan"])
+            assert not seq_scans, f"Seq Scan ({', '.join(seq_scans)}):\n{statement}"
@@ -0,0 +1,112 @@
+# tests.reference_cache_test.py
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from api.schemas.authentication import UserIdRole
+from database.cache import TTLLRUCache, MISSING, reference_data_cache
+from database.leaderboard import Leaderboard, top_sellers_leaderboard
+from database.main_page import load_main_page_data, MAIN_PAGE_IMAGE_TABLES
+
+
+class RecordingSession:
+    # Сессия, которая возвращает заданную строку и считает выполненные запросы
+    def __init__(self, row: dict):
+        self.row = row
+        self.executed = 0
+
+    async def execute(self, *args, **kwargs):
+        self.executed += 1
+        return SimpleNamespace(mappings=lambda: SimpleNamespace(one=lambda: self.row))
+
+
+# Значение из кэша возвращается до изменения таблицы, после изменения - промах
+def test_cache_invalidated_by_table_version():
+    cache = TTLLRUCache(max_size=10, ttl=60)
+    table_versions = cache.snapshot_versions(["product_types"])
+    cache.set("catalog_tree", ["Пиломатериалы"], table_versions)
+
+    assert cache.get("catalog_tree") == ["Пиломатериалы"]
+
+    cache.invalidate_tables("product_types")
+
+    assert cache.get("catalog_tree") is MISSING
+    assert cache.stats().hits == 1
+    assert cache.stats().misses == 1
+
+
+# Значение, загруженное во время изменения таблицы, сразу считается устаревшим
+def test_cache_value_loaded_during_invalidation_is_stale():
+    cache = TTLLRUCache(max_size=10, ttl=60)
+    table_versions = cache.snapshot_versions(["product_types"])
+    cache.invalidate_tables("product_types")
+    cache.set("catalog_tree", ["Пиломатериалы"], table_versions)
+
+    assert cache.get("catalog_tree") is MISSING
+
+
+# Устаревшие по времени и давно не использованные записи вытесняются
+def test_cache_ttl_and_lru_eviction(mocker):
+    cache = TTLLRUCache(max_size=2, ttl=60)
+    cache.set("first", 1, {})
+    cache.set("second", 2, {})
+    cache.get("first")
+    cache.set("third", 3, {})
+
+    assert cache.get("second") is MISSING
+    assert cache.get("first") == 1
+    assert cache.stats().evictions == 1
+
+    mocker.patch("database.cache.time.monotonic", return_value=time.monotonic() + 61)
+
+    assert cache.get("first") is MISSING
+
+
+# Версия записи - хэш содержимого: то же значение, сохраненное заново (после истечения TTL или в другом
+# процессе), имеет ту же версию, другое значение - другую, устаревшая запись версии не имеет
+def test_cache_entry_versions():
+    cache = TTLLRUCache(max_size=10, ttl=60)
+    first_version = cache.set("catalog_tree", ["Пиломатериалы"], cache.snapshot_versions(["product_types"]))
+
+    assert cache.get_with_version("catalog_tree") == (["Пиломатериалы"], first_version)
+
+    other_cache = TTLLRUCache(max_size=10, ttl=60)
+    assert other_cache.set("catalog_tree", ["Пиломатериалы"], {}) == first_version
+    second_version = cache.set("catalog_tree", ["Металлопрокат"], cache.snapshot_versions(["product_types"]))
+    assert second_version != first_version
+
+    cache.invalidate_tables("product_types")
+    assert cache.get_with_version("catalog_tree") == (MISSING, None)
+
+
+# Кэш справочных данных заполняется через сессию общих данных и только данными, прочитанными не с отстающей
+# копии БД (он сбрасывается по уведомлениям основной БД). Сессия пользователя используется,
+# только если из БД нужен один уровень бонусной карты
+@pytest.mark.asyncio
+async def test_main_page_cache_filled_only_from_up_to_date_db(monkeypatch):
+    monkeypatch.setattr(top_sellers_leaderboard, "_leaderboard", Leaderboard([], size=10))
+    reference_data_cache.clear()
+    cache_fill_row = {block_name: ["images/1.jpg"] for block_name in MAIN_PAGE_IMAGE_TABLES}
+    cache_fill_row["product_types_subtypes"] = [{"name": "Пиломатериалы", "product_subtypes": []}]
+    cache_fill_row["customer_level_name"] = "Первый"
+    user_session, cache_fill_session = RecordingSession({}), RecordingSession(cache_fill_row)
+    user = UserIdRole(id=1, role="user")
+    try:
+        # Копия отстает - данные отдаются без сохранения в кэш, версия страницы та же, что и при сохранении
+        lagging_data = await load_main_page_data(
+            user_session, user, cache_fill_session=cache_fill_session, store_in_cache=False)
+        assert lagging_data["product_types_subtypes"][0].name == "Пиломатериалы"
+        assert reference_data_cache.stats().size == 0
+
+        main_page_data = await load_main_page_data(user_session, user, cache_fill_session=cache_fill_session)
+        assert (user_session.executed, cache_fill_session.executed) == (0, 2)
+        assert main_page_data["customer_level_name"] == "Первый"
+        assert main_page_data["version"] == lagging_data["version"]
+
+        user_session.row = {"customer_level_name": "Второй"}
+        main_page_data = await load_main_page_data(user_session, user, cache_fill_session=cache_fill_session)
+        assert (user_session.executed, cache_fill_session.executed) == (1, 2)
+        assert main_page_data["customer_level_name"] == "Второй"
+    finally:
+        reference_data_cache.clear()
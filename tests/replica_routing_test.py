@@ -0,0 +1,85 @@
+# tests.replica_routing_test.py
+import time
+
+import pytest
+from fastapi import Response
+from starlette.requests import Request
+
+from api.schemas.authentication import UserToken
+from api.security.authentication import mark_user_write, check_jwt_access_token
+from config import settings
+from database.db import async_session_maker, async_replica_session_maker
+from database.routing import ReplicaRouter, replica_router
+
+
+def request_with_cookie(cookie: str) -> Request:
+    return Request({"type": "http", "headers": [(b"cookie", cookie.encode())]})
+
+
+# Пользователь, который только что изменил данные, читает с основной БД без проверки копии
+@pytest.mark.asyncio
+async def test_recent_writer_reads_from_primary(mocker):
+    router = ReplicaRouter(async_session_maker, async_replica_session_maker, replica_router.replica_engine)
+    check_replica = mocker.patch.object(router, "check_replica")
+
+    assert await router.get_read_session_maker(time.time()) is async_session_maker
+    check_replica.assert_not_called()
+
+
+# Остальные пользователи и пользователи, изменявшие данные раньше окна read-your-writes, читают с копии
+@pytest.mark.asyncio
+async def test_other_users_read_from_replica(mocker):
+    router = ReplicaRouter(async_session_maker, async_replica_session_maker, replica_router.replica_engine)
+    mocker.patch.object(router, "get_replica_lag", return_value=0.0)
+
+    last_write_at = time.time() - settings.DB_READ_YOUR_WRITES_WINDOW - 1
+    assert await router.get_read_session_maker(last_write_at) is async_replica_session_maker
+    assert await router.get_read_session_maker() is async_replica_session_maker
+
+
+# Время изменения данных передается в токене доступа, поэтому следующий запрос пользователя
+# читает с основной БД в любом процессе. После окна read-your-writes время из токена удаляется
+def test_last_write_at_carried_in_access_token(mocker):
+    response = Response()
+    mark_user_write(response, UserToken(id=42, role="user"))
+    cookie = response.headers["set-cookie"].split(";")[0]
+
+    user = check_jwt_access_token(request_with_cookie(cookie), Response())
+    assert user.last_write_at is not None
+    assert replica_router.is_recent_write(user.last_write_at)
+
+    mocker.patch("time.time", return_value=time.time() + settings.DB_READ_YOUR_WRITES_WINDOW + 1)
+    reissue_response = Response()
+    check_jwt_access_token(request_with_cookie(cookie), reissue_response)
+    cookie = reissue_response.headers["set-cookie"].split(";")[0]
+    assert check_jwt_access_token(request_with_cookie(cookie), Response()).last_write_at is None
+
+
+# При недоступной, отстающей копии или копии, которая не является резервным сервером, запросы уходят на основную БД
+@pytest.mark.asyncio
+@pytest.mark.parametrize("replica_error", [OSError("Connection refused"), "lag", "not_in_recovery"])
+async def test_unavailable_replica_falls_back_to_primary(mocker, replica_error):
+    router = ReplicaRouter(async_session_maker, async_replica_session_maker, replica_router.replica_engine)
+    if replica_error == "lag":
+        mocker.patch.object(router, "get_replica_lag", return_value=3600.0)
+    elif replica_error == "not_in_recovery":
+        # Обычная БД, а не резервный сервер: отставание неизвестно
+        mocker.patch.object(router, "get_replica_lag", return_value=None)
+    else:
+        mocker.patch.object(router, "get_replica_lag", side_effect=replica_error)
+
+    assert await router.get_read_session_maker() is async_session_maker
+    assert router.replica_available is False
+
+
+# В кэш сохраняются данные основной БД и копии, у которой при последней проверке не было отставания
+@pytest.mark.asyncio
+@pytest.mark.parametrize("replica_lag, replica_up_to_date", [(0.0, True), (2.5, False)])
+async def test_replica_data_cached_only_without_lag(mocker, replica_lag, replica_up_to_date):
+    router = ReplicaRouter(async_session_maker, async_replica_session_maker, replica_router.replica_engine)
+    mocker.patch.object(router, "get_replica_lag", return_value=replica_lag)
+
+    read_session_maker = await router.get_read_session_maker()
+    assert read_session_maker is async_replica_session_maker
+    assert router.is_up_to_date(read_session_maker) is replica_up_to_date
+    assert router.is_up_to_date(async_session_maker) is True
@@ -0,0 +1,27 @@
+# tests.search_test.py
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from api.errors.catalog.exceptions import InvalidCursor
+from api.schemas.catalog import SearchCursor
+from database.actions import search_products_query, search_products_page_from_db
+from database.pagination import encode_cursor
+
+
+# Поиск идет по сохраненному tsvector (GIN-индекс), следующая страница - по ключу (ранг, id)
+def test_search_products_query():
+    sql = str(search_products_query("доска строганая", (0.5, 10), 20).compile(dialect=postgresql.dialect()))
+
+    assert "products.search_vector @@ websearch_to_tsquery(" in sql
+    assert "(ts_rank(products.search_vector, websearch_to_tsquery(" in sql
+    assert "ORDER BY rank DESC, products.id DESC" in sql
+    assert "OFFSET" not in sql
+
+
+# Курсор от другого поискового запроса не принимается (до обращения к БД)
+@pytest.mark.asyncio
+async def test_search_cursor_from_another_query():
+    cursor = encode_cursor(SearchCursor(query="брус", rank=0.5, id=10))
+
+    with pytest.raises(InvalidCursor):
+        await search_products_page_from_db(None, "доска", cursor, 20)
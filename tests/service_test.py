@@ -0,0 +1,49 @@
+# tests.service_test.py
+import pytest
+import pytest_asyncio
+from fastapi.testclient import TestClient
+
+from api.security.authentication import create_jwt_token
+from main import market_app
+
+
+@pytest_asyncio.fixture(scope="session")
+async def test_client():
+    with TestClient(market_app) as client:
+        yield client
+
+
+# Запрос статистики пула соединений в роли администратора
+@pytest.mark.asyncio
+async def test_get_db_pool_stats_admin_token(test_client):
+    test_client.cookies.clear()
+    test_client.cookies = {"jwt_access_token": create_jwt_token(user_id=5, user_role="admin")}
+
+    response = test_client.get("http://127.0.0.1:8000/service/pool_stats")
+    assert response.status_code == 200
+    pool_stats = response.json()["primary"]
+    assert pool_stats["checked_out"] >= 0
+    assert pool_stats["overflow"] >= 0
+    assert pool_stats["average_wait_ms"] >= 0
+
+
+# Запрос статистики пула соединений в роли гостя
+@pytest.mark.asyncio
+async def test_get_db_pool_stats_without_access_token(test_client):
+    test_client.cookies.clear()
+
+    response = test_client.get("http://127.0.0.1:8000/service/pool_stats")
+    assert response.status_code == 403
+
+
+# Запрос статистики кэша справочных данных в роли администратора
+@pytest.mark.asyncio
+async def test_get_cache_stats_admin_token(test_client):
+    test_client.cookies.clear()
+    test_client.cookies = {"jwt_access_token": create_jwt_token(user_id=5, user_role="admin")}
+
+    response = test_client.get("http://127.0.0.1:8000/service/cache_stats")
+    assert response.status_code == 200
+    cache_stats = response.json()["reference_data"]
+    assert cache_stats["hits"] >= 0
+    assert cache_stats["misses"] >= 0
@@ -0,0 +1,135 @@
+# tests.streaming_test.py
+# Потоковая передача HTML-страниц: начало страницы отправляется до чтения данных, страница каталога
+# на тестовой БД (TEST_DB_NAME, пересоздается) при потоковой передаче совпадает с обычной,
+# а прерванная ошибкой БД не попадает в кэш страниц
+import asyncio
+import re
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from api.caching.page_cache import page_cache
+from api.templating.streaming import stream_template
+from api.templating.templates import streaming_templates_environment
+from config import settings
+from database.actions import SubtypeProductsPageStream
+from database.db import Base
+from database.dependencies import get_cache_fill_async_session, get_public_read_session_maker, can_fill_cache
+from database.models import ProductType, ProductSubtype, Product
+from main import market_app
+
+NUMBER_OF_PRODUCTS = 70
+CATALOG_PAGE_URL = "http://127.0.0.1:8000/catalog/Пиломатериалы/Брус"
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def async_session_maker():
+    async_engine = create_async_engine(settings.ASYNCPG_TEST_DATABASE_URL)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(ProductType.__table__.insert(), [{"name": "Пиломатериалы", "image_link": ""}])
+        await conn.execute(ProductSubtype.__table__.insert(), [
+            {"name": "Брус", "image_link": "", "type_name": "Пиломатериалы"}])
+        await conn.execute(Product.__table__.insert(), [
+            {"id": product_id, "name": f"Брус {product_id}", "price": 1000.5, "description": "",
+             "image_link": "", "quantity_in_stock": product_id % 3, "product_subtype_name": "Брус",
+             "additional_information": "", "rating": 0.5, "number_of_sales": product_id}
+            for product_id in range(1, NUMBER_OF_PRODUCTS + 1)
+        ])
+    session_maker = async_sessionmaker(async_engine, class_=AsyncSession)
+
+    async def get_test_async_session():
+        async with session_maker() as async_session:
+            yield async_session
+
+    market_app.dependency_overrides[get_cache_fill_async_session] = get_test_async_session
+    market_app.dependency_overrides[get_public_read_session_maker] = lambda: session_maker
+    # Тестовая БД не является ни основной БД, ни копией, но страницы должны сохраняться в кэш
+    market_app.dependency_overrides[can_fill_cache] = lambda: True
+    yield session_maker
+
+    market_app.dependency_overrides.pop(get_cache_fill_async_session, None)
+    market_app.dependency_overrides.pop(get_public_read_session_maker, None)
+    market_app.dependency_overrides.pop(can_fill_cache, None)
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await async_engine.dispose()
+
+
+async def get_catalog_page(query: str):
+    # Страница гостя строится заново, а не берется из кэша страниц
+    page_cache.clear()
+    async with AsyncClient(transport=ASGITransport(app=market_app)) as client:
+        return await client.get(f"{CATALOG_PAGE_URL}?{query}")
+
+
+# Начало страницы отправляется, пока рендеринг ждет данные ниже, остальное - когда данные прочитаны
+@pytest.mark.asyncio(loop_scope="module")
+async def test_stream_template_sends_head_before_data():
+    template = streaming_templates_environment.from_string(
+        "<head></head>{% for row in rows %}<p>{{ row }}</p>{% endfor %}")
+    rows_ready = asyncio.Event()
+
+    async def rows():
+        await rows_ready.wait()
+        for row in range(3):
+            yield row
+
+    chunks = stream_template(template, {"rows": rows()}, chunk_size=1024)
+    assert await anext(chunks) == "<head></head>"
+    rows_ready.set()
+    assert [chunk async for chunk in chunks] == ["<p>0</p><p>1</p><p>2</p>"]
+
+
+# Большая страница каталога передается потоком и совпадает со страницей, отрендеренной целиком,
+# ссылка на следующую страницу появляется после чтения всех товаров страницы
+@pytest.mark.asyncio(loop_scope="module")
+async def test_streamed_catalog_page(async_session_maker, monkeypatch):
+    monkeypatch.setattr(settings, "CATALOG_STREAMING_MIN_PAGE_SIZE", 50)
+    monkeypatch.setattr(settings, "HTML_STREAMING_CHUNK_SIZE", 4096)
+    streamed_response = await get_catalog_page("limit=60")
+    assert streamed_response.status_code == 200
+    # Размер страницы при потоковой передаче заранее неизвестен
+    assert "content-length" not in streamed_response.headers
+
+    monkeypatch.setattr(settings, "CATALOG_STREAMING_MIN_PAGE_SIZE", 0)
+    response = await get_catalog_page("limit=60")
+    assert response.status_code == 200
+    assert "content-length" in response.headers
+    assert streamed_response.text == response.text
+
+    catalog_html = streamed_response.text
+    assert catalog_html.count('class="product-card"') == 60
+    assert "Брус 70<" in catalog_html and "Брус 11<" in catalog_html and "Брус 10<" not in catalog_html
+    assert "cursor=" in catalog_html
+
+    next_page_query = re.search(r'href="\?([^"]*cursor=[^"]*)"', catalog_html).group(1).replace("&amp;", "&")
+    monkeypatch.setattr(settings, "CATALOG_STREAMING_MIN_PAGE_SIZE", 50)
+    catalog_html = (await get_catalog_page(next_page_query)).text
+    assert catalog_html.count('class="product-card"') == 10
+    assert "cursor=" not in catalog_html and "В начало" in catalog_html
+
+
+# Ошибка БД после отправки начала страницы обрывает ответ (ошибка доходит до сервера),
+# записывается в журнал, а недописанная страница не сохраняется в кэш страниц
+@pytest.mark.asyncio(loop_scope="module")
+async def test_streamed_catalog_page_db_error(async_session_maker, monkeypatch, capsys):
+    monkeypatch.setattr(settings, "CATALOG_STREAMING_MIN_PAGE_SIZE", 50)
+    monkeypatch.setattr(settings, "HTML_STREAMING_CHUNK_SIZE", 1024)
+    read_products = SubtypeProductsPageStream.__aiter__
+
+    async def read_products_with_error(products_stream):
+        async for product in read_products(products_stream):
+            yield product
+            if product.id == 60:
+                raise OperationalError("SELECT", {}, ConnectionResetError("connection lost"))
+
+    monkeypatch.setattr(SubtypeProductsPageStream, "__aiter__", read_products_with_error)
+    with pytest.raises(OperationalError):
+        await get_catalog_page("limit=60")
+    assert page_cache.stats().size == 0
+    assert "Не удалось отрендерить шаблон catalog.html" in capsys.readouterr().out
@@ -0,0 +1,60 @@
+# tests.suggestions_test.py
+import pytest
+
+from database.suggestions import SuggestionIndex, typo_distance
+
+SUBTYPES = [("Доски строительные", "Пиломатериалы"), ("Брус", "Пиломатериалы"), ("Сетка", "Металлопрокат")]
+PRODUCTS = [
+    (1, "Доска строганая 25x150", 10),
+    (2, "Доска обрезная 40x200", 50),
+    (3, "Брус сосновый 100x100", 5),
+    (4, "Сетка сварная оцинкованная", 1),
+    (5, "Knauf штукатурка гипсовая", 3)
+]
+
+
+def get_names(suggestions) -> list[str]:
+    return [suggestion.name for suggestion in suggestions]
+
+
+# Подсказки по началу слов: сначала категории, затем товары по убыванию продаж
+@pytest.mark.parametrize("query, names", [
+    ("до", ["Доски строительные", "Доска обрезная 40x200", "Доска строганая 25x150"]),
+    ("доска стр", ["Доска строганая 25x150"]),
+    ("пилом", ["Брус", "Доски строительные"]),
+    ("25x", ["Доска строганая 25x150"]),
+    ("ыыыы", [])
+])
+def test_suggest_by_prefix(query, names):
+    assert get_names(SuggestionIndex.build(SUBTYPES, PRODUCTS).suggest(query)) == names
+
+
+# Запрос, набранный в другой раскладке клавиатуры, и запрос с опечаткой
+@pytest.mark.parametrize("query, name", [
+    ("ljcrf cnh", "Доска строганая 25x150"),
+    ("лтфга", "Knauf штукатурка гипсовая"),
+    ("строгоная", "Доска строганая 25x150"),
+    ("сварнпя", "Сетка сварная оцинкованная")
+])
+def test_suggest_with_mistakes(query, name):
+    assert get_names(SuggestionIndex.build(SUBTYPES, PRODUCTS).suggest(query)) == [name]
+
+
+# Измененный товар находится по новому названию, удаленный не находится
+def test_suggest_after_product_changes():
+    suggestion_index = SuggestionIndex.build(SUBTYPES, PRODUCTS)
+
+    suggestion_index.apply_product_change(2, "Доска палубная 30x150", 60)
+    suggestion_index.apply_product_change(1, None)
+    suggestion_index.apply_product_change(6, "Доска террасная", 20)
+
+    assert get_names(suggestion_index.suggest("доска")) == ["Доска палубная 30x150", "Доска террасная"]
+    assert suggestion_index.suggest("палуб")[0].url == "/catalog/product/2"
+    assert suggestion_index.suggest("обрезн") == []
+
+
+# Перестановка соседних букв считается одной опечаткой
+def test_typo_distance():
+    assert typo_distance("досак", "доска", 2) == 1
+    assert typo_distance("дска", "доска", 2) == 1
+    assert typo_distance("брус", "доска", 2) == 3
@@ -0,0 +1,29 @@
+# tests.templates_test.py
+# Общее окружение шаблонов: компиляция всех шаблонов при запуске, загрузка скомпилированных шаблонов
+# из файлов другим процессом, экранирование данных отзыва в шаблоне для websocket
+from api.templating.templates import (create_templates_environment, TemplatesPreloader, TEMPLATES_DIRECTORY,
+                                      templates)
+
+
+# Второе окружение с той же директорией скомпилированных шаблонов не компилирует шаблоны заново
+def test_templates_preload_with_bytecode_cache(tmp_path):
+    environment = create_templates_environment(
+        TEMPLATES_DIRECTORY, auto_reload=False, bytecode_cache_enabled=True, bytecode_cache_directory=str(tmp_path))
+    stats = TemplatesPreloader(environment).preload()
+    assert stats.number_of_templates == len(list(tmp_path.iterdir())) == 5
+    assert stats.bytecode_cache_enabled and not stats.auto_reload
+
+    other_environment = create_templates_environment(
+        TEMPLATES_DIRECTORY, auto_reload=False, bytecode_cache_enabled=True, bytecode_cache_directory=str(tmp_path))
+    # Шаблоны загружаются из файлов: компиляция из исходного текста завершилась бы ошибкой
+    other_environment.compile = None
+    TemplatesPreloader(other_environment).preload()
+    assert other_environment.get_template("catalog.html").render(products_from_db=[]) == \
+        environment.get_template("catalog.html").render(products_from_db=[])
+
+
+# Текст отзыва, отправляемого по websocket, экранируется
+def test_new_feedback_template_escapes_text():
+    feedback_html = templates.get_template("user_new_feedback.html").render(
+        id=1, user_name="Иван И.", feedback_date="01.01.2026 12:00", liked_text="<script>", disliked_text="")
+    assert "&lt;script&gt;" in feedback_html and "<script>" not in feedback_html